@@ -1,29 +1,106 @@
+"""Примитивная база данных.
 
+Подмодули импортируются при первом обращении к их именам: запуск database
+не платит за prettytable, multiprocessing и остальной движок, пока команда
+их не использует.
+"""
+
+from importlib import import_module
+
+# Легкие модули, чьи имена совпадают с именами атрибутов: импорт подмодуля
+# записал бы в пакет сам модуль вместо функции или объекта
 from .main import main
-from .engine import run
-from .core import (
-    create_table, drop_table, list_tables, get_table_info,
-    insert, select, update, delete, format_table_data,
-    clear_select_cache, get_cache_statistics
-)
-from .decorators import handle_db_errors, confirm_action, log_time, create_cacher
-from .utils import (
-    load_metadata, save_metadata, load_table_data, save_table_data,
-    delete_table_file, ensure_data_dir
-)
-from .parser import (
-    parse_insert_values, parse_where_clause, parse_set_clause, parse_value,
-    parse_insert_command, parse_select_command, parse_update_command, parse_delete_command
-)
+from .metrics import Histogram, Metrics, metrics
+
+# Имя -> подмодуль, из которого оно берется
+_EXPORTS = {
+    'run': 'engine', 'run_script': 'engine', 'execute_command': 'engine',
+    'TableStore': 'store',
+    'create_table': 'core', 'drop_table': 'core', 'list_tables': 'core',
+    'get_table_info': 'core', 'create_index': 'core', 'drop_index': 'core',
+    'set_table_layout': 'core', 'set_table_format': 'core',
+    'set_table_segments': 'core', 'insert': 'core',
+    'select': 'core', 'update': 'core', 'delete': 'core', 'format_table_data': 'core',
+    'iter_formatted_pages': 'core', 'iter_records': 'core',
+    'clear_select_cache': 'core', 'configure_select_cache': 'core',
+    'get_cache_statistics': 'core',
+    'HashIndex': 'indexes', 'SortedIndex': 'indexes', 'PrimaryKeyIndex': 'indexes',
+    'ColumnarTable': 'columnar',
+    'SegmentedTable': 'segments',
+    'MappedTable': 'binary_format', 'read_binary_table': 'binary_format',
+    'write_binary_table': 'binary_format',
+    'read_compressed_table': 'compressed_format',
+    'iter_compressed_table': 'compressed_format',
+    'write_compressed_table': 'compressed_format',
+    'bulk_load': 'loader',
+    'export_records': 'exporter',
+    'handle_db_errors': 'decorators', 'confirm_action': 'decorators',
+    'log_time': 'decorators', 'create_cacher': 'decorators',
+    'configure_session': 'decorators',
+    'load_metadata': 'utils', 'save_metadata': 'utils', 'load_table_data': 'utils',
+    'save_table_data': 'utils', 'delete_table_file': 'utils',
+    'ensure_data_dir': 'utils', 'append_table_log': 'utils',
+    'replay_table_log': 'utils', 'compact_table_log': 'utils', 'replace_file': 'utils',
+    'commit_files': 'utils', 'recover_commit': 'utils',
+    'parse_insert_values': 'parser', 'parse_where_clause': 'parser',
+    'parse_set_clause': 'parser', 'parse_value': 'parser',
+    'parse_select_options': 'parser', 'parse_select_list': 'parser',
+    'split_select_options': 'parser', 'Aggregate': 'parser', 'Join': 'parser',
+    'Comparison': 'parser', 'format_where': 'parser', 'parse_insert_command': 'parser',
+    'parse_select_command': 'parser', 'parse_update_command': 'parser',
+    'parse_delete_command': 'parser',
+    'compile_where': 'predicates', 'Predicate': 'predicates',
+    'Statement': 'statements', 'PreparedStatement': 'statements',
+    'StatementCache': 'statements', 'statement_cache': 'statements',
+    'Plan': 'planner', 'plan_query': 'planner', 'execute_plan': 'planner',
+    'collect_stats': 'planner',
+    'AggregateQuery': 'aggregates', 'aggregate': 'aggregates',
+    'HashJoin': 'joins',
+    'run_benchmarks': 'benchmarks',
+    'ReadWriteLock': 'locks', 'LockManager': 'locks',
+    'configure_parallel_scan': 'parallel', 'filter_positions': 'parallel',
+    'DatabaseEngine': 'server', 'serve': 'server', 'connect': 'server',
+}
 
 __all__ = [
-    'main', 'run',
+    'main', 'run', 'run_script', 'execute_command', 'TableStore',
+    'Statement', 'PreparedStatement', 'StatementCache', 'statement_cache',
     'create_table', 'drop_table', 'list_tables', 'get_table_info',
+    'create_index', 'drop_index', 'set_table_layout', 'set_table_format',
+    'set_table_segments',
+    'HashIndex', 'SortedIndex', 'PrimaryKeyIndex', 'ColumnarTable', 'SegmentedTable',
+    'Plan', 'plan_query', 'execute_plan', 'collect_stats',
+    'AggregateQuery', 'aggregate', 'Aggregate', 'parse_select_list',
+    'split_select_options',
+    'HashJoin', 'Join',
+    'configure_parallel_scan', 'filter_positions',
+    'ReadWriteLock', 'LockManager', 'DatabaseEngine', 'serve', 'connect',
+    'run_benchmarks', 'Metrics', 'Histogram', 'metrics',
+    'MappedTable', 'read_binary_table', 'write_binary_table',
+    'read_compressed_table', 'iter_compressed_table', 'write_compressed_table',
     'insert', 'select', 'update', 'delete', 'format_table_data',
-    'clear_select_cache', 'get_cache_statistics',
+    'iter_formatted_pages', 'iter_records', 'export_records',
+    'clear_select_cache', 'configure_select_cache', 'get_cache_statistics',
+    'bulk_load',
     'handle_db_errors', 'confirm_action', 'log_time', 'create_cacher',
+    'configure_session',
     'load_metadata', 'save_metadata', 'load_table_data', 'save_table_data',
-    'delete_table_file', 'ensure_data_dir',
+    'delete_table_file', 'ensure_data_dir', 'append_table_log', 'replay_table_log',
+    'compact_table_log', 'replace_file', 'commit_files', 'recover_commit',
     'parse_insert_values', 'parse_where_clause', 'parse_set_clause', 'parse_value',
+    'parse_select_options', 'Comparison', 'format_where', 'compile_where', 'Predicate',
     'parse_insert_command', 'parse_select_command', 'parse_update_command', 'parse_delete_command'
 ]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
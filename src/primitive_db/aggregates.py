@@ -0,0 +1,261 @@
+
+from itertools import islice
+
+from .columnar import ColumnarTable, IntColumn
+from .constants import ERROR_MESSAGES
+from .core import iter_records, page_bounds
+from .decorators import handle_db_errors, log_time
+from .indexes import SortedIndex, sort_key
+from .parallel import filter_positions
+from .parser import Aggregate
+
+
+class CountState:
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+
+class SumState:
+
+    def __init__(self):
+        self.total = 0
+
+    def add(self, value):
+        self.total += value
+
+    def result(self):
+        return self.total
+
+
+class AvgState:
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+class MinState:
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def result(self):
+        return self.value
+
+
+class MaxState(MinState):
+
+    def add(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+
+STATES = {
+    "count": CountState,
+    "sum": SumState,
+    "avg": AvgState,
+    "min": MinState,
+    "max": MaxState,
+}
+
+# Функции, которым нужен числовой столбец
+NUMERIC_FUNCTIONS = {"sum", "avg"}
+
+
+class AggregateQuery:
+    """Список SELECT с агрегатами и необязательный GROUP BY.
+
+    Элемент списка - имя столбца (он должен быть в GROUP BY) или Aggregate.
+    """
+
+    def __init__(self, items, group_by=None):
+        if items is None:
+            items = [group_by]
+        self.items = items
+        self.group_by = group_by
+        self.aggregates = [item for item in items if isinstance(item, Aggregate)]
+
+    @property
+    def labels(self):
+        return [str(item) for item in self.items]
+
+    def result_columns(self):
+        return [{"name": label} for label in self.labels]
+
+    def validate(self, table_name, columns):
+        """Возвращает сообщение об ошибке или None."""
+        column_types = {col["name"]: col["type"] for col in columns}
+        if self.group_by is not None and self.group_by not in column_types:
+            return ERROR_MESSAGES["column_not_found"].format(
+                column=self.group_by, table_name=table_name
+            )
+        for item in self.items:
+            column = item.column if isinstance(item, Aggregate) else item
+            if column != "*" and column not in column_types:
+                return ERROR_MESSAGES["column_not_found"].format(
+                    column=column, table_name=table_name
+                )
+            if isinstance(item, Aggregate):
+                if item.func in NUMERIC_FUNCTIONS and column_types[column] != "int":
+                    return ERROR_MESSAGES["invalid_aggregate"].format(
+                        func=item.func, column=column, column_type=column_types[column]
+                    )
+            elif item != self.group_by:
+                return ERROR_MESSAGES["not_grouped"].format(column=item)
+        return None
+
+    def strategy(self, table_data, predicate=None, indexes=None):
+        """Способ вычисления: index, columns или hash (один проход с группами)."""
+        stored = isinstance(table_data, (list, ColumnarTable))
+        if self.group_by is not None or not stored:
+            # Поток строк (например, результат JOIN) можно пройти только один раз
+            return "hash"
+        if isinstance(table_data, ColumnarTable):
+            return "columns" if predicate is None else "hash"
+        if all(self.from_index(item, predicate, indexes) for item in self.aggregates):
+            return "index"
+        return "hash"
+
+    def from_index(self, item, predicate, indexes):
+        if item.func == "count":
+            return predicate is None
+        if item.func in ("min", "max"):
+            return isinstance((indexes or {}).get(item.column), SortedIndex)
+        return False
+
+    def row(self, key, values):
+        aggregates = iter(values)
+        return {
+            label: next(aggregates) if isinstance(item, Aggregate) else key
+            for item, label in zip(self.items, self.labels)
+        }
+
+    def run(self, table_data, predicate=None, indexes=None, access_indexes=None):
+        strategy = self.strategy(table_data, predicate, indexes)
+        if strategy == "index":
+            values = [
+                index_value(item, table_data, predicate, indexes)
+                for item in self.aggregates
+            ]
+            return [self.row(None, values)]
+        if strategy == "columns":
+            values = [column_value(item, table_data) for item in self.aggregates]
+            return [self.row(None, values)]
+
+        rows = self.scan(table_data, predicate, access_indexes)
+        groups = hash_aggregate(rows, self.aggregates)
+        if self.group_by is None and not groups:
+            # Агрегат без GROUP BY дает одну строку и для пустой выборки
+            groups[None] = [STATES[item.func]() for item in self.aggregates]
+        keys = sorted(groups, key=sort_key) if self.group_by is not None else groups
+        return [
+            self.row(key, [state.result() for state in groups[key]]) for key in keys
+        ]
+
+    def scan(self, table_data, predicate, indexes):
+        """Поток (ключ группы, значения столбцов агрегатов) без списка записей."""
+        columns = [item.column for item in self.aggregates]
+        group_by = self.group_by
+        if isinstance(table_data, ColumnarTable):
+            positions = filter_positions(table_data, predicate) \
+                if predicate is not None else range(len(table_data))
+            getters = [table_data.columns[column].get if column != "*" else None
+                       for column in columns]
+            group = table_data.columns[group_by].get if group_by else None
+            for position in positions:
+                yield (
+                    group(position) if group else None,
+                    [get(position) if get else None for get in getters],
+                )
+            return
+
+        for record in iter_records(table_data, predicate, indexes):
+            yield (
+                record.get(group_by) if group_by else None,
+                [record.get(column) for column in columns],
+            )
+
+
+def hash_aggregate(rows, aggregates):
+    """Один проход: по набору состояний агрегатов на каждую группу."""
+    groups = {}
+    for key, values in rows:
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = [STATES[item.func]() for item in aggregates]
+        for state, value in zip(states, values):
+            state.add(value)
+    return groups
+
+
+def index_value(item, table_data, predicate, indexes):
+    """COUNT без условия - число строк, MIN/MAX - первая подходящая запись индекса."""
+    if item.func == "count":
+        return len(table_data)
+    ordered = indexes[item.column].iter_ordered(descending=item.func == "max")
+    for record in ordered:
+        if predicate is None or predicate.test(record):
+            return record.get(item.column)
+    return None
+
+
+def column_value(item, table):
+    """Агрегат по целому столбцу колоночной таблицы без материализации строк."""
+    if item.func == "count":
+        return len(table)
+    if not len(table):
+        return None
+    column = table.columns[item.column]
+    if isinstance(column, IntColumn):
+        values = column.values
+    elif hasattr(column, "dictionary"):
+        # MIN/MAX смотрят только на значения, коды которых встречаются в столбце
+        values = [column.dictionary[code] for code in set(column.values)]
+    else:
+        values = (column.get(position) for position in range(len(table)))
+
+    if item.func == "sum":
+        return sum(values)
+    if item.func == "avg":
+        return sum(values) / len(table)
+    return min(values) if item.func == "min" else max(values)
+
+
+def order_rows(rows, order_by=None, descending=False, limit=None, offset=0):
+    if order_by is not None:
+        rows = sorted(
+            rows, key=lambda row: sort_key(row.get(order_by, "")), reverse=descending
+        )
+    start, stop = page_bounds(offset, limit)
+    return list(islice(rows, start, stop))
+
+
+@handle_db_errors
+@log_time
+def aggregate(table_data, query, predicate=None, indexes=None, access_indexes=None,
+              order_by=None, descending=False, limit=None, offset=0):
+    """Вычисляет агрегатный SELECT одним потоковым проходом по таблице.
+
+    indexes - все индексы таблицы (для MIN/MAX по упорядоченному индексу),
+    access_indexes - индексы, выбранные планировщиком для поиска строк.
+    """
+    rows = query.run(table_data, predicate, indexes, access_indexes)
+    return order_rows(rows, order_by, descending, limit, offset)
@@ -0,0 +1,6 @@
+"""Замеры производительности основных операций: database bench."""
+
+from .datasets import generate_rows
+from .runner import run_benchmarks, run_size
+
+__all__ = ['run_benchmarks', 'run_size', 'generate_rows']
@@ -0,0 +1,29 @@
+
+import csv
+import random
+
+TABLE_NAME = "bench"
+# Схема с каждым из поддерживаемых типов: int, str и bool
+COLUMNS = ["value:int", "name:str", "active:bool"]
+# Число различных строк в столбце name (как у категорий или городов)
+DISTINCT_NAMES = 1000
+SEED = 42
+
+
+def generate_rows(rows, seed=SEED):
+    """Детерминированный поток строк синтетической таблицы без ID."""
+    rng = random.Random(seed)
+    for _ in range(rows):
+        yield {
+            "value": rng.randrange(rows),
+            "name": f"name_{rng.randrange(DISTINCT_NAMES)}",
+            "active": rng.random() < 0.5,
+        }
+
+
+def write_csv(filepath, rows, seed=SEED):
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["value", "name", "active"])
+        writer.writeheader()
+        writer.writerows(generate_rows(rows, seed))
+    return filepath
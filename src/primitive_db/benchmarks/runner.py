@@ -0,0 +1,286 @@
+
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from importlib import metadata as package_metadata
+from multiprocessing import get_context
+from pathlib import Path
+
+from prettytable import PrettyTable
+
+from ..constants import BENCH_MESSAGES, BENCH_OUTPUT_FILE, BENCH_SAMPLES, BENCH_SIZES
+from ..core import clear_select_cache
+from ..decorators import configure_session
+from ..engine import command_failed, execute_command
+from ..store import TableStore
+from ..utils import load_table_data, replace_file, save_table_data, write_json
+from .datasets import COLUMNS, DISTINCT_NAMES, TABLE_NAME, write_csv
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+PACKAGE = __package__.rpartition(".")[0]
+DISTRIBUTION = "project2-polyakova-polina-m-555"
+# Каталог, из которого импортируется пакет: нужен процессу замера запуска
+IMPORT_ROOT = str(Path(__file__).resolve().parents[3])
+# Загрузка, сохранение и запуск занимают секунды на больших таблицах
+FILE_SAMPLES = 3
+
+
+def peak_rss_kb():
+    """Пиковый объем памяти процесса (в Linux ru_maxrss уже в килобайтах)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def percentile(ordered, percent):
+    # Ближайший ранг: p99 из 20 замеров - это самый медленный из них
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies, items, unit):
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "samples": len(ordered),
+        "total_s": round(total, 6),
+        "throughput": round(items / total, 1) if total else None,
+        "unit": unit,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+class BenchSession:
+    """Хранилище во временном каталоге; команды выполняются как в диалоге."""
+
+    def __init__(self):
+        self.store = TableStore()
+
+    def run(self, command):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            execute_command(self.store, command)
+            self.store.flush()
+        if command_failed():
+            raise RuntimeError(f"{command}: {output.getvalue().strip()}")
+
+    def timed(self, commands, before=None):
+        latencies = []
+        for command in commands:
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            self.run(command)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+
+def timed_calls(call, samples):
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def start_process(*args):
+    """Запускает database в новом процессе, как это делает конвейер оболочки."""
+    env = dict(os.environ)
+    paths = [IMPORT_ROOT, env.get("PYTHONPATH")]
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, paths))
+    subprocess.run(
+        [sys.executable, "-c", f"from {PACKAGE}.main import main; main()", *args],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def run_cases(rows, samples):
+    """Все замеры для одной таблицы из rows строк в текущем каталоге."""
+    rng = random.Random(rows)
+    session = BenchSession()
+    results = {}
+
+    session.run(f"create_table {TABLE_NAME} {' '.join(COLUMNS)}")
+    csv_path = write_csv(f"{TABLE_NAME}.csv", rows)
+    latencies = session.timed([f"load {TABLE_NAME} from {csv_path}"])
+    results["bulk_load"] = summarize(latencies, rows, "rows/s")
+    os.remove(csv_path)
+
+    columns = session.store.get_metadata()[TABLE_NAME]["columns"]
+    table_data = session.store.get_table(TABLE_NAME)
+    latencies = timed_calls(
+        lambda data=table_data: save_table_data(TABLE_NAME, data, "json", columns),
+        FILE_SAMPLES,
+    )
+    results["save_json"] = summarize(latencies, rows * FILE_SAMPLES, "rows/s")
+    latencies = timed_calls(lambda: load_table_data(TABLE_NAME), FILE_SAMPLES)
+    results["load_json"] = summarize(latencies, rows * FILE_SAMPLES, "rows/s")
+    for codec in ("zlib", "lzma"):
+        latencies = timed_calls(
+            lambda data=table_data, codec=codec: save_table_data(
+                TABLE_NAME, data, codec, columns
+            ),
+            FILE_SAMPLES,
+        )
+        results[f"save_{codec}"] = summarize(latencies, rows * FILE_SAMPLES, "rows/s")
+        latencies = timed_calls(
+            lambda codec=codec: load_table_data(TABLE_NAME, codec), FILE_SAMPLES
+        )
+        results[f"load_{codec}"] = summarize(latencies, rows * FILE_SAMPLES, "rows/s")
+    del table_data
+
+    # Пустой пакет - импорт и выход; одна команда - еще чтение метаданных и таблицы
+    latencies = timed_calls(lambda: start_process("--script", os.devnull), FILE_SAMPLES)
+    results["startup"] = summarize(latencies, FILE_SAMPLES, "ops/s")
+    latencies = timed_calls(
+        lambda: start_process("-c", f"select from {TABLE_NAME} where ID = 1"),
+        FILE_SAMPLES,
+    )
+    results["oneshot_select"] = summarize(latencies, FILE_SAMPLES, "ops/s")
+
+    # Кэш результатов очищается, чтобы замерить сам поиск, а не попадание в кэш
+    values = [rng.randrange(rows) for _ in range(samples)]
+    latencies = session.timed(
+        [f"select from {TABLE_NAME} where value = {value}" for value in values],
+        before=clear_select_cache,
+    )
+    results["select_eq"] = summarize(latencies, samples, "ops/s")
+    latencies = session.timed(
+        [f"select from {TABLE_NAME} where value between {value} and {value + 99}"
+         for value in values],
+        before=clear_select_cache,
+    )
+    results["select_range"] = summarize(latencies, samples, "ops/s")
+
+    latencies = session.timed([
+        f'insert into {TABLE_NAME} values ({rng.randrange(rows)}, '
+        f'"name_{rng.randrange(DISTINCT_NAMES)}", {rng.choice(["true", "false"])})'
+        for _ in range(samples)
+    ])
+    results["insert"] = summarize(latencies, samples, "ops/s")
+
+    ids = rng.sample(range(1, rows + 1), min(samples * 2, rows))
+    latencies = session.timed([
+        f'update {TABLE_NAME} set name = "updated" where ID = {record_id}'
+        for record_id in ids[:samples]
+    ])
+    results["update"] = summarize(latencies, len(ids[:samples]), "ops/s")
+    latencies = session.timed([
+        f"delete from {TABLE_NAME} where ID = {record_id}"
+        for record_id in ids[samples:]
+    ])
+    if latencies:
+        results["delete"] = summarize(latencies, len(latencies), "ops/s")
+
+    # Тот же поиск и вставка после разбиения: читается один сегмент, а не вся таблица
+    session.run(f"partition {TABLE_NAME}")
+    latencies = timed_calls(
+        lambda: start_process("-c", f"select from {TABLE_NAME} where ID = {rows}"),
+        FILE_SAMPLES,
+    )
+    results["segmented_oneshot_select"] = summarize(latencies, FILE_SAMPLES, "ops/s")
+    insert_command = f'insert into {TABLE_NAME} values (1, "name_1", true)'
+    latencies = timed_calls(
+        lambda: start_process("-c", insert_command), FILE_SAMPLES
+    )
+    results["segmented_oneshot_insert"] = summarize(latencies, FILE_SAMPLES, "ops/s")
+    return results
+
+
+def run_size(rows, samples):
+    """Выполняется в отдельном процессе: пиковая память относится к одному размеру."""
+    configure_session(confirm="yes", show_timing=False)
+    with tempfile.TemporaryDirectory(prefix="primitive_db_bench_") as workdir:
+        os.chdir(workdir)
+        cases = run_cases(rows, samples)
+        os.chdir(tempfile.gettempdir())
+    return {"rows": rows, "peak_rss_kb": peak_rss_kb(), "cases": cases}
+
+
+def package_version():
+    try:
+        return package_metadata.version(DISTRIBUTION)
+    except package_metadata.PackageNotFoundError:
+        return None
+
+
+def load_baseline(filepath):
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            results = json.load(f)["results"]
+            return {str(result["rows"]): result["cases"] for result in results}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(BENCH_MESSAGES["baseline_missing"].format(file=filepath, error=e))
+        return {}
+
+
+def format_change(current, previous):
+    if not previous:
+        return "-"
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+
+def format_report(results, baseline=None):
+    table = PrettyTable()
+    table.field_names = [
+        "Строк", "Операция", "Пропускная способность", "p50, мс", "p99, мс",
+        "Память, КБ",
+    ] + (["p50 к базовому"] if baseline else [])
+    for result in results:
+        previous_cases = (baseline or {}).get(str(result["rows"]), {})
+        for case, stats in result["cases"].items():
+            row = [result["rows"], case, f"{stats['throughput']} {stats['unit']}",
+                   stats["p50_ms"], stats["p99_ms"], stats["peak_rss_kb"]]
+            if baseline:
+                previous = previous_cases.get(case, {}).get("p50_ms")
+                row.append(format_change(stats["p50_ms"], previous))
+            table.add_row(row)
+    return table.get_string()
+
+
+def run_benchmarks(sizes=BENCH_SIZES, samples=BENCH_SAMPLES, output=BENCH_OUTPUT_FILE,
+                   baseline=None):
+    """Замеряет основные операции на таблицах заданных размеров.
+
+    Каждый размер считается в новом процессе во временном каталоге, поэтому
+    данные пользователя не затрагиваются. Результаты пишутся в JSON-файл
+    output; с baseline рядом выводится изменение p50 относительно него.
+    """
+    report = {
+        "version": package_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "samples": samples,
+        "results": [],
+    }
+    previous = load_baseline(baseline) if baseline else None
+    for rows in sizes:
+        print(BENCH_MESSAGES["size_started"].format(rows=rows))
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            report["results"].append(pool.submit(run_size, rows, samples).result())
+
+    output = os.path.abspath(output)
+    replace_file(output, write_json(report))
+    print(format_report(report["results"], previous))
+    print(BENCH_MESSAGES["saved"].format(file=output))
+    return report
@@ -0,0 +1,211 @@
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .columnar import BoolColumn, ColumnarTable, IntColumn, StrColumn
+from .indexes import comparison_matches
+from .parser import Comparison
+
+# Формат файла таблицы:
+#   заголовок: MAGIC, порядок байт, число столбцов, число строк;
+#   описание столбцов: тип, имя, смещение и длина блока данных;
+#   блоки столбцов, выровненные по 8 байт:
+#     int  - массив int64, bool - по байту на значение,
+#     str  - массив (строк + 1) смещений uint64 и куча байтов utf-8.
+MAGIC = b"PDBT"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHQ")
+COLUMN_HEADER = struct.Struct("<BH")
+BLOCK = struct.Struct("<QQ")
+ALIGNMENT = 8
+
+TYPE_CODES = {"int": 1, "str": 2, "bool": 3}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+BYTE_ORDERS = {"little": 0, "big": 1}
+
+
+def encode_column(column_type, values):
+    if column_type == "int":
+        return array('q', (int(value) for value in values)).tobytes()
+    if column_type == "bool":
+        return bytes(1 if value else 0 for value in values)
+
+    offsets = array('Q', [0])
+    heap = bytearray()
+    for value in values:
+        heap += str(value).encode('utf-8')
+        offsets.append(len(heap))
+    return offsets.tobytes() + bytes(heap)
+
+
+def write_binary_table(filepath, columns, records):
+    """Записывает таблицу во временный файл и атомарно подменяет им filepath.
+
+    Подмена, а не перезапись, нужна потому, что старый файл может быть
+    открыт через mmap в этом же процессе.
+    """
+    records = records if isinstance(records, list) else list(records)
+    blocks = [
+        encode_column(col["type"], [record.get(col["name"]) for record in records])
+        for col in columns
+    ]
+
+    header = bytearray(HEADER.pack(
+        MAGIC, VERSION, BYTE_ORDERS[sys.byteorder], len(columns), len(records)
+    ))
+    for col in columns:
+        name = col["name"].encode('utf-8')
+        header += COLUMN_HEADER.pack(TYPE_CODES[col["type"]], len(name)) + name
+    header_size = len(header) + BLOCK.size * len(columns)
+
+    offset = header_size
+    layout = []
+    for block in blocks:
+        offset += -offset % ALIGNMENT
+        layout.append((offset, len(block)))
+        offset += len(block)
+    for block_offset, block_length in layout:
+        header += BLOCK.pack(block_offset, block_length)
+
+    temp_path = f"{filepath}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        for block, (block_offset, _) in zip(blocks, layout):
+            f.write(b"\0" * (block_offset - f.tell()))
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, filepath)
+
+
+class MappedIntColumn(IntColumn):
+
+    def __init__(self, buffer, rows):
+        self.raw = buffer
+        self.values = buffer.cast('q')
+
+    def to_column(self):
+        column = IntColumn()
+        column.values.frombytes(self.raw)
+        return column
+
+
+class MappedBoolColumn(BoolColumn):
+    # Коды 0/1 на диске совпадают с кодами BoolColumn, поэтому match наследуется
+
+    def __init__(self, buffer, rows):
+        super().__init__()
+        self.values = buffer
+
+    def to_column(self):
+        column = BoolColumn()
+        column.values.frombytes(self.values)
+        return column
+
+
+class MappedStrColumn:
+
+    def __init__(self, buffer, rows):
+        offsets_size = (rows + 1) * 8
+        self.offsets = buffer[:offsets_size].cast('Q')
+        self.heap = buffer[offsets_size:]
+
+    def get(self, position):
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return str(self.heap[start:end], 'utf-8')
+
+    def match(self, condition, positions):
+        if positions is None:
+            positions = range(len(self.offsets) - 1)
+
+        if isinstance(condition, Comparison):
+            return [i for i in positions if comparison_matches(self.get(i), condition)]
+
+        # Для равенства байты сравниваются прямо в отображенной памяти
+        target = str(condition).encode('utf-8')
+        offsets, heap = self.offsets, self.heap
+        return [i for i in positions if heap[offsets[i]:offsets[i + 1]] == target]
+
+    def match_predicate(self, test, positions):
+        if positions is None:
+            positions = range(len(self.offsets) - 1)
+        return [i for i in positions if test(self.get(i))]
+
+    def to_column(self):
+        column = StrColumn()
+        for position in range(len(self.offsets) - 1):
+            column.append(self.get(position))
+        return column
+
+
+MAPPED_COLUMN_TYPES = {
+    "int": MappedIntColumn,
+    "str": MappedStrColumn,
+    "bool": MappedBoolColumn,
+}
+
+
+class MappedTable(ColumnarTable):
+    """Таблица только для чтения поверх mmap файла в двоичном формате.
+
+    Фильтры сканируют столбцы прямо в отображенной памяти, а в словари
+    превращаются только строки результата.
+    """
+
+    def __init__(self, filepath):
+        with open(filepath, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        # Другие процессы открывают тот же файл и сверяют, что он не подменен
+        self.filepath = filepath
+        self.file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        buffer = memoryview(self._mmap)
+
+        magic, version, byte_order, column_count, rows = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Файл {filepath} не является таблицей в двоичном формате")
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            raise ValueError(f"Файл {filepath} записан с другим порядком байт")
+
+        position = HEADER.size
+        columns = []
+        for _ in range(column_count):
+            type_code, name_length = COLUMN_HEADER.unpack_from(buffer, position)
+            position += COLUMN_HEADER.size
+            name = str(buffer[position:position + name_length], 'utf-8')
+            position += name_length
+            columns.append({"name": name, "type": TYPE_NAMES[type_code]})
+
+        self.schema = columns
+        self.column_names = [col["name"] for col in columns]
+        self.columns = {}
+        for col in columns:
+            block_offset, block_length = BLOCK.unpack_from(buffer, position)
+            position += BLOCK.size
+            block = buffer[block_offset:block_offset + block_length]
+            self.columns[col["name"]] = MAPPED_COLUMN_TYPES[col["type"]](block, rows)
+        self._length = rows
+
+    def to_columnar(self):
+        table = ColumnarTable(self.schema)
+        table.columns = {
+            name: column.to_column() for name, column in self.columns.items()
+        }
+        table._length = self._length
+        return table
+
+    def append(self, record):
+        raise TypeError("Таблица открыта только для чтения")
+
+    def update(self, positions, set_clause):
+        raise TypeError("Таблица открыта только для чтения")
+
+    def delete(self, positions):
+        raise TypeError("Таблица открыта только для чтения")
+
+
+def read_binary_table(filepath):
+    return MappedTable(filepath)
@@ -0,0 +1,293 @@
+
+import operator
+from array import array
+
+from .indexes import comparison_matches, sort_key
+from .parser import RANGE_OPERATORS, And, Compare, Comparison, Not, Or
+from .predicates import Predicate, compile_where, convert_constant
+
+COMPARISON_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def scan(values, positions, predicate):
+    if positions is None:
+        return [i for i, value in enumerate(values) if predicate(value)]
+    return [i for i in positions if predicate(values[i])]
+
+
+def scan_equal(values, positions, target):
+    if positions is None:
+        return [i for i, value in enumerate(values) if value == target]
+    return [i for i in positions if values[i] == target]
+
+
+class IntColumn:
+    """Столбец int в виде array('q'): 8 байт на значение."""
+
+    def __init__(self):
+        self.values = array('q')
+
+    def append(self, value):
+        self.values.append(int(value))
+
+    def get(self, position):
+        return self.values[position]
+
+    def set(self, position, value):
+        self.values[position] = int(value)
+
+    def keep(self, positions):
+        self.values = array('q', (self.values[i] for i in positions))
+
+    def match(self, condition, positions):
+        if not isinstance(condition, Comparison):
+            # Равенство по строковому представлению, как у списка записей
+            text = str(condition)
+            try:
+                target = int(text)
+            except ValueError:
+                return []
+            if str(target) != text:
+                return []
+            return scan_equal(self.values, positions, target)
+
+        def matches(value):
+            return comparison_matches(value, condition)
+
+        if condition.op == "between":
+            low, high = (sort_key(bound, "int") for bound in condition.value)
+            if low[0] == 0 and high[0] == 0:
+                low, high = low[1], high[1]
+                return scan(self.values, positions, lambda value: low <= value <= high)
+            return scan(self.values, positions, matches)
+
+        kind, target = sort_key(condition.value, "int")
+        if kind != 0:
+            return scan(self.values, positions, matches)
+        compare = COMPARISON_OPERATORS[condition.op]
+        return scan(self.values, positions, lambda value: compare(value, target))
+
+    def match_predicate(self, test, positions):
+        return scan(self.values, positions, test)
+
+
+class EncodedColumn:
+    """Столбец с небольшим набором различных значений.
+
+    Хранит коды в массиве, а сами значения - в словаре. Условие проверяется
+    один раз для каждого различного значения, затем сканируются только коды.
+    """
+
+    typecode = 'I'
+
+    def __init__(self):
+        self.values = array(self.typecode)
+        self.dictionary = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self.codes[value] = code
+        return code
+
+    def convert(self, value):
+        return value
+
+    def append(self, value):
+        self.values.append(self.encode(self.convert(value)))
+
+    def get(self, position):
+        return self.dictionary[self.values[position]]
+
+    def set(self, position, value):
+        self.values[position] = self.encode(self.convert(value))
+
+    def keep(self, positions):
+        self.values = array(self.typecode, (self.values[i] for i in positions))
+
+    def match(self, condition, positions):
+        if isinstance(condition, Comparison):
+            matching = {
+                code for code, value in enumerate(self.dictionary)
+                if comparison_matches(value, condition)
+            }
+        else:
+            text = str(condition)
+            matching = {
+                code for code, value in enumerate(self.dictionary) if str(value) == text
+            }
+
+        return self.scan_codes(matching, positions)
+
+    def match_predicate(self, test, positions):
+        matching = {code for code, value in enumerate(self.dictionary) if test(value)}
+        return self.scan_codes(matching, positions)
+
+    def scan_codes(self, matching, positions):
+        if not matching:
+            return []
+        if len(matching) == 1:
+            return scan_equal(self.values, positions, next(iter(matching)))
+        return scan(self.values, positions, matching.__contains__)
+
+
+class StrColumn(EncodedColumn):
+    """Столбец str со словарным кодированием: повторяющиеся строки хранятся один раз."""
+
+    def convert(self, value):
+        return str(value)
+
+
+class BoolColumn(EncodedColumn):
+    """Столбец bool: по одному байту на значение."""
+
+    typecode = 'B'
+
+    def __init__(self):
+        super().__init__()
+        # Коды фиксированы, чтобы 0 всегда означал False, а 1 - True
+        self.encode(False)
+        self.encode(True)
+
+    def convert(self, value):
+        if isinstance(value, str):
+            return value.lower() == "true"
+        return bool(value)
+
+
+COLUMN_TYPES = {
+    "int": IntColumn,
+    "str": StrColumn,
+    "bool": BoolColumn,
+}
+
+
+class ColumnarTable:
+    """Таблица, хранящая каждый столбец отдельным типизированным массивом.
+
+    Строки материализуются в словари только для вывода результата.
+    """
+
+    def __init__(self, columns):
+        self.schema = columns
+        self.column_names = [col["name"] for col in columns]
+        self.columns = {col["name"]: COLUMN_TYPES[col["type"]]() for col in columns}
+        self._length = 0
+        # Растет при каждом изменении: по ней узнается устаревшая копия столбцов
+        self.version = 0
+
+    @classmethod
+    def from_records(cls, columns, records):
+        table = cls(columns)
+        for record in records:
+            table.append(record)
+        return table
+
+    def append(self, record):
+        for name, column in self.columns.items():
+            column.append(record[name])
+        self._length += 1
+        self.version += 1
+
+    def row(self, position):
+        return {name: self.columns[name].get(position) for name in self.column_names}
+
+    def rows(self, positions):
+        return [self.row(position) for position in positions]
+
+    def to_records(self):
+        return self.rows(range(self._length))
+
+    def filter(self, where_clause):
+        """Возвращает номера подходящих строк, проверяя условия по столбцам."""
+        predicate = compile_where(where_clause, self.schema)
+        if predicate is None:
+            return list(range(self._length))
+        positions = self.evaluate(predicate.ast, None, predicate.column_types)
+        return list(range(self._length)) if positions is None else positions
+
+    def evaluate(self, node, positions, column_types):
+        """Сужает positions (None - все строки) до строк, подходящих под node."""
+        if isinstance(node, And):
+            for item in node.items:
+                positions = self.evaluate(item, positions, column_types)
+                if positions is not None and not positions:
+                    return []
+            return positions
+
+        if isinstance(node, Or):
+            matched = set()
+            for item in node.items:
+                result = self.evaluate(item, positions, column_types)
+                if result is None:
+                    return positions
+                matched.update(result)
+            return sorted(matched)
+
+        if isinstance(node, Not):
+            excluded = self.evaluate(node.item, positions, column_types)
+            if excluded is None:
+                return []
+            excluded = set(excluded)
+            base = range(self._length) if positions is None else positions
+            return [i for i in base if i not in excluded]
+
+        column = self.columns.get(node.column)
+        if column is None:
+            # Отсутствующий столбец ведет себя как пустая строка
+            leaf = Predicate(node)
+            return positions if leaf.test({}) else []
+
+        if isinstance(node, Compare) and (
+            node.op in ("=", "between") or node.op in RANGE_OPERATORS
+        ):
+            condition = node.value
+            if node.op == "=":
+                try:
+                    condition = convert_constant(node.value, column_types[node.column])
+                except ValueError:
+                    return []
+            else:
+                condition = Comparison(node.op, node.value)
+            return column.match(condition, positions)
+
+        test = Predicate(node, self.schema).test
+        name = node.column
+        return column.match_predicate(lambda value: test({name: value}), positions)
+
+    def update(self, positions, set_clause):
+        self.version += 1
+        for column_name, value in set_clause.items():
+            column = self.columns.get(column_name)
+            if column is None:
+                continue
+            for position in positions:
+                column.set(position, value)
+
+    def delete(self, positions):
+        removed = set(positions)
+        survivors = [i for i in range(self._length) if i not in removed]
+        for column in self.columns.values():
+            column.keep(survivors)
+        self._length = len(survivors)
+        self.version += 1
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.rows(range(self._length)[item])
+        return self.row(range(self._length)[item])
+
+    def __iter__(self):
+        for position in range(self._length):
+            yield self.row(position)
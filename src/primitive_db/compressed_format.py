@@ -0,0 +1,87 @@
+
+import json
+import lzma
+import zlib
+from itertools import repeat
+
+# Формат сжатого файла таблицы: поток zlib или xz, внутри - строки JSON:
+#   первая - {"columns": [имена столбцов]},
+#   дальше по строке на запись - массив значений в порядке этих столбцов.
+# Имена столбцов не повторяются в каждой записи, как в снимке .json.
+CODECS = {
+    "zlib": (lambda: zlib.compressobj(6), zlib.decompressobj, zlib.error),
+    "lzma": (
+        lambda: lzma.LZMACompressor(preset=6), lzma.LZMADecompressor, lzma.LZMAError
+    ),
+}
+# Сколько сжатых байт читается за раз и сколько строк сжимается одним куском
+READ_CHUNK_SIZE = 256 * 1024
+WRITE_BATCH_ROWS = 5000
+
+
+def write_compressed_table(f, codec, columns, records):
+    """Пишет записи в открытый двоичный файл f, сжимая их пачками по мере обхода."""
+    compressor = CODECS[codec][0]()
+    names = [col["name"] for col in columns]
+    f.write(compressor.compress(
+        json.dumps({"columns": names}, ensure_ascii=False).encode('utf-8') + b"\n"
+    ))
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    batch = []
+    for record in records:
+        batch.append(encode([record.get(name) for name in names]))
+        if len(batch) >= WRITE_BATCH_ROWS:
+            f.write(compressor.compress(("\n".join(batch) + "\n").encode('utf-8')))
+            batch = []
+    if batch:
+        f.write(compressor.compress(("\n".join(batch) + "\n").encode('utf-8')))
+    f.write(compressor.flush())
+
+
+def iter_compressed_rows(f, codec):
+    """Распаковывает файл кусками и выдает пачки строк-массивов.
+
+    Первой выдается строка заголовка. В памяти одновременно находятся
+    только очередной кусок файла и его распакованный текст.
+    """
+    decompressor_type, error = CODECS[codec][1], CODECS[codec][2]
+    decompressor = decompressor_type()
+    pending = b""
+    try:
+        while not decompressor.eof:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            pending += decompressor.decompress(chunk)
+            complete, separator, pending = pending.rpartition(b"\n")
+            if separator:
+                # Переводы строк внутри значений экранированы, поэтому куски
+                # целых строк склеиваются в один массив и разбираются разом
+                yield json.loads(b"[" + complete.replace(b"\n", b",") + b"]")
+    except error as e:
+        raise ValueError(f"Файл {getattr(f, 'name', '')} поврежден: {e}") from e
+    if not decompressor.eof or pending:
+        raise ValueError(f"Файл {getattr(f, 'name', '')} оборван")
+
+
+def iter_record_batches(f, codec):
+    """Записи сжатого файла в виде словарей, пачками по одному куску файла."""
+    names = None
+    for rows in iter_compressed_rows(f, codec):
+        if names is None:
+            names = rows[0]["columns"]
+            rows = rows[1:]
+        yield list(map(dict, map(zip, repeat(names), rows)))
+
+
+def iter_compressed_table(f, codec):
+    for records in iter_record_batches(f, codec):
+        yield from records
+
+
+def read_compressed_table(filepath, codec):
+    records = []
+    with open(filepath, 'rb') as f:
+        for batch in iter_record_batches(f, codec):
+            records.extend(batch)
+    return records
@@ -1,8 +1,65 @@
 VALID_DATA_TYPES = {"int", "str", "bool"}
 
+# rows - список словарей, columnar - типизированные массивы по столбцам
+VALID_LAYOUTS = {"rows", "columnar"}
+
+# Размер пачки строк при массовой загрузке из файла
+BULK_LOAD_CHUNK_SIZE = 10000
+
+# Количество строк на одной странице вывода SELECT
+SELECT_PAGE_SIZE = 100
+
+# Ограничения кэша результатов SELECT
+CACHE_MAX_ENTRIES = 128
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Сколько разобранных команд хранится для повторного выполнения без разбора
+STATEMENT_CACHE_SIZE = 256
+
+# Колоночные таблицы с таким числом строк просматриваются несколькими процессами
+PARALLEL_SCAN_MIN_ROWS = 500000
+# На сколько диапазонов строк приходится один процесс (для равномерной загрузки)
+PARALLEL_CHUNKS_PER_WORKER = 4
+
+# Относительная стоимость чтения одной строки при полном просмотре и через индекс
+SCAN_ROW_COST = 1.0
+INDEX_ROW_COST = 2.0
+
+# json - текстовый снимок, binary - столбцы фиксированной ширины для чтения через mmap,
+# zlib и lzma - сжатые строки без имен столбцов, распаковываются потоком
+VALID_TABLE_FORMATS = {"json", "binary", "zlib", "lzma"}
+COMPRESSED_TABLE_FORMATS = {"zlib", "lzma"}
+
 METADATA_FILE = "db_meta.json"
 DATA_DIR = "data"
 TABLE_DATA_EXTENSION = ".json"
+TABLE_BINARY_EXTENSION = ".tbl"
+TABLE_COMPRESSED_EXTENSIONS = {"zlib": ".zz", "lzma": ".xz"}
+TABLE_LOG_EXTENSION = ".log"
+# Сегменты таблицы лежат в data/<таблица>/seg_<номер>.json (.tbl, .zz, .xz)
+# со своими журналами
+SEGMENT_FILE_PREFIX = "seg_"
+# Сколько ID приходится на сегмент, если partition вызван без размера
+DEFAULT_SEGMENT_ROWS = 10000
+# Список файлов незавершенной фиксации: по нему она доводится до конца после сбоя
+COMMIT_JOURNAL_FILE = f"{DATA_DIR}/.commit"
+
+# Границы корзин гистограмм задержек (секунды) и префикс метрик для Prometheus
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+METRICS_PREFIX = "primitive_db"
+# Сколько самых дорогих функций показывает profile
+PROFILE_TOP_ENTRIES = 20
+
+# Сокет, через который сервер принимает клиентов
+SOCKET_PATH = "database.sock"
+
+# Размеры синтетических таблиц, замеров на операцию и файл результатов database bench
+BENCH_SIZES = (10000, 100000, 1000000)
+BENCH_SAMPLES = 20
+BENCH_OUTPUT_FILE = "bench_results.json"
+
+# После стольких записей в журнале таблица сворачивается в снимок
+LOG_COMPACTION_THRESHOLD = 1000
 
 HELP_MESSAGE = """
 ***Операции с данными***
@@ -12,23 +69,108 @@ HELP_MESSAGE = """
 <command> select from <имя_таблицы> where <столбец> = <значение>-
 прочитать записи по условию
 <command> select from <имя_таблицы> - прочитать все записи
-<command> update <имя_таблицы> set <столбец1> = <новое_значение1>
-where <столбец_условия> = <значение_условия> - обновить запись
-<command> delete from <имя_таблицы> where <столбец> = <значение>-
-удалить запись
+<command> select from <имя_таблицы> where <столбец> <|<=|>|>= <значение>-
+прочитать записи из диапазона
+<command> select from <имя_таблицы> where <столбец> between <от> and <до>-
+прочитать записи из диапазона
+<command> select from <имя_таблицы> where <условие> and|or <условие>-
+прочитать записи по составному условию (поддерживаются not, скобки,
+!=, <>, in (<значение1>, ...), like '<шаблон с % и _>')
+<command> select from <имя_таблицы> [where ...] order by <столбец> [asc|desc] limit <N>-
+прочитать первые N записей в заданном порядке
+<command> select from <имя_таблицы> [where ...] limit <N> offset <M>-
+прочитать N записей, пропустив первые M
+<command> select <столбец>, count(*), sum|avg|min|max(<столбец>) from <имя_таблицы>
+[where ...] [group by <столбец>] [order by ...] - посчитать агрегаты по группам
+<command> select <столбец1>, <столбец2> from <имя_таблицы> [where ...]-
+прочитать только указанные столбцы
+<command> select ... from <таблица1> join <таблица2> on <таблица1>.<столбец> =
+<таблица2>.<столбец> [where ...] - соединить таблицы по равенству столбцов
+(столбцы результата называются <таблица>.<столбец>)
+<command> prepare <имя> as <команда с параметрами ?>-
+разобрать insert/select/update/delete один раз для повторного выполнения
+(параметры ? допускаются и в LIMIT/OFFSET)
+<command> execute <имя> (<значение1>, ...) - выполнить подготовленную команду
+<command> explain select ... - показать выбранный план запроса, оценку и
+фактическое число строк и время выполнения
+<command> export <имя_таблицы|"select ..."> to <файл> [csv|jsonl]-
+выгрузить таблицу или результат запроса в файл
+<command> update <имя_таблицы> set <столбец1> = <новое_значение1>[, <столбец2> = ...]
+where <условие> - обновить записи (значения проверяются по типам столбцов)
+<command> delete from <имя_таблицы> where <условие>-
+удалить записи
+<command> load <имя_таблицы> from <файл.csv|файл.jsonl> - загрузить записи из файла
 <command> info <имя_таблицы> - вывести информацию о таблице
-<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип>-
-создать таблицу
+<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> [<формат>]-
+создать таблицу (формат файла - как в convert, по умолчанию json)
 <command> list_tables - показать список всех таблиц
 <command> drop_table <имя_таблицы> - удалить таблицу
+<command> create_index <имя_таблицы> <столбец> [hash|sorted] - создать индекс по столбцу
+<command> drop_index <имя_таблицы> <столбец> - удалить индекс по столбцу
+<command> set_layout <имя_таблицы> rows|columnar - выбрать представление таблицы
+в памяти (для columnar индексы не используются)
+<command> convert <имя_таблицы> json|binary|zlib|lzma - перевести файл таблицы
+в другой формат (zlib и lzma - сжатый файл без повторяющихся имен столбцов)
+<command> compact <имя_таблицы> - свернуть журнал изменений в файл таблицы
+<command> partition <имя_таблицы> [<строк>|off] - разбить таблицу на сегменты
+по диапазонам ID (по умолчанию 10000): запросы читают только сегменты,
+которые не отсекает их статистика min/max, вставка - только последний
+(off - снова один файл; для columnar недоступно)
 <command> clear_cache - очистить кэш запросов
 <command> cache_stats - показать статистику кэша
+<command> cache_limit <записей> [байт] - задать размер кэша запросов
+<command> parallel_scan <строк> [процессов] - просматривать колоночные таблицы
+от указанного размера в нескольких процессах (1 процесс - без параллельности)
+<command> stats [json|prometheus [<файл>]] - показать счетчики и задержки
+операций и этапов (разбор, загрузка, фильтрация, вывод, запись) или выгрузить их
+<command> stats reset - сбросить метрики
+<command> profile <команда> - выполнить команду под cProfile и показать
+самые дорогие функции
+
+Транзакции:
+<command> begin - начать транзакцию: изменения копятся в памяти
+<command> commit - атомарно записать все изменения транзакции на диск
+<command> rollback - отменить изменения транзакции
+
+Пакетный режим:
+database --script <файл> [--yes] [--atomic] - выполнить команды из файла
+(или из stdin, если он не терминал); --yes подтверждает удаления,
+--atomic отменяет все изменения при первой ошибке
+database -c "<команда>" [--yes] - выполнить одну команду и выйти; читаются
+только нужные ей метаданные и таблицы (database connect -c - на сервере)
+
+Сервер:
+database serve [--socket <путь>] - обслуживать нескольких клиентов одним
+процессом: select разных клиентов идут параллельно, изменения одной
+таблицы - по очереди (транзакции в этом режиме недоступны)
+database connect [--socket <путь>] [--yes] - подключиться к серверу
+
+Замеры производительности:
+database bench [--sizes 10000,100000] [--samples N] [--output <файл.json>]
+[--baseline <файл.json>] - замерить основные операции на синтетических
+таблицах и сохранить результаты (сравнение с прошлым запуском - --baseline)
 
 Общие команды:
 <command> exit - выход из программы
 <command> help - справочная информация
 """
 
+SERVER_MESSAGES = {
+    "listening": "Сервер ожидает клиентов на {path}",
+    "stopped": "Сервер остановлен.",
+    "disconnected": "Сервер закрыл соединение.",
+    "connect_failed": "Не удалось подключиться к серверу {path}: {error}",
+}
+
+BENCH_MESSAGES = {
+    "size_started": "Замер на таблице из {rows} строк...",
+    "saved": "Результаты сохранены в {file}",
+    "baseline_missing": "Нет замеров в {file} для сравнения: {error}",
+    "invalid_sizes": (
+        "Ошибка: Размеры таблиц задаются целыми числами через запятую: {value}"
+    ),
+}
+
 ERROR_MESSAGES = {
     "table_not_found": 'Ошибка: Таблица "{table_name}" не существует.',
     "table_exists": 'Ошибка: Таблица "{table_name}" уже существует.',
@@ -40,8 +182,58 @@ ERROR_MESSAGES = {
                              'получено {actual}'),
     "invalid_type": ('Ошибка: Неверный тип для столбца "{column}". '
                      'Ожидается {expected_type}'),
+    "column_not_found": ('Ошибка: Столбец "{column}" не найден '
+                         'в таблице "{table_name}".'),
+    "id_not_updatable": "Ошибка: Столбец ID назначается автоматически и не изменяется.",
+    "index_exists": ('Ошибка: Индекс по столбцу "{column}" таблицы "{table_name}" '
+                     'уже существует.'),
+    "invalid_index_type": ('Ошибка: Неизвестный тип индекса "{index_type}". '
+                           'Допустимые типы: {valid_types}'),
+    "invalid_index_column": ('Ошибка: Упорядоченный индекс нельзя построить по столбцу '
+                             '"{column}" типа {column_type}.'),
+    "invalid_layout": ('Ошибка: Неизвестное представление "{layout}". '
+                       'Допустимые: {valid_layouts}'),
+    "invalid_segment_size": ('Ошибка: Размер сегмента "{size}" должен быть '
+                             'положительным целым числом или off.'),
+    "columnar_segments": ('Ошибка: Таблица "{table_name}" в представлении columnar '
+                          'не разбивается на сегменты.'),
+    "invalid_table_format": ('Ошибка: Неизвестный формат "{table_format}". '
+                             'Допустимые: {valid_formats}'),
+    "index_not_found": ('Ошибка: Индекс по столбцу "{column}" таблицы "{table_name}" '
+                        'не найден.'),
+    "missing_column": 'Ошибка: В файле нет столбца "{column}".',
+    "invalid_row_value": ('Ошибка: Строка {row}: значение "{value}" столбца "{column}" '
+                          'не является {expected_type}'),
+    "unsupported_file": 'Ошибка: Неподдерживаемый файл "{file}". Допустимы: {formats}',
+    "prepared_not_found": 'Ошибка: Подготовленная команда "{name}" не найдена.',
+    "params_count_mismatch": ('Ошибка: Команде "{name}" нужно {expected} параметров, '
+                              'получено {actual}'),
+    "invalid_prepared": 'Ошибка: Подготовить можно только команды: {commands}',
+    "invalid_page_param": ('Ошибка: Значение {option} должно быть целым '
+                           'неотрицательным числом, получено "{value}"'),
+    "invalid_aggregate": ('Ошибка: Функция {func} применима только к столбцам int, '
+                          'а "{column}" имеет тип {column_type}.'),
+    "ambiguous_column": (
+        'Ошибка: Столбец "{column}" есть в таблицах {tables}; '
+        'укажите <таблица>.<столбец>.'
+    ),
+    "join_same_table": (
+        'Ошибка: Соединение таблицы "{table_name}" с самой собой '
+        'не поддерживается.'
+    ),
+    "not_grouped": (
+        'Ошибка: Столбец "{column}" должен входить в GROUP BY '
+        'или в агрегатную функцию.'
+    ),
+    "transaction_active": "Ошибка: Транзакция уже начата.",
+    "no_transaction": "Ошибка: Нет активной транзакции.",
+    "not_in_transaction": 'Ошибка: Команда "{command}" недоступна внутри транзакции.',
+    "server_command": 'Ошибка: Команда "{command}" недоступна при работе через сервер.',
+    "script_failed": 'Ошибка в строке {line}: "{command}". Изменения пакета отменены.',
     "file_not_found": "Файл не найден: {file}",
     "parse_error": "Ошибка разбора команды: {error}",
+    "invalid_select_tail": ("Ошибка разбора команды: Некорректное "
+                            "GROUP BY/ORDER BY/LIMIT/OFFSET"),
     "unknown_command": 'Функции "{command}" нет. Попробуйте снова.',
     "insufficient_args": "Ошибка: Недостаточно аргументов. Использование: {usage}",
 }
@@ -51,16 +243,87 @@ SUCCESS_MESSAGES = {
     "table_dropped": 'Таблица "{table_name}" успешно удалена.',
     "record_inserted": ('Запись с ID={record_id} успешно '
                         'добавлена в таблицу "{table_name}".'),
+    "records_loaded": 'Загружено {count} записей в таблицу "{table_name}".',
+    "records_exported": 'Выгружено {count} записей в файл "{file}".',
     "records_updated": ('Запись(и) ({count} шт.) в таблице "{table_name}" '
                        'успешно обновлена(ы).'),
     "records_deleted": ('Запись(и) ({count} шт.) успешно удалена(ы) '
                        'из таблицы "{table_name}".'),
+    "table_compacted": 'Журнал таблицы "{table_name}" свернут в снимок.',
+    "index_created": ('Индекс ({index_type}) по столбцу "{column}" '
+                      'таблицы "{table_name}" создан.'),
+    "index_dropped": 'Индекс по столбцу "{column}" таблицы "{table_name}" удален.',
+    "layout_changed": 'Таблица "{table_name}" переведена в представление {layout}.',
+    "table_partitioned": 'Таблица "{table_name}" разбита на сегменты по {size} ID.',
+    "table_merged": 'Сегменты таблицы "{table_name}" объединены в один файл.',
+    "table_converted": 'Таблица "{table_name}" сохранена в формате {table_format}.',
+    "transaction_started": "Транзакция начата.",
+    "transaction_committed": "Транзакция зафиксирована.",
+    "transaction_rolled_back": "Транзакция отменена.",
+    "transaction_discarded": "Незафиксированная транзакция отменена.",
+    "statement_prepared": 'Команда "{name}" подготовлена (параметров: {count}).',
     "cache_cleared": "Кэш запросов очищен.",
+    "cache_configured": "Ограничения кэша запросов обновлены.",
+    "parallel_configured": "Параметры параллельного просмотра обновлены.",
     "operation_cancelled": "Операция отменена пользователем.",
 }
 
+PLAN_ACCESS_LABELS = {
+    "empty": "пустой результат (условие невыполнимо по статистике)",
+    "cache": "кэш результатов",
+    "primary_key": "первичный ключ ID",
+    "index": "индекс {index_type} по столбцу {column}",
+    "scan": "полный просмотр таблицы",
+    "column_scan": "просмотр столбцов",
+    "segments": "просмотр сегментов: {read} из {total}",
+}
+
+AGGREGATE_LABELS = {
+    "index": "по упорядоченному индексу и числу строк, без просмотра таблицы",
+    "columns": "по массивам столбцов целиком",
+    "hash": "хеш-агрегация за один проход",
+}
+
+JOIN_LABELS = {
+    "hash": "хеш-таблица по {build} (~{rows} строк), поток строк {probe}",
+    "index": "по индексу столбца {column} таблицы {build}, поток строк {probe}",
+}
+
+PARALLEL_SCAN_LABEL = "{access}, параллельно в {workers} процессах"
+
+EXPLAIN_MESSAGES = {
+    "plan": "План запроса: {query}",
+    "access": "  Доступ: {access}",
+    "order": "  Порядок: по индексу {index_type} столбца {column}",
+    "estimate": "  Оценка: {rows} строк(и), стоимость {cost:.1f}",
+    "join_access": "  Доступ к {table}: {access}",
+    "join": "  Соединение: {method}",
+    "aggregate": "  Агрегация: {method}",
+    "actual": "  Фактически: {rows} строк(и) за {elapsed:.3f} секунд",
+}
+
+METRICS_MESSAGES = {
+    "counters": "Счетчики:",
+    "histograms": "Задержки, мс (p50/p99 - верхние границы корзин):",
+    "counter": "  {name}: {value}",
+    "histogram": "  {name}: вызовов {count}, среднее {avg:.3f}, p50 {p50}, p99 {p99}",
+    "empty": "Замеров пока нет.",
+    "saved": "Метрики ({format}) записаны в файл {file}",
+    "reset": "Метрики сброшены.",
+    "profile": "Профиль команды (первые {count} функций по общему времени):",
+}
+
 COMMANDS = {
-    "exit", "help", "clear_cache", "cache_stats",
-    "create_table", "drop_table", "list_tables", "info",
-    "insert", "select", "update", "delete"
+    "exit", "help", "clear_cache", "cache_stats", "cache_limit", "parallel_scan",
+    "create_table", "drop_table", "list_tables", "info", "compact",
+    "create_index", "drop_index", "set_layout", "convert",
+    "partition", "insert", "select", "update", "delete", "load", "export", "explain",
+    "prepare", "execute", "begin", "commit", "rollback", "stats", "profile"
+}
+
+# Команды, которым не нужны метаданные: для них db_meta.json не читается
+# (execute и profile читают их сами, когда доходят до своей команды)
+METADATA_FREE_COMMANDS = {
+    "exit", "help", "clear_cache", "cache_stats", "cache_limit", "parallel_scan",
+    "prepare", "execute", "stats", "profile"
 }
@@ -1,7 +1,31 @@
 
-from prettytable import PrettyTable
-from .decorators import handle_db_errors, confirm_action, log_time, cacher
-from .constants import VALID_DATA_TYPES, ERROR_MESSAGES, SUCCESS_MESSAGES
+import heapq
+import time
+from itertools import islice
+
+from .columnar import ColumnarTable
+from .constants import (
+    ERROR_MESSAGES,
+    SELECT_PAGE_SIZE,
+    SUCCESS_MESSAGES,
+    VALID_DATA_TYPES,
+    VALID_LAYOUTS,
+    VALID_TABLE_FORMATS,
+)
+from .decorators import cacher, confirm_action, handle_db_errors, log_time
+from .indexes import (
+    INDEX_TYPES,
+    ORDERED_COLUMN_TYPES,
+    HashIndex,
+    SortedIndex,
+    add_to_indexes,
+    discard_from_indexes,
+    find_candidates,
+    sort_key,
+)
+from .metrics import metrics
+from .parallel import filter_positions
+from .predicates import compile_where
 
 
 def validate_column_definitions(columns):
@@ -31,11 +55,15 @@ def validate_column_definitions(columns):
 
 def validate_value_type(value, expected_type):
     if expected_type == "int":
+        if isinstance(value, bool):
+            return False
         return isinstance(value, int) or (isinstance(value, str) and value.isdigit())
     elif expected_type == "str":
         return isinstance(value, str)
     elif expected_type == "bool":
-        return isinstance(value, bool) or value.lower() in ["true", "false"]
+        return isinstance(value, bool) or (
+            isinstance(value, str) and value.lower() in ["true", "false"]
+        )
     return False
 
 
@@ -51,8 +79,35 @@ def convert_value(value, expected_type):
     return value
 
 
+def convert_set_clause(table_name, columns, set_clause):
+    """Проверяет SET по схеме и приводит значения к типам столбцов.
+
+    Вызывается один раз на команду; исходный set_clause (он может лежать
+    в кэше разобранных команд) не меняется.
+    """
+    column_types = {col["name"]: col["type"] for col in columns}
+    converted = {}
+    for column, value in set_clause.items():
+        if column == "ID":
+            raise ValueError(ERROR_MESSAGES["id_not_updatable"])
+        if column not in column_types:
+            raise ValueError(ERROR_MESSAGES["column_not_found"].format(
+                column=column, table_name=table_name
+            ))
+        expected_type = column_types[column]
+        if expected_type == "str" and not isinstance(value, str):
+            # Без кавычек число или true/false уже разобраны как int/bool
+            value = str(value).lower() if isinstance(value, bool) else str(value)
+        if not validate_value_type(value, expected_type):
+            raise ValueError(ERROR_MESSAGES["invalid_type"].format(
+                column=column, expected_type=expected_type
+            ))
+        converted[column] = convert_value(value, expected_type)
+    return converted
+
+
 @handle_db_errors
-def create_table(metadata, table_name, columns):
+def create_table(metadata, table_name, columns, table_format=None):
     if table_name in metadata:
         raise ValueError(ERROR_MESSAGES["table_exists"].format(table_name=table_name))
     
@@ -60,13 +115,22 @@ def create_table(metadata, table_name, columns):
     if error:
         raise ValueError(error)
     
+    if table_format is not None and table_format not in VALID_TABLE_FORMATS:
+        raise ValueError(ERROR_MESSAGES["invalid_table_format"].format(
+            table_format=table_format,
+            valid_formats=", ".join(sorted(VALID_TABLE_FORMATS))
+        ))
+
     table_columns = [{"name": "ID", "type": "int"}]
     table_columns.extend(validated_columns)
     
     metadata[table_name] = {
         "columns": table_columns,
-        "data": []
+        "data": [],
+        "next_id": 1
     }
+    if table_format is not None:
+        metadata[table_name]["format"] = table_format
     
     columns_str = ", ".join([f'{col["name"]}:{col["type"]}' for col in table_columns])
     
@@ -98,30 +162,57 @@ def list_tables(metadata):
 
 
 @handle_db_errors
-def get_table_info(metadata, table_name):
+def get_table_info(metadata, table_name, table_data=None):
     if table_name not in metadata:
         raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
     
     table_info = metadata[table_name]
+    if table_data is None:
+        table_data = table_info["data"]
     columns_str = ", ".join([f'{col["name"]}:{col["type"]}' for col in table_info["columns"]])
-    count = len(table_info["data"])
+    count = len(table_data)
     
     info = f"Таблица: {table_name}\n"
     info += f"Столбцы: {columns_str}\n"
     info += f"Количество записей: {count}"
+    segments = table_info.get("segments")
+    if segments is not None:
+        info += f"\nСегменты: {len(segments['stats'])} по {segments['size']} ID"
     
     return info, None
 
 
+def get_next_id(table_data):
+    if isinstance(table_data, ColumnarTable):
+        ids = table_data.columns["ID"].values
+    else:
+        ids = (record["ID"] for record in table_data)
+    return max(ids, default=0) + 1
+
+
+def reserve_ids(table_info, count=1, table_data=None):
+    """Резервирует count идущих подряд ID из счетчика таблицы.
+
+    Счетчик next_id хранится в метаданных и только растет, поэтому ID
+    удаленных записей не выдаются повторно. Для таблиц, созданных до
+    появления счетчика, он один раз вычисляется по данным.
+    """
+    if "next_id" not in table_info:
+        table_info["next_id"] = get_next_id([] if table_data is None else table_data)
+    first_id = table_info["next_id"]
+    table_info["next_id"] = first_id + count
+    return first_id
+
+
 @handle_db_errors
 @log_time
-def insert(metadata, table_name, values):
+def insert(metadata, table_name, values, table_data=None, indexes=None):
     if table_name not in metadata:
         raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
     
     table_info = metadata[table_name]
     columns = table_info["columns"][1:]
-    data = table_info["data"]
+    data = table_info["data"] if table_data is None else table_data
     
     if len(values) != len(columns):
         raise ValueError(ERROR_MESSAGES["values_count_mismatch"].format(
@@ -141,132 +232,410 @@ def insert(metadata, table_name, values):
         converted_value = convert_value(value, col_type)
         validated_values.append(converted_value)
     
-    if data:
-        last_id = max([record["ID"] for record in data])
-        new_id = last_id + 1
-    else:
-        new_id = 1
+    new_id = reserve_ids(table_info, 1, data)
     
     record = {"ID": new_id}
     for i, column in enumerate(columns):
         record[column["name"]] = validated_values[i]
     
     data.append(record)
+    add_to_indexes(indexes, record)
     
     return record, SUCCESS_MESSAGES["record_inserted"].format(
         record_id=new_id, table_name=table_name
     )
 
 
+def record_matches(record, where_clause):
+    return compile_where(where_clause).test(record)
+
+
+def count_filtered(scanned, returned, elapsed):
+    metrics.increment("rows_scanned_total", scanned)
+    metrics.increment("rows_returned_total", returned)
+    metrics.observe("stage_seconds", elapsed, stage="filter")
+
+
+def filter_records(table_data, where_clause, indexes=None):
+    predicate = compile_where(where_clause)
+    start = time.perf_counter()
+    if isinstance(table_data, ColumnarTable):
+        positions = filter_positions(table_data, predicate)
+        count_filtered(len(table_data), len(positions), time.perf_counter() - start)
+        return table_data.rows(positions)
+
+    candidates = find_candidates(indexes, predicate.conjuncts)
+    if candidates is None:
+        candidates = table_data
+    test = predicate.test
+    result = [record for record in candidates if test(record)]
+    count_filtered(len(candidates), len(result), time.perf_counter() - start)
+    return result
+
+
+def iter_records(table_data, where_clause=None, indexes=None):
+    """Лениво отдает подходящие записи, не собирая промежуточный список.
+
+    Время фильтрации считается без времени, которое вызывающий тратит
+    между записями.
+    """
+    predicate = compile_where(where_clause)
+    if predicate is None:
+        yield from table_data
+        return
+
+    start = time.perf_counter()
+    elapsed = 0.0
+    scanned = returned = 0
+    try:
+        if isinstance(table_data, ColumnarTable):
+            positions = filter_positions(table_data, predicate)
+            scanned = len(table_data)
+            for position in positions:
+                returned += 1
+                record = table_data.row(position)
+                elapsed += time.perf_counter() - start
+                yield record
+                start = time.perf_counter()
+        else:
+            candidates = find_candidates(indexes, predicate.conjuncts)
+            if candidates is None:
+                candidates = table_data
+            test = predicate.test
+            for record in candidates:
+                scanned += 1
+                if test(record):
+                    returned += 1
+                    elapsed += time.perf_counter() - start
+                    yield record
+                    start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+    finally:
+        # Остановленный на limit поток учитывается тоже
+        count_filtered(scanned, returned, elapsed)
+
+
+def page_bounds(offset, limit):
+    start = offset or 0
+    return start, None if limit is None else start + limit
+
+
+def order_records(table_data, where_clause, indexes, order_by, descending, limit,
+                  offset=0):
+    """Возвращает записи в порядке order_by, используя упорядоченный индекс.
+
+    С индексом записи читаются уже отсортированными и чтение останавливается
+    на limit; без индекса для top-N используется куча вместо полной сортировки.
+    """
+    start, stop = page_bounds(offset, limit)
+    predicate = compile_where(where_clause)
+    index = (indexes or {}).get(order_by)
+    if isinstance(index, SortedIndex):
+        matching = (
+            record for record in index.iter_ordered(descending)
+            if predicate is None or predicate.test(record)
+        )
+        return list(islice(matching, start, stop))
+
+    records = iter_records(table_data, where_clause, indexes)
+
+    def key(record):
+        return sort_key(record.get(order_by, ""))
+
+    if stop is not None:
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(stop, records, key=key)[start:]
+    return sorted(records, key=key, reverse=descending)[start:]
+
+
+def run_select(table_data, where_clause, indexes, order_by, descending, limit,
+               offset=0):
+    if order_by is not None:
+        return order_records(
+            table_data, where_clause, indexes, order_by, descending, limit, offset
+        )
+
+    if limit is None and not offset:
+        if where_clause is None:
+            return table_data
+        return filter_records(table_data, where_clause, indexes)
+
+    start, stop = page_bounds(offset, limit)
+    return list(islice(iter_records(table_data, where_clause, indexes), start, stop))
+
+
+def select_query_key(where_clause=None, order_by=None, descending=False, limit=None,
+                     offset=0):
+    return (f"where={where_clause} order_by={order_by} desc={descending} "
+            f"limit={limit} offset={offset}")
+
+
 @handle_db_errors
 @log_time
-def select(table_data, where_clause=None, use_cache=True):
-    """Выбирает записи из таблицы."""
-    if where_clause is None:
+def select(table_data, where_clause=None, use_cache=True, indexes=None,
+           order_by=None, descending=False, limit=None, offset=0, table_name=None):
+    """Выбирает записи из таблицы.
+
+    Результат кэшируется только при известном table_name, чтобы одинаковые
+    условия для разных таблиц не смешивались.
+    """
+    if where_clause is None and order_by is None and limit is None and not offset:
         return table_data
     
-    if use_cache:
-        cache_key = f"select_where_{hash(str(where_clause))}"
-        
-        def get_filtered_data():
-            filtered = []
-            for record in table_data:
-                match = True
-                for column, value in where_clause.items():
-                    if str(record.get(column, "")) != str(value):
-                        match = False
-                        break
-                if match:
-                    filtered.append(record)
-            return filtered
-        
-        return cacher(cache_key, get_filtered_data)
+    where_clause = compile_where(where_clause)
+    args = (table_data, where_clause, indexes, order_by, descending, limit, offset)
+    if use_cache and table_name is not None:
+        query_key = select_query_key(where_clause, order_by, descending, limit, offset)
+        return cacher(cacher.key(table_name, query_key), run_select, *args)
     else:
-        filtered = []
-        for record in table_data:
-            match = True
-            for column, value in where_clause.items():
-                if str(record.get(column, "")) != str(value):
-                    match = False
-                    break
-            if match:
-                filtered.append(record)
-        
-        return filtered
+        return run_select(*args)
 
 
 @handle_db_errors
-def update(table_data, set_clause, where_clause):
-    updated_count = 0
+def update(table_data, set_clause, where_clause, indexes=None, access_indexes=None):
+    """Обновляет подходящие записи за один проход.
+
+    set_clause должен быть уже проверен convert_set_clause. indexes
+    поддерживаются в актуальном состоянии (меняются только индексы по
+    столбцам из SET, пачкой), а для поиска записей используются
+    access_indexes (по умолчанию те же indexes).
+    """
+    where_clause = compile_where(where_clause)
+    if access_indexes is None:
+        access_indexes = indexes
+    if isinstance(table_data, ColumnarTable):
+        positions = filter_positions(table_data, where_clause)
+        table_data.update(positions, set_clause)
+        return table_data, [table_data.columns["ID"].get(i) for i in positions]
+
+    matched = filter_records(table_data, where_clause, access_indexes)
+    changed = [
+        index for column, index in (indexes or {}).items() if column in set_clause
+    ]
+    for index in changed:
+        index.discard(matched)
     
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if str(record.get(column, "")) != str(value):
-                match = False
-                break
-        
-        if match:
-            for column, new_value in set_clause.items():
-                if column in record:
-                    record[column] = new_value
-            updated_count += 1
+    assignments = list(set_clause.items())
+    for record in matched:
+        for column, new_value in assignments:
+            if column in record:
+                record[column] = new_value
     
-    return table_data, updated_count
+    for index in changed:
+        index.extend(matched)
+    return table_data, [record["ID"] for record in matched]
 
 
 @handle_db_errors
 @confirm_action("удаление записей")
-def delete(table_data, where_clause):
-    to_delete = []
-    
-    for i, record in enumerate(table_data):
-        match = True
-        for column, value in where_clause.items():
-            if str(record.get(column, "")) != str(value):
-                match = False
-                break
-        
-        if match:
-            to_delete.append(i)
-    
+def delete(table_data, where_clause, indexes=None, access_indexes=None):
+    where_clause = compile_where(where_clause)
+    if access_indexes is None:
+        access_indexes = indexes
     deleted_ids = []
-    for index in sorted(to_delete, reverse=True):
-        deleted_ids.append(table_data[index]["ID"])
-        del table_data[index]
+    if isinstance(table_data, ColumnarTable):
+        positions = filter_positions(table_data, where_clause)
+        deleted_ids = [table_data.columns["ID"].get(i) for i in reversed(positions)]
+        table_data.delete(positions)
+        to_delete = positions
+    else:
+        to_delete = filter_records(table_data, where_clause, access_indexes)
+
+    if to_delete and not deleted_ids:
+        # Выжившие записи собираются одним проходом, индексы чистятся пачкой
+        deleted = {id(record) for record in to_delete}
+        discard_from_indexes(indexes, to_delete)
+        table_data[:] = [record for record in table_data if id(record) not in deleted]
+        deleted_ids = [record["ID"] for record in reversed(to_delete)]
     deleted_count = len(to_delete)
     if deleted_ids:
         ids_str = ", ".join(map(str, deleted_ids))
-        return table_data, deleted_count, f'Удалены записи с ID: {ids_str}'
+        return table_data, deleted_ids, f'Удалены записи с ID: {ids_str}'
     
-    return table_data, deleted_count, SUCCESS_MESSAGES["records_deleted"].format(
+    return table_data, deleted_ids, SUCCESS_MESSAGES["records_deleted"].format(
         count=deleted_count, table_name="таблицы"
     )
 
 
+@handle_db_errors
+def create_index(metadata, table_name, column, index_type=HashIndex.kind):
+    if table_name not in metadata:
+        raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+
+    table_info = metadata[table_name]
+    if column not in [col["name"] for col in table_info["columns"]]:
+        raise ValueError(ERROR_MESSAGES["column_not_found"].format(
+            column=column, table_name=table_name
+        ))
+
+    indexes = table_info.setdefault("indexes", [])
+    if any(definition["column"] == column for definition in indexes):
+        raise ValueError(ERROR_MESSAGES["index_exists"].format(
+            column=column, table_name=table_name
+        ))
+
+    if index_type not in INDEX_TYPES:
+        raise ValueError(ERROR_MESSAGES["invalid_index_type"].format(
+            index_type=index_type, valid_types=", ".join(INDEX_TYPES)
+        ))
+
+    column_type = next(
+        col["type"] for col in table_info["columns"] if col["name"] == column
+    )
+    if index_type == SortedIndex.kind and column_type not in ORDERED_COLUMN_TYPES:
+        raise ValueError(ERROR_MESSAGES["invalid_index_column"].format(
+            column=column, column_type=column_type
+        ))
+
+    indexes.append({"column": column, "type": index_type})
+    return metadata, SUCCESS_MESSAGES["index_created"].format(
+        column=column, table_name=table_name, index_type=index_type
+    )
+
+
+@handle_db_errors
+def set_table_layout(metadata, table_name, layout):
+    if table_name not in metadata:
+        raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+
+    if layout not in VALID_LAYOUTS:
+        raise ValueError(ERROR_MESSAGES["invalid_layout"].format(
+            layout=layout, valid_layouts=", ".join(sorted(VALID_LAYOUTS))
+        ))
+
+    if layout == "columnar" and "segments" in metadata[table_name]:
+        raise ValueError(
+            ERROR_MESSAGES["columnar_segments"].format(table_name=table_name)
+        )
+
+    metadata[table_name]["layout"] = layout
+    return metadata, SUCCESS_MESSAGES["layout_changed"].format(
+        table_name=table_name, layout=layout
+    )
+
+
+@handle_db_errors
+def set_table_format(metadata, table_name, table_format):
+    if table_name not in metadata:
+        raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+
+    if table_format not in VALID_TABLE_FORMATS:
+        raise ValueError(ERROR_MESSAGES["invalid_table_format"].format(
+            table_format=table_format,
+            valid_formats=", ".join(sorted(VALID_TABLE_FORMATS))
+        ))
+
+    metadata[table_name]["format"] = table_format
+    return metadata, SUCCESS_MESSAGES["table_converted"].format(
+        table_name=table_name, table_format=table_format
+    )
+
+
+@handle_db_errors
+def set_table_segments(metadata, table_name, size):
+    """Задает разбиение таблицы на сегменты по size ID; size "off" - один файл."""
+    if table_name not in metadata:
+        raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+
+    table_info = metadata[table_name]
+    if size == "off":
+        table_info.pop("segments", None)
+        return metadata, SUCCESS_MESSAGES["table_merged"].format(table_name=table_name)
+
+    if not str(size).isdigit() or int(size) < 1:
+        raise ValueError(ERROR_MESSAGES["invalid_segment_size"].format(size=size))
+    if table_info.get("layout") == "columnar":
+        raise ValueError(
+            ERROR_MESSAGES["columnar_segments"].format(table_name=table_name)
+        )
+
+    # Статистику таблицы заменяет статистика сегментов, ее заполнит перезапись файлов
+    table_info.pop("stats", None)
+    table_info["segments"] = {"size": int(size), "stats": {}}
+    return metadata, SUCCESS_MESSAGES["table_partitioned"].format(
+        table_name=table_name, size=int(size)
+    )
+
+
+@handle_db_errors
+def drop_index(metadata, table_name, column):
+    if table_name not in metadata:
+        raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+
+    indexes = metadata[table_name].get("indexes", [])
+    remaining = [definition for definition in indexes if definition["column"] != column]
+    if len(remaining) == len(indexes):
+        raise ValueError(ERROR_MESSAGES["index_not_found"].format(
+            column=column, table_name=table_name
+        ))
+
+    metadata[table_name]["indexes"] = remaining
+    return metadata, SUCCESS_MESSAGES["index_dropped"].format(
+        column=column, table_name=table_name
+    )
+
+
+def new_table():
+    # prettytable нужна только для вывода: команды без него не платят за импорт
+    from prettytable import PrettyTable
+    return PrettyTable()
+
+
 def format_table_data(columns, data):
     if not data:
         return "В таблице нет записей."
     
-    table = PrettyTable()
-    
+    with metrics.timer("stage_seconds", stage="format"):
+        table = new_table()
+
+        column_names = [col["name"] for col in columns]
+        table.field_names = column_names
+
+        for record in data:
+            row = []
+            for col_name in column_names:
+                value = record.get(col_name, "")
+                row.append(value)
+            table.add_row(row)
+
+        table.align = "l"
+
+        return str(table)
+
+
+def iter_formatted_pages(columns, data, page_size=SELECT_PAGE_SIZE):
+    """Отрисовывает записи постранично, по page_size строк на таблицу.
+
+    В памяти одновременно находится только одна страница вывода.
+    """
     column_names = [col["name"] for col in columns]
-    table.field_names = column_names
-    
-    for record in data:
-        row = []
-        for col_name in column_names:
-            value = record.get(col_name, "")
-            row.append(value)
-        table.add_row(row)
-    
-    table.align = "l"
-    
-    return str(table)
+    rows = iter(data)
+
+    while True:
+        page = list(islice(rows, page_size))
+        if not page:
+            break
+
+        # Чтение записей страницы учтено в фильтрации, здесь - только отрисовка
+        with metrics.timer("stage_seconds", stage="format"):
+            table = new_table()
+            table.field_names = column_names
+            for record in page:
+                table.add_row([record.get(col_name, "") for col_name in column_names])
+            table.align = "l"
+            text = str(table)
+        yield text
+
+
+def clear_select_cache(table_name=None):
+    if table_name is None:
+        cacher.clear()
+    else:
+        cacher.invalidate(table_name)
 
 
-def clear_select_cache():
-    cacher.clear()
+def configure_select_cache(max_entries=None, max_bytes=None):
+    cacher.configure(max_entries, max_bytes)
 
 
 def get_cache_statistics():
@@ -1,9 +1,32 @@
 
+import sys
+import threading
 import time
+from collections import OrderedDict
+from functools import wraps
 
+from .constants import (
+    CACHE_MAX_BYTES,
+    CACHE_MAX_ENTRIES,
+    ERROR_MESSAGES,
+    SUCCESS_MESSAGES,
+)
+from .metrics import metrics
+
+# ask - спрашивать пользователя, yes/no - отвечать без вопроса (пакетный режим)
+CONFIRM_POLICIES = ("ask", "yes", "no")
+
+# Время операций копится в метриках (команда stats); show_timing - печать вызова
+session_settings = {"confirm": "ask", "show_timing": False}
 
-from functools import wraps
-from .constants import ERROR_MESSAGES
+
+def configure_session(confirm=None, show_timing=None):
+    if confirm is not None:
+        if confirm not in CONFIRM_POLICIES:
+            raise ValueError(confirm)
+        session_settings["confirm"] = confirm
+    if show_timing is not None:
+        session_settings["show_timing"] = show_timing
 
 
 def handle_db_errors(func):
@@ -37,10 +60,14 @@ def confirm_action(action_name):
             else:
                 prompt = f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
             
-            response = input(prompt).strip().lower()
+            policy = session_settings["confirm"]
+            if policy == "ask":
+                response = input(prompt).strip().lower()
+            else:
+                response = 'y' if policy == "yes" else 'n'
             if response != 'y':
-                print("Операция отменена.")
-                return None, "Операция отменена пользователем."
+                # Сообщение печатает вызывающий код - один раз, как и другие ошибки
+                return None, SUCCESS_MESSAGES["operation_cancelled"]
             
             return func(*args, **kwargs)
         return wrapper
@@ -48,40 +75,112 @@ def confirm_action(action_name):
 
 
 def log_time(func):
+    """Записывает время вызова в гистограмму operation_seconds."""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.monotonic()
+        start_time = time.perf_counter()
         result = func(*args, **kwargs)
-        end_time = time.monotonic()
-        elapsed = end_time - start_time
+        elapsed = time.perf_counter() - start_time
+        metrics.observe("operation_seconds", elapsed, operation=func.__name__)
         
-        print(f'Функция {func.__name__} выполнилась за {elapsed:.3f} секунд')
+        if session_settings["show_timing"]:
+            print(f'Функция {func.__name__} выполнилась за {elapsed:.3f} секунд')
         return result
     
     return wrapper
 
 
-def create_cacher():
-    cache = {}
+def estimate_size(value):
+    """Приблизительный объем результата в байтах: список и его строки."""
+    size = sys.getsizeof(value)
+    if isinstance(value, list):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def create_cacher(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+    """Создает LRU-кэш результатов с раздельной инвалидацией по таблицам.
+
+    Ключ записи - (таблица, версия таблицы, запрос). Изменение таблицы
+    увеличивает ее версию, поэтому старые результаты больше не находятся.
+    """
+    cache = OrderedDict()
+    versions = {}
+    limits = {"max_entries": max_entries, "max_bytes": max_bytes}
+    counters = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+    def evict():
+        while cache and (
+            len(cache) > limits["max_entries"]
+            or counters["bytes"] > limits["max_bytes"]
+        ):
+            _, (_, size) = cache.popitem(last=False)
+            counters["bytes"] -= size
+            counters["evictions"] += 1
+
+    def make_key(table_name, query_key):
+        return (table_name, versions.get(table_name, 0), query_key)
     
+    # Кэш общий для всех потоков сервера; сам запрос выполняется вне блокировки
+    lock = threading.RLock()
+
     def cache_result(key, value_func, *args, **kwargs):
-        if key in cache:
-            return cache[key]
+        with lock:
+            if key in cache:
+                cache.move_to_end(key)
+                counters["hits"] += 1
+                return cache[key][0]
+            counters["misses"] += 1
         
         result = value_func(*args, **kwargs)
-        cache[key] = result
+        size = estimate_size(result)
+        with lock:
+            if size <= limits["max_bytes"] and key[1] == versions.get(key[0], 0):
+                cache[key] = (result, size)
+                counters["bytes"] += size
+                evict()
         return result
     
+    def invalidate(table_name):
+        with lock:
+            versions[table_name] = versions.get(table_name, 0) + 1
+            for key in [key for key in cache if key[0] == table_name]:
+                _, size = cache.pop(key)
+                counters["bytes"] -= size
+
     def clear_cache():
-        cache.clear()
+        with lock:
+            cache.clear()
+            counters["bytes"] = 0
+
+    def configure(max_entries=None, max_bytes=None):
+        with lock:
+            if max_entries is not None:
+                limits["max_entries"] = max_entries
+            if max_bytes is not None:
+                limits["max_bytes"] = max_bytes
+            evict()
     
     def get_cache_stats():
-        return {
-            'size': len(cache),
-            'keys': list(cache.keys())
-        }
+        with lock:
+            return {
+                'size': len(cache),
+                'bytes': counters["bytes"],
+                'hits': counters["hits"],
+                'misses': counters["misses"],
+                'evictions': counters["evictions"],
+                'max_entries': limits["max_entries"],
+                'max_bytes': limits["max_bytes"],
+                'keys': [
+                    f"{table}@v{version}: {query}" for table, version, query in cache
+                ]
+            }
     
+    cache_result.key = make_key
+    cache_result.contains = cache.__contains__
+    cache_result.invalidate = invalidate
     cache_result.clear = clear_cache
+    cache_result.configure = configure
     cache_result.stats = get_cache_stats
     
     return cache_result
@@ -1,223 +1,1009 @@
 
-import shlex
+import io
+import threading
+import time
 
-
-from .utils import load_metadata, save_metadata, load_table_data, save_table_data, delete_table_file
-from .core import (
-    create_table, drop_table, list_tables, get_table_info,
-    insert, select, update, delete, format_table_data,
-    clear_select_cache, get_cache_statistics
+from .constants import (
+    AGGREGATE_LABELS,
+    DEFAULT_SEGMENT_ROWS,
+    ERROR_MESSAGES,
+    EXPLAIN_MESSAGES,
+    HELP_MESSAGE,
+    LATENCY_BUCKETS,
+    METADATA_FREE_COMMANDS,
+    METRICS_MESSAGES,
+    PLAN_ACCESS_LABELS,
+    PROFILE_TOP_ENTRIES,
+    SUCCESS_MESSAGES,
 )
-from .parser import (
-    parse_insert_command, parse_select_command,
-    parse_update_command, parse_delete_command
+from .core import (
+    clear_select_cache,
+    configure_select_cache,
+    convert_set_clause,
+    create_index,
+    create_table,
+    delete,
+    drop_index,
+    drop_table,
+    format_table_data,
+    get_cache_statistics,
+    get_table_info,
+    insert,
+    iter_formatted_pages,
+    iter_records,
+    list_tables,
+    run_select,
+    set_table_format,
+    set_table_layout,
+    set_table_segments,
+    update,
 )
-from .constants import HELP_MESSAGE, ERROR_MESSAGES, COMMANDS
+from .decorators import configure_session
+from .metrics import format_labels, metrics
+from .parser import Aggregate, parse_command, parse_select_command, split_select_options
+from .predicates import compile_where
+from .utils import compact_table_log, replace_file
+
+# Состояние последней команды в текущем потоке: по нему пакетный режим решает,
+# откатывать ли пакет, а сервер - какой статус вернуть клиенту
+command_status = threading.local()
+command_status.failed = False
+
+
+def reset_command_status():
+    command_status.failed = False
+
+
+def command_failed():
+    return getattr(command_status, "failed", False)
+
+
+def print_error(message):
+    command_status.failed = True
+    metrics.increment("command_errors_total")
+    print(message)
+
+
+def print_result(result, message):
+    """Печатает сообщение функции под @handle_db_errors, отмечая ошибку."""
+    if result is None:
+        print_error(message)
+    else:
+        print(message)
 
 
 def print_help():
     print(HELP_MESSAGE)
 
 
-def parse_command(user_input):
+def print_records(columns, records):
+    """Печатает результат постранично, не отрисовывая его целиком."""
+    printed = False
+    for page in iter_formatted_pages(columns, records):
+        print(page)
+        printed = True
+    if not printed:
+        print(format_table_data(columns, []))
+
+
+def aggregate_query(query):
+    """AggregateQuery для списка SELECT с агрегатами или GROUP BY, иначе None."""
+    columns, group_by = query["columns"], query["group_by"]
+    has_aggregates = any(isinstance(item, Aggregate) for item in columns or ())
+    if group_by is None and not has_aggregates:
+        return None
+    from .aggregates import AggregateQuery
+
+    return AggregateQuery(columns, group_by)
+
+
+def project_columns(table_name, columns, names):
+    """Столбцы результата в порядке списка SELECT; (столбцы, ошибка)."""
+    if names is None:
+        return columns, None
+    by_name = {col["name"]: col for col in columns}
+    for name in names:
+        if name not in by_name:
+            return None, ERROR_MESSAGES["column_not_found"].format(
+                column=name, table_name=table_name
+            )
+    return [by_name[name] for name in names], None
+
+
+def run_aggregate(store, table_name, predicate, options, query, plan=None):
+    """Выполняет агрегатный SELECT; возвращает (столбцы, строки) или ошибку."""
+    from .aggregates import aggregate
+    from .planner import plan_data, plan_query
+
+    metadata = store.get_metadata()
+    error = query.validate(table_name, metadata[table_name]["columns"])
+    if error is None and options.get("order_by") not in (None, *query.labels):
+        error = ERROR_MESSAGES["column_not_found"].format(
+            column=options["order_by"], table_name=table_name
+        )
+    if error:
+        return None, error
+
+    plan = plan or plan_query(store, table_name, predicate)
+    table_data = plan_data(plan, store.get_table(table_name))
+    indexes = store.get_indexes(table_name)
+    if plan.empty:
+        # Условие невыполнимо по статистике: агрегаты считаются по пустой выборке
+        table_data, predicate, indexes = [], None, {}
+    result = aggregate(table_data, query, predicate, indexes, plan.indexes, **options)
+    if isinstance(result, tuple):
+        return None, result[1]
+    return query.result_columns(), result
+
+
+def resolve_join_query(join, options, query):
+    """Приводит имена в списке SELECT, GROUP BY и ORDER BY к <таблица>.<столбец>."""
+    columns = query["columns"]
+    if columns is not None:
+        columns = [
+            Aggregate(
+                item.func,
+                item.column if item.column == "*" else join.resolve(item.column),
+            )
+            if isinstance(item, Aggregate) else join.resolve(item)
+            for item in columns
+        ]
+    group_by = join.resolve(query["group_by"]) if query["group_by"] else None
+    options = dict(options)
+    if options.get("order_by") is not None:
+        try:
+            options["order_by"] = join.resolve(options["order_by"])
+        except ValueError:
+            # Сортировка по агрегату, например count(*)
+            pass
+    return options, {"columns": columns, "group_by": group_by}
+
+
+def run_join(table_name, join, options, query):
+    """Выполняет SELECT с JOIN; возвращает (столбцы, поток записей) или ошибку."""
     try:
-        parts = shlex.split(user_input)
-        if not parts:
-            return None, []
-        return parts[0].lower(), parts[1:]
+        options, query = resolve_join_query(join, options, query)
     except ValueError as e:
-        return None, [ERROR_MESSAGES["parse_error"].format(error=e)]
+        return None, str(e)
+
+    grouped = aggregate_query(query)
+    if grouped is not None:
+        error = grouped.validate(table_name, join.columns)
+        if error is None and options.get("order_by") not in (None, *grouped.labels):
+            error = ERROR_MESSAGES["column_not_found"].format(
+                column=options["order_by"], table_name=table_name
+            )
+        if error:
+            return None, error
+        from .aggregates import aggregate
+
+        result = aggregate(join, grouped, **options)
+        if isinstance(result, tuple):
+            return None, result[1]
+        return grouped.result_columns(), result
+
+    columns, error = project_columns(table_name, join.columns, query["columns"])
+    if columns is None:
+        return None, error
+    # Без ORDER BY и LIMIT записи печатаются прямо из потока соединения
+    return columns, run_select(join, None, None, **options)
+
+
+def export_command(store, metadata, args):
+    from .exporter import export_records
+
+    if len(args) < 3 or args[1].lower() != "to":
+        print_error(ERROR_MESSAGES["insufficient_args"].format(
+            usage='export <имя_таблицы|"select ..."> to <файл> [csv|jsonl]'
+        ))
+        return
+
+    source, filepath = args[0], args[2]
+    export_format = args[3].lower() if len(args) > 3 else None
+
+    if source.lower().startswith("select"):
+        table_name, where_clause, options, error = parse_select_command(
+            parse_command(source)[1]
+        )
+        if error:
+            print_error(error)
+            return
+    else:
+        table_name, where_clause, options = source, None, {}
+
+    if table_name not in metadata:
+        print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+        return
+
+    options, query = split_select_options(options)
+    grouped = aggregate_query(query)
+    if query["join"] is not None:
+        from .joins import HashJoin
+
+        try:
+            join = HashJoin(store, table_name, query["join"], where_clause)
+        except ValueError as e:
+            print_error(e)
+            return
+        columns, records = run_join(table_name, join, options, query)
+    elif grouped is not None:
+        where_clause = compile_where(where_clause, metadata[table_name]["columns"])
+        columns, records = run_aggregate(
+            store, table_name, where_clause, options, grouped
+        )
+    else:
+        where_clause = compile_where(where_clause, metadata[table_name]["columns"])
+        columns, records = project_columns(
+            table_name, metadata[table_name]["columns"], query["columns"]
+        )
+        table_data = store.get_table(table_name)
+        indexes = store.get_indexes(table_name)
+        paged = options.get("limit") is not None or options.get("offset")
+        if options.get("order_by") or paged:
+            records = run_select(table_data, where_clause, indexes, **options)
+        else:
+            records = iter_records(table_data, where_clause, indexes)
+    if columns is None:
+        print_error(records)
+        return
+
+    count, message = export_records(columns, records, filepath, export_format)
+    print_result(count, message)
+
+
+def explain_command(store, metadata, args):
+    """Печатает план SELECT, выполняет его и сравнивает оценку с фактом."""
+    if not args or args[0].lower() != "select":
+        print_error(ERROR_MESSAGES["insufficient_args"].format(
+            usage="explain select ..."
+        ))
+        return
+
+    table_name, where_clause, options, error = parse_select_command(args[1:])
+    if error:
+        print_error(error)
+        return
+    if table_name not in metadata:
+        print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+        return
+
+    options, query = split_select_options(options)
+    if query["join"] is not None:
+        explain_join(store, table_name, where_clause, options, query, " ".join(args))
+        return
+
+    from .planner import execute_plan, plan_query
+
+    where_clause = compile_where(where_clause, metadata[table_name]["columns"])
+    table_data = store.get_table(table_name)
+    grouped = aggregate_query(query)
+    if grouped is not None:
+        plan = plan_query(store, table_name, where_clause)
+    else:
+        plan = plan_query(store, table_name, where_clause, options, use_cache=True)
+    print(plan.describe(" ".join(args)))
+    if grouped is not None and not plan.empty:
+        strategy = grouped.strategy(
+            table_data, where_clause, store.get_indexes(table_name)
+        )
+        print(EXPLAIN_MESSAGES["aggregate"].format(method=AGGREGATE_LABELS[strategy]))
+
+    start_time = time.perf_counter()
+    if grouped is not None:
+        columns, result_data = run_aggregate(
+            store, table_name, where_clause, options, grouped, plan
+        )
+        if columns is None:
+            result_data = (None, result_data)
+    else:
+        result_data = execute_plan(plan, table_data, options)
+    elapsed = time.perf_counter() - start_time
+    if isinstance(result_data, tuple):
+        print_error(result_data[1])
+        return
+    print(EXPLAIN_MESSAGES["actual"].format(rows=len(result_data), elapsed=elapsed))
+
+
+def explain_join(store, table_name, where_clause, options, query, text):
+    from .joins import HashJoin
+
+    try:
+        join = HashJoin(store, table_name, query["join"], where_clause)
+    except ValueError as e:
+        print_error(e)
+        return
+
+    print(EXPLAIN_MESSAGES["plan"].format(query=text))
+    for side in (join.left, join.right):
+        if side.plan.empty:
+            access = PLAN_ACCESS_LABELS["empty"]
+        else:
+            access = side.plan.describe_access()
+        print(EXPLAIN_MESSAGES["join_access"].format(
+            table=side.table_name, access=access
+        ))
+    print(EXPLAIN_MESSAGES["join"].format(method=join.describe()))
+    if aggregate_query(query) is not None:
+        print(EXPLAIN_MESSAGES["aggregate"].format(method=AGGREGATE_LABELS["hash"]))
+
+    start_time = time.perf_counter()
+    columns, result_data = run_join(table_name, join, options, query)
+    if columns is None:
+        print_error(result_data)
+        return
+    rows = sum(1 for _ in result_data)
+    elapsed = time.perf_counter() - start_time
+    print(EXPLAIN_MESSAGES["actual"].format(rows=rows, elapsed=elapsed))
+
+
+def format_milliseconds(seconds):
+    if seconds is None:
+        return "-"
+    if seconds == float("inf"):
+        return f"> {LATENCY_BUCKETS[-1] * 1000:g}"
+    return f"{seconds * 1000:g}"
+
+
+def stats_command(args):
+    """stats - сводка метрик, stats json|prometheus [файл] - выгрузка, stats reset."""
+    mode = args[0].lower() if args else None
+    if mode == "reset":
+        metrics.reset()
+        print(METRICS_MESSAGES["reset"])
+        return
+    if mode in ("json", "prometheus"):
+        text = metrics.to_json() + "\n" if mode == "json" else metrics.to_prometheus()
+        if len(args) > 1:
+            replace_file(args[1], lambda f: f.write(text))
+            print(METRICS_MESSAGES["saved"].format(format=mode, file=args[1]))
+        else:
+            print(text, end="")
+        return
+    if mode is not None:
+        print_error(ERROR_MESSAGES["insufficient_args"].format(
+            usage="stats [json|prometheus [<файл>]|reset]"
+        ))
+        return
+
+    snapshot = metrics.snapshot()
+    if not snapshot["counters"] and not snapshot["histograms"]:
+        print(METRICS_MESSAGES["empty"])
+        return
+    if snapshot["counters"]:
+        print(METRICS_MESSAGES["counters"])
+        for counter in snapshot["counters"]:
+            name = counter["name"] + format_labels(counter["labels"].items())
+            print(METRICS_MESSAGES["counter"].format(name=name, value=counter["value"]))
+    if snapshot["histograms"]:
+        print(METRICS_MESSAGES["histograms"])
+        for histogram in snapshot["histograms"]:
+            name = histogram["name"] + format_labels(histogram["labels"].items())
+            print(METRICS_MESSAGES["histogram"].format(
+                name=name, count=histogram["count"],
+                avg=histogram["sum"] / histogram["count"] * 1000,
+                p50=format_milliseconds(histogram["p50"]),
+                p99=format_milliseconds(histogram["p99"]),
+            ))
+
+
+def profile_command(store, statement):
+    """Выполняет одну команду под cProfile и печатает самые дорогие функции."""
+    parts = statement.text.split(None, 1)
+    if len(parts) < 2:
+        print_error(
+            ERROR_MESSAGES["insufficient_args"].format(usage="profile <команда>")
+        )
+        return True
+
+    import cProfile
+    import pstats
+
+    from .statements import statement_cache
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        keep_going = execute_statement(store, statement_cache.parse(parts[1]))
+    finally:
+        profiler.disable()
+
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(
+        PROFILE_TOP_ENTRIES
+    )
+    print(METRICS_MESSAGES["profile"].format(count=PROFILE_TOP_ENTRIES))
+    print(report.getvalue().strip())
+    return keep_going
+
+
+def prepare_command(user_input):
+    from .statements import statement_cache
+
+    try:
+        prepared = statement_cache.prepare(user_input)
+    except ValueError as e:
+        print_error(e)
+        return
+    print(SUCCESS_MESSAGES["statement_prepared"].format(
+        name=prepared.name, count=prepared.param_count
+    ))
+
+
+def execute_command(store, user_input):
+    """Выполняет одну команду. Возвращает False, если пора завершать работу.
+
+    Разбор insert/select/update/delete берется из кэша разобранных команд.
+    """
+    from .statements import statement_cache
+
+    reset_command_status()
+    return execute_statement(store, statement_cache.parse(user_input))
+
+
+def execute_statement(store, statement):
+    command, args = statement.command, statement.args
+    metadata = store.get_metadata() if command not in METADATA_FREE_COMMANDS else None
+    metrics.increment("commands_total", command=command or "")
+
+    if command == "exit":
+        if store.in_transaction:
+            store.rollback()
+            print(SUCCESS_MESSAGES["transaction_discarded"])
+        print("Выход из программы...")
+        return False
+
+    elif command == "help":
+        print_help()
+
+    elif command == "clear_cache":
+        clear_select_cache()
+        print("Кэш запросов очищен.")
+
+    elif command == "cache_stats":
+        stats = get_cache_statistics()
+        print("Статистика кэша:")
+        print(f"  Размер: {stats['size']} из {stats['max_entries']} записей")
+        print(f"  Объем: {stats['bytes']} из {stats['max_bytes']} байт")
+        print(f"  Попадания: {stats['hits']}, промахи: {stats['misses']}, "
+              f"вытеснения: {stats['evictions']}")
+        if stats['keys']:
+            print(f"  Ключи: {', '.join(stats['keys'][:5])}")
+            if len(stats['keys']) > 5:
+                print(f"  ... и еще {len(stats['keys']) - 5} ключей")
+        else:
+            print("  Кэш пуст")
+        from .statements import statement_cache
+
+        statements = statement_cache.stats()
+        print(f"  Разобранные команды: {statements['size']} из "
+              f"{statements['max_entries']}, попадания: {statements['hits']}, "
+              f"промахи: {statements['misses']}")
+
+    elif command == "cache_limit":
+        if len(args) < 1 or not all(arg.isdigit() for arg in args[:2]):
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="cache_limit <записей> [байт]"
+            ))
+            return True
+
+        max_bytes = int(args[1]) if len(args) > 1 else None
+        configure_select_cache(int(args[0]), max_bytes)
+        print(SUCCESS_MESSAGES["cache_configured"])
+
+    elif command == "parallel_scan":
+        if len(args) < 1 or not all(arg.isdigit() for arg in args[:2]):
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="parallel_scan <строк> [процессов]"
+            ))
+            return True
+
+        from .parallel import configure_parallel_scan
+
+        workers = int(args[1]) if len(args) > 1 else None
+        configure_parallel_scan(int(args[0]), workers)
+        print(SUCCESS_MESSAGES["parallel_configured"])
+
+    elif command == "create_table":
+        if len(args) < 2:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="create_table <имя> <столбец1:тип> ... [<формат>]"
+            ))
+            return True
+
+        table_name = args[0]
+        columns = args[1:]
+        # Последний аргумент без ":" - не столбец, а формат файла таблицы
+        table_format = None
+        if len(columns) > 1 and ":" not in columns[-1]:
+            table_format = columns.pop().lower()
+
+        new_metadata, message = create_table(
+            metadata, table_name, columns, table_format
+        )
+        print_result(new_metadata, message)
+
+        if new_metadata and table_name in new_metadata:
+            store.mark_metadata_dirty()
+            store.set_table(table_name, [])
+            clear_select_cache(table_name)
+
+    elif command == "drop_table":
+        if len(args) < 1:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="drop_table <имя_таблицы>"
+            ))
+            return True
+
+        table_name = args[0]
+
+        result = drop_table(metadata, table_name)
+        if result:
+            new_metadata, message = result
+            print_result(new_metadata, message)
+
+            if new_metadata is not None and table_name not in new_metadata:
+                store.mark_metadata_dirty()
+                store.drop_table(table_name)
+                clear_select_cache(table_name)
+
+    elif command in ("create_index", "drop_index"):
+        if len(args) < 2:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage=f"{command} <имя_таблицы> <столбец>"
+            ))
+            return True
+
+        table_name, column = args[0], args[1]
+        if command == "create_index":
+            index_type = args[2].lower() if len(args) > 2 else "hash"
+            new_metadata, message = create_index(
+                metadata, table_name, column, index_type
+            )
+        else:
+            new_metadata, message = drop_index(metadata, table_name, column)
+        print_result(new_metadata, message)
+
+        if new_metadata is not None:
+            store.mark_metadata_dirty()
+            store.invalidate_indexes(table_name)
+
+    elif command == "set_layout":
+        if len(args) < 2:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="set_layout <имя_таблицы> rows|columnar"
+            ))
+            return True
+
+        table_name, layout = args[0], args[1].lower()
+        new_metadata, message = set_table_layout(metadata, table_name, layout)
+        print_result(new_metadata, message)
+
+        if new_metadata is not None:
+            store.mark_metadata_dirty()
+            store.apply_layout(table_name)
+            clear_select_cache(table_name)
+
+    elif command == "convert":
+        if store.in_transaction:
+            print_error(ERROR_MESSAGES["not_in_transaction"].format(command=command))
+            return True
+
+        if len(args) < 2:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="convert <имя_таблицы> json|binary|zlib|lzma"
+            ))
+            return True
+
+        table_name, table_format = args[0], args[1].lower()
+        store.flush()
+        previous_format = store.get_table_format(table_name)
+
+        new_metadata, message = set_table_format(metadata, table_name, table_format)
+        if new_metadata is None:
+            print_error(message)
+            return True
+
+        store.mark_metadata_dirty()
+        if store.convert_table(table_name, previous_format):
+            print(message)
+            clear_select_cache(table_name)
+
+    elif command == "partition":
+        if store.in_transaction:
+            print_error(ERROR_MESSAGES["not_in_transaction"].format(command=command))
+            return True
+
+        if len(args) < 1:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="partition <имя_таблицы> [<строк>|off]"
+            ))
+            return True
+
+        table_name = args[0]
+        size = args[1].lower() if len(args) > 1 else str(DEFAULT_SEGMENT_ROWS)
+        store.flush()
+        previous_format = store.get_table_format(table_name)
+
+        new_metadata, message = set_table_segments(metadata, table_name, size)
+        if new_metadata is None:
+            print_error(message)
+            return True
+
+        store.mark_metadata_dirty()
+        if store.convert_table(table_name, previous_format):
+            print(message)
+            clear_select_cache(table_name)
+
+    elif command == "compact":
+        if store.in_transaction:
+            print_error(ERROR_MESSAGES["not_in_transaction"].format(command=command))
+            return True
+
+        if len(args) < 1:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="compact <имя_таблицы>"
+            ))
+            return True
+
+        table_name = args[0]
+        if table_name not in metadata:
+            print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+            return True
+
+        store.flush()
+        table_format = store.get_table_format(table_name)
+        columns = metadata[table_name]["columns"]
+        if all([
+            compact_table_log(name, table_format, columns)
+            for name in store.storage_names(table_name)
+        ]):
+            print(SUCCESS_MESSAGES["table_compacted"].format(table_name=table_name))
+
+    elif command == "list_tables":
+        result = list_tables(metadata)
+        print(result)
+
+    elif command == "info":
+        if len(args) < 1:
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="info <имя_таблицы>"
+            ))
+            return True
+
+        table_name = args[0]
+        if table_name not in metadata:
+            print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+            return True
+
+        info, error = get_table_info(metadata, table_name, store.get_table(table_name))
+
+        if error:
+            print_error(error)
+        else:
+            print(info)
+
+    elif command == "begin":
+        if store.in_transaction:
+            print_error(ERROR_MESSAGES["transaction_active"])
+            return True
+        store.flush()
+        store.begin()
+        print(SUCCESS_MESSAGES["transaction_started"])
+
+    elif command in ("commit", "rollback"):
+        if not store.in_transaction:
+            print_error(ERROR_MESSAGES["no_transaction"])
+            return True
+        if command == "commit":
+            store.commit()
+            print(SUCCESS_MESSAGES["transaction_committed"])
+        else:
+            store.rollback()
+            print(SUCCESS_MESSAGES["transaction_rolled_back"])
+
+    elif command == "prepare":
+        prepare_command(statement.text)
+
+    elif command == "stats":
+        stats_command(args)
+
+    elif command == "profile":
+        return profile_command(store, statement)
+
+    elif command == "execute":
+        from .statements import statement_cache
+
+        try:
+            bound = statement_cache.execute(args)
+        except (KeyError, ValueError) as e:
+            print_error(e.args[0])
+            return True
+        return execute_statement(store, bound)
+
+    elif command == "insert":
+        table_name, values = statement.parsed
+        if table_name is None:
+            print_error(values)
+            return True
+
+        if table_name not in metadata:
+            print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+            return True
+
+        table_data = store.get_table(table_name, writable=True)
+
+        record, message = insert(
+            metadata, table_name, values, table_data, store.get_indexes(table_name)
+        )
+        if record:
+            from .planner import note_inserted
+
+            store.append_log(table_name, "insert", record=record)
+            # Счетчик next_id и статистика в метаданных продвинулись
+            note_inserted(metadata[table_name], [record])
+            store.mark_metadata_dirty()
+            clear_select_cache(table_name)
+            print(message)
+        else:
+            print_error(message)
+
+    elif command == "load":
+        if len(args) < 3 or args[1].lower() != "from":
+            print_error(ERROR_MESSAGES["insufficient_args"].format(
+                usage="load <имя_таблицы> from <файл.csv|файл.jsonl>"
+            ))
+            return True
+
+        table_name, filepath = args[0], args[2]
+        if table_name not in metadata:
+            print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+            return True
+
+        from .loader import bulk_load
+        from .planner import note_inserted
+
+        table_data = store.get_table(table_name, writable=True)
+
+        records, message = bulk_load(metadata, table_name, filepath, table_data)
+        print_result(records, message)
+
+        if records:
+            note_inserted(metadata[table_name], records)
+            store.mark_metadata_dirty()
+            # Одна запись снимка в конце вместо перезаписи файла на каждую строку
+            store.mark_dirty(table_name)
+            store.invalidate_indexes(table_name)
+            clear_select_cache(table_name)
+
+    elif command == "export":
+        export_command(store, metadata, args)
+
+    elif command == "explain":
+        explain_command(store, metadata, args)
+
+    elif command == "select":
+        table_name, where_clause, options, error = statement.parsed
+        if error:
+            print_error(error)
+            return True
+
+        if table_name not in metadata:
+            print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+            return True
+
+        options, query = split_select_options(options)
+        if query["join"] is not None:
+            from .joins import HashJoin
+
+            try:
+                join = HashJoin(store, table_name, query["join"], where_clause)
+            except ValueError as e:
+                print_error(e)
+                return True
+            columns, result_data = run_join(table_name, join, options, query)
+            if columns is None:
+                print_error(result_data)
+            else:
+                print_records(columns, result_data)
+            return True
+
+        columns = metadata[table_name]["columns"]
+        where_clause = statement.predicate(where_clause, columns)
+        grouped = aggregate_query(query)
+        if grouped is not None:
+            columns, result_data = run_aggregate(
+                store, table_name, where_clause, options, grouped
+            )
+        else:
+            columns, result_data = project_columns(
+                table_name, columns, query["columns"]
+            )
+        if columns is None:
+            print_error(result_data)
+            return True
+
+        if grouped is None:
+            from .planner import execute_plan, plan_query
+
+            table_data = store.get_table(table_name)
+            plan = plan_query(store, table_name, where_clause, options, use_cache=True)
+            result_data = execute_plan(plan, table_data, options)
+            if isinstance(result_data, tuple):
+                print_error(result_data[1])
+                return True
+
+        print_records(columns, result_data)
+
+    elif command == "update":
+        table_name, set_clause, where_clause, error = statement.parsed
+        if error:
+            print_error(error)
+            return True
+
+        if table_name not in metadata:
+            print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+            return True
+
+        columns = metadata[table_name]["columns"]
+        try:
+            set_clause = convert_set_clause(table_name, columns, set_clause)
+        except ValueError as e:
+            print_error(e)
+            return True
+
+        from .planner import note_updated, plan_data, plan_query
+
+        where_clause = statement.predicate(where_clause, columns)
+        table_data = store.get_table(table_name, writable=True)
+        plan = plan_query(store, table_name, where_clause)
+        if plan.empty:
+            print('Записи для обновления не найдены.')
+            return True
+
+        updated_data, updated_ids = update(
+            plan_data(plan, table_data), set_clause, where_clause,
+            store.get_indexes(table_name), access_indexes=plan.indexes
+        )
+        if updated_data is None:
+            print_error(updated_ids)
+            return True
+
+        if updated_ids:
+            store.append_log(table_name, "update", ids=updated_ids, values=set_clause)
+            # Новые значения могут расширить границы min/max в статистике
+            note_updated(metadata[table_name], updated_ids, set_clause)
+            store.mark_metadata_dirty()
+            count = len(updated_ids)
+            print(f'Запись(и) ({count} шт.) в таблице "{table_name}" '
+                  'успешно обновлена(ы).')
+            clear_select_cache(table_name)
+        else:
+            print('Записи для обновления не найдены.')
+
+    elif command == "delete":
+        table_name, where_clause, error = statement.parsed
+        if error:
+            print_error(error)
+            return True
+
+        if table_name not in metadata:
+            print_error(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+            return True
+
+        columns = metadata[table_name]["columns"]
+        from .planner import note_deleted, plan_data, plan_query
+
+        where_clause = statement.predicate(where_clause, columns)
+        table_data = store.get_table(table_name, writable=True)
+        plan = plan_query(store, table_name, where_clause)
+        if plan.empty:
+            print('Записи для удаления не найдены.')
+            return True
+
+        result = delete(
+            plan_data(plan, table_data), where_clause, store.get_indexes(table_name),
+            access_indexes=plan.indexes
+        )
+        if result and result[0] is not None:
+            updated_data, deleted_ids, message = result
+
+            if deleted_ids:
+                store.append_log(table_name, "delete", ids=deleted_ids)
+                note_deleted(metadata[table_name], deleted_ids)
+                store.mark_metadata_dirty()
+                print(message)
+                clear_select_cache(table_name)
+            else:
+                print('Записи для удаления не найдены.')
+        elif result:
+            print_error(result[1])
+
+    else:
+        print_error(ERROR_MESSAGES["unknown_command"].format(command=command))
+        print_help()
+
+    return True
+
+
+def iter_script_lines(lines):
+    """Отдает (номер строки, команда), пропуская пустые строки и комментарии."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith(("#", "--")):
+            continue
+        if line.endswith(";"):
+            line = line[:-1].rstrip()
+        yield number, line
+
+
+def run_script(lines, assume_yes=False, atomic=False):
+    """Выполняет команды пакетом, без приглашений и вывода времени.
+
+    Подтверждения получают ответ --yes (или отказ), метаданные читаются и
+    записываются один раз на пакет. В режиме atomic первая ошибка отменяет
+    все изменения пакета. Возвращает True, если ошибок не было.
+    """
+    from .store import TableStore
+
+    configure_session(confirm="yes" if assume_yes else "no", show_timing=False)
+    store = TableStore()
+    if atomic:
+        store.begin()
+
+    succeeded = True
+    try:
+        for number, line in iter_script_lines(lines):
+            try:
+                keep_going = execute_command(store, line)
+            except Exception as e:
+                print_error(f"Неожиданная ошибка: {e}")
+                keep_going = True
+
+            if command_failed():
+                succeeded = False
+                if atomic:
+                    print(ERROR_MESSAGES["script_failed"].format(
+                        line=number, command=line
+                    ))
+                    store.rollback()
+                    return False
+            if not keep_going:
+                break
+
+        if atomic:
+            store.commit()
+    finally:
+        if store.in_transaction:
+            store.rollback()
+        store.flush()
+    return succeeded
 
 
 def run():
     print("\n***Операции с данными***")
     print_help()
-    
+
+    from .store import TableStore
+
+    store = TableStore()
+
     while True:
         try:
-            metadata = load_metadata()
             user_input = input(">>>Введите команду: ").strip()
             if not user_input:
                 continue
-            command, args = parse_command(user_input)
-            
-            if command == "exit":
-                print("Выход из программы...")
+
+            if not execute_command(store, user_input):
                 break
-                
-            elif command == "help":
-                print_help()
-                
-            elif command == "clear_cache":
-                clear_select_cache()
-                print("Кэш запросов очищен.")
-                
-            elif command == "cache_stats":
-                stats = get_cache_statistics()
-                print(f"Статистика кэша:")
-                print(f"  Размер: {stats['size']} записей")
-                if stats['keys']:
-                    print(f"  Ключи: {', '.join(stats['keys'][:5])}")
-                    if len(stats['keys']) > 5:
-                        print(f"  ... и еще {len(stats['keys']) - 5} ключей")
-                else:
-                    print("  Кэш пуст")
-                
-            elif command == "create_table":
-                if len(args) < 2:
-                    print(ERROR_MESSAGES["insufficient_args"].format(
-                        usage="create_table <имя> <столбец1:тип> ..."
-                    ))
-                    continue
-                
-                table_name = args[0]
-                columns = args[1:]
-                
-                new_metadata, message = create_table(metadata, table_name, columns)
-                print(message)
-                
-                if table_name in new_metadata:
-                    save_metadata(new_metadata)
-                    save_table_data(table_name, [])
-                    metadata = new_metadata
-                    
-            elif command == "drop_table":
-                if len(args) < 1:
-                    print(ERROR_MESSAGES["insufficient_args"].format(
-                        usage="drop_table <имя_таблицы>"
-                    ))
-                    continue
-                
-                table_name = args[0]
-                
-                result = drop_table(metadata, table_name)
-                if result:
-                    new_metadata, message = result
-                    print(message)
-                    
-                    if table_name not in new_metadata:
-                        save_metadata(new_metadata)
-                        delete_table_file(table_name)
-                        metadata = new_metadata
-                else:
-                    continue
-                    
-            elif command == "list_tables":
-                result = list_tables(metadata)
-                print(result)
-                
-            elif command == "info":
-                if len(args) < 1:
-                    print(ERROR_MESSAGES["insufficient_args"].format(
-                        usage="info <имя_таблицы>"
-                    ))
-                    continue
-                
-                table_name = args[0]
-                info, error = get_table_info(metadata, table_name)
-                
-                if error:
-                    print(error)
-                else:
-                    print(info)
-                    
-            elif command == "insert":
-                table_name, values = parse_insert_command(args)
-                if table_name is None:
-                    print(values)
-                    continue
-                
-                if table_name not in metadata:
-                    print(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
-                    continue
-                
-                table_data = load_table_data(table_name)
-                
-                record, message = insert(metadata, table_name, values)
-                if record:
-                    table_data.append(record)
-                    save_table_data(table_name, table_data)
-                    print(message)
-                else:
-                    print(message)
-                    
-            elif command == "select":
-                table_name, where_clause, error = parse_select_command(args)
-                if error:
-                    print(error)
-                    continue
-                
-                if table_name not in metadata:
-                    print(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
-                    continue
-                
-                table_data = load_table_data(table_name)
-                
-                if where_clause:
-                    result_data = select(table_data, where_clause, use_cache=True)
-                else:
-                    result_data = table_data
-                
-                columns = metadata[table_name]["columns"]
-                formatted = format_table_data(columns, result_data)
-                print(formatted)
-                
-            elif command == "update":
-                table_name, set_clause, where_clause, error = parse_update_command(args)
-                if error:
-                    print(error)
-                    continue
-                
-                if table_name not in metadata:
-                    print(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
-                    continue
-                
-                table_data = load_table_data(table_name)
-                
-                updated_data, count = update(table_data, set_clause, where_clause)
-                
-                if count > 0:
-                    save_table_data(table_name, updated_data)
-                    print(f'Запись(и) ({count} шт.) в таблице "{table_name}" успешно обновлена(ы).')
-                    clear_select_cache()
-                else:
-                    print('Записи для обновления не найдены.')
-                    
-            elif command == "delete":
-                table_name, where_clause, error = parse_delete_command(args)
-                if error:
-                    print(error)
-                    continue
-                
-                if table_name not in metadata:
-                    print(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
-                    continue
-                
-                table_data = load_table_data(table_name)
-                
-                result = delete(table_data, where_clause)
-                if result:
-                    updated_data, count, message = result
-                    
-                    if count > 0:
-                        save_table_data(table_name, updated_data)
-                        print(message)
-                        clear_select_cache()
-                    else:
-                        print('Записи для удаления не найдены.')
-                else:
-                    continue
-                    
-            else:
-                print(ERROR_MESSAGES["unknown_command"].format(command=command))
-                print_help()
-                
+
         except KeyboardInterrupt:
             print("\n\nПрограмма прервана пользователем.")
             break
         except Exception as e:
             print(f"Неожиданная ошибка: {e}")
+        finally:
+            store.flush()
 
 
 def main():
-    ran()
+    run()
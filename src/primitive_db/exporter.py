@@ -0,0 +1,58 @@
+
+import csv
+import json
+import os
+
+from .constants import ERROR_MESSAGES, SUCCESS_MESSAGES
+from .decorators import handle_db_errors, log_time
+
+
+def write_csv(filepath, column_names, records):
+    count = 0
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(column_names)
+        for record in records:
+            writer.writerow([record.get(name, "") for name in column_names])
+            count += 1
+    return count
+
+
+def write_jsonl(filepath, column_names, records):
+    count = 0
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for record in records:
+            row = {name: record.get(name) for name in column_names}
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+WRITERS = {
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+}
+
+
+def detect_export_format(filepath, export_format=None):
+    if export_format is None:
+        export_format = os.path.splitext(filepath)[1].lstrip(".").lower()
+    if export_format not in WRITERS:
+        raise ValueError(ERROR_MESSAGES["unsupported_file"].format(
+            file=filepath, formats=", ".join(WRITERS)
+        ))
+    return export_format
+
+
+@handle_db_errors
+@log_time
+def export_records(columns, records, filepath, export_format=None):
+    """Построчно записывает records в CSV или JSONL.
+
+    records может быть генератором: строки пишутся по мере получения.
+    """
+    export_format = detect_export_format(filepath, export_format)
+    column_names = [col["name"] for col in columns]
+    count = WRITERS[export_format](filepath, column_names, records)
+    message = SUCCESS_MESSAGES["records_exported"].format(count=count, file=filepath)
+    return count, message
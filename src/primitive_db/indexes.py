@@ -0,0 +1,309 @@
+
+
+from bisect import bisect_left, bisect_right
+
+from .parser import Comparison
+
+# До стольких записей индекс меняется по одной, больше - перестраивается за проход
+BULK_INDEX_CHANGE = 64
+
+
+def index_key(value):
+    # Ключ совпадает с правилом сравнения в WHERE: значения сравниваются как строки
+    return str(value)
+
+
+def sort_key(value, column_type=None):
+    """Ключ упорядочивания: числа сравниваются как числа, остальное - как строки."""
+    if column_type == "int" or (column_type is None and type(value) is int):
+        try:
+            return (0, int(value))
+        except (TypeError, ValueError):
+            pass
+    return (1, str(value))
+
+
+def comparison_matches(record_value, comparison):
+    column_type = "int" if type(record_value) is int else "str"
+    key = sort_key(record_value, column_type)
+
+    if comparison.op == "between":
+        low, high = comparison.value
+        return sort_key(low, column_type) <= key <= sort_key(high, column_type)
+
+    other = sort_key(comparison.value, column_type)
+    if comparison.op == "<":
+        return key < other
+    if comparison.op == "<=":
+        return key <= other
+    if comparison.op == ">":
+        return key > other
+    if comparison.op == ">=":
+        return key >= other
+    return False
+
+
+class HashIndex:
+    """Хеш-индекс по одному столбцу: значение -> список записей."""
+
+    kind = "hash"
+
+    def __init__(self, column, column_type=None):
+        self.column = column
+        self.column_type = column_type
+        self._buckets = {}
+
+    def build(self, table_data):
+        self._buckets = {}
+        for record in table_data:
+            self.add(record)
+        return self
+
+    def add(self, record):
+        key = index_key(record.get(self.column, ""))
+        self._buckets.setdefault(key, []).append(record)
+
+    def remove(self, record):
+        key = index_key(record.get(self.column, ""))
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return
+        for i, candidate in enumerate(bucket):
+            if candidate is record:
+                del bucket[i]
+                break
+        if not bucket:
+            del self._buckets[key]
+
+    def discard(self, records):
+        """Удаляет много записей: каждая затронутая корзина фильтруется один раз."""
+        removed = {}
+        for record in records:
+            key = index_key(record.get(self.column, ""))
+            removed.setdefault(key, set()).add(id(record))
+        for key, ids in removed.items():
+            bucket = [
+                record for record in self._buckets.get(key, ())
+                if id(record) not in ids
+            ]
+            if bucket:
+                self._buckets[key] = bucket
+            else:
+                self._buckets.pop(key, None)
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def lookup(self, value):
+        return list(self._buckets.get(index_key(value), []))
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SortedIndex:
+    """Упорядоченный индекс на отсортированных массивах (bisect).
+
+    Подходит для диапазонов и ORDER BY ... LIMIT без сортировки всей таблицы.
+    """
+
+    kind = "sorted"
+
+    def __init__(self, column, column_type=None):
+        self.column = column
+        self.column_type = column_type
+        self._keys = []
+        self._records = []
+
+    def _key(self, value):
+        return sort_key(value, self.column_type)
+
+    def build(self, table_data):
+        pairs = sorted(
+            ((self._key(record.get(self.column, "")), record) for record in table_data),
+            key=lambda pair: pair[0]
+        )
+        self._keys = [key for key, _ in pairs]
+        self._records = [record for _, record in pairs]
+        return self
+
+    def add(self, record):
+        key = self._key(record.get(self.column, ""))
+        position = bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._records.insert(position, record)
+
+    def remove(self, record):
+        key = self._key(record.get(self.column, ""))
+        start = bisect_left(self._keys, key)
+        end = bisect_right(self._keys, key)
+        for i in range(start, end):
+            if self._records[i] is record:
+                del self._keys[i]
+                del self._records[i]
+                break
+
+    def discard(self, records):
+        """Удаляет много записей за один проход вместо сдвига массивов на каждую."""
+        if len(records) <= BULK_INDEX_CHANGE:
+            for record in records:
+                self.remove(record)
+            return
+        removed = {id(record) for record in records}
+        kept = [
+            i for i, record in enumerate(self._records) if id(record) not in removed
+        ]
+        self._keys = [self._keys[i] for i in kept]
+        self._records = [self._records[i] for i in kept]
+
+    def extend(self, records):
+        """Добавляет много записей: новые сортируются и сливаются с массивами."""
+        if len(records) <= BULK_INDEX_CHANGE:
+            for record in records:
+                self.add(record)
+            return
+        pairs = sorted(
+            ((self._key(record.get(self.column, "")), record) for record in records),
+            key=lambda pair: pair[0]
+        )
+        # Два упорядоченных отрезка Timsort сливает за линейное время;
+        # при равных ключах старые записи остаются раньше новых, как у add
+        merged = sorted(
+            list(zip(self._keys, self._records)) + pairs, key=lambda pair: pair[0]
+        )
+        self._keys = [key for key, _ in merged]
+        self._records = [record for _, record in merged]
+
+    def lookup(self, value):
+        key = self._key(value)
+        return self._records[bisect_left(self._keys, key):bisect_right(self._keys, key)]
+
+    def range(self, low=None, high=None, include_low=True, include_high=True):
+        start = 0
+        end = len(self._keys)
+        if low is not None:
+            key = self._key(low)
+            find = bisect_left if include_low else bisect_right
+            start = find(self._keys, key)
+        if high is not None:
+            key = self._key(high)
+            find = bisect_right if include_high else bisect_left
+            end = find(self._keys, key)
+        return self._records[start:end]
+
+    def lookup_comparison(self, comparison):
+        if comparison.op == "between":
+            low, high = comparison.value
+            return self.range(low, high)
+        if comparison.op == "<":
+            return self.range(high=comparison.value, include_high=False)
+        if comparison.op == "<=":
+            return self.range(high=comparison.value)
+        if comparison.op == ">":
+            return self.range(low=comparison.value, include_low=False)
+        if comparison.op == ">=":
+            return self.range(low=comparison.value)
+        return None
+
+    def iter_ordered(self, descending=False):
+        return reversed(self._records) if descending else iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+
+class PrimaryKeyIndex:
+    """Уникальный индекс по ID: число -> запись.
+
+    Не хранится в метаданных: строится планировщиком при первом поиске по ID.
+    """
+
+    kind = "primary"
+
+    def __init__(self, column="ID", column_type="int"):
+        self.column = column
+        self.column_type = column_type
+        self._records = {}
+
+    def build(self, table_data):
+        self._records = {record.get(self.column): record for record in table_data}
+        return self
+
+    def add(self, record):
+        self._records[record.get(self.column)] = record
+
+    def remove(self, record):
+        key = record.get(self.column)
+        if self._records.get(key) is record:
+            del self._records[key]
+
+    def discard(self, records):
+        for record in records:
+            self.remove(record)
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def lookup(self, value):
+        try:
+            key = int(value)
+        except (TypeError, ValueError):
+            return []
+        record = self._records.get(key)
+        return [] if record is None else [record]
+
+    def __len__(self):
+        return len(self._records)
+
+
+INDEX_TYPES = {
+    HashIndex.kind: HashIndex,
+    SortedIndex.kind: SortedIndex,
+}
+
+ORDERED_COLUMN_TYPES = {"int", "str"}
+
+
+def build_indexes(index_definitions, table_data, columns=None):
+    column_types = {col["name"]: col["type"] for col in columns or []}
+    indexes = {}
+    for definition in index_definitions:
+        column = definition["column"]
+        index_class = INDEX_TYPES[definition.get("type", HashIndex.kind)]
+        index = index_class(column, column_types.get(column))
+        indexes[column] = index.build(table_data)
+    return indexes
+
+
+def add_to_indexes(indexes, record):
+    for index in (indexes or {}).values():
+        index.add(record)
+
+
+def remove_from_indexes(indexes, record):
+    for index in (indexes or {}).values():
+        index.remove(record)
+
+
+def discard_from_indexes(indexes, records):
+    for index in (indexes or {}).values():
+        index.discard(records)
+
+
+def find_candidates(indexes, where_clause):
+    """Возвращает записи-кандидаты из индекса или None, если индекс не подходит."""
+    if not indexes or not where_clause:
+        return None
+
+    # Сначала точное совпадение, затем диапазон по упорядоченному индексу
+    for column, value in where_clause.items():
+        if column in indexes and not isinstance(value, Comparison):
+            return indexes[column].lookup(value)
+
+    for column, value in where_clause.items():
+        index = indexes.get(column)
+        if isinstance(value, Comparison) and isinstance(index, SortedIndex):
+            return index.lookup_comparison(value)
+    return None
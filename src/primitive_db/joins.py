@@ -0,0 +1,229 @@
+
+from .columnar import ColumnarTable
+from .constants import ERROR_MESSAGES, JOIN_LABELS
+from .core import iter_records
+from .parser import And, Not, Or
+from .planner import plan_data, plan_query
+from .predicates import compile_where
+
+
+def qualified_columns(table_name, columns):
+    return [
+        {"name": f"{table_name}.{col['name']}", "type": col["type"]}
+        for col in columns
+    ]
+
+
+class ColumnResolver:
+    """Приводит имена столбцов к виду <таблица>.<столбец>.
+
+    Имя без таблицы допустимо, если столбец с таким именем есть только
+    в одной из соединяемых таблиц.
+    """
+
+    def __init__(self, schemas):
+        self.schemas = {
+            table_name: {col["name"] for col in columns}
+            for table_name, columns in schemas.items()
+        }
+
+    def __call__(self, name):
+        if "." in name:
+            table_name, column = name.split(".", 1)
+            if column in self.schemas.get(table_name, ()):
+                return name
+            raise ValueError(ERROR_MESSAGES["column_not_found"].format(
+                column=column, table_name=table_name
+            ))
+        owners = [
+            table_name for table_name, names in self.schemas.items() if name in names
+        ]
+        if len(owners) == 1:
+            return f"{owners[0]}.{name}"
+        if owners:
+            raise ValueError(ERROR_MESSAGES["ambiguous_column"].format(
+                column=name, tables=", ".join(owners)
+            ))
+        raise ValueError(ERROR_MESSAGES["column_not_found"].format(
+            column=name, table_name=", ".join(self.schemas)
+        ))
+
+
+def rename_columns(node, rename):
+    """Копия дерева WHERE, в которой каждый столбец пропущен через rename."""
+    if isinstance(node, (And, Or)):
+        return type(node)(tuple(rename_columns(item, rename) for item in node.items))
+    if isinstance(node, Not):
+        return Not(rename_columns(node.item, rename))
+    return node._replace(column=rename(node.column))
+
+
+def node_tables(node):
+    if isinstance(node, (And, Or)):
+        return set().union(*(node_tables(item) for item in node.items))
+    if isinstance(node, Not):
+        return node_tables(node.item)
+    return {node.column.split(".", 1)[0]}
+
+
+def combine(items):
+    if not items:
+        return None
+    return items[0] if len(items) == 1 else And(tuple(items))
+
+
+def push_down(where, table_names):
+    """Делит условия верхнего AND на условия одной таблицы и общие.
+
+    Условия одной таблицы проверяются при ее просмотре (с индексами и
+    статистикой), поэтому в соединение попадают уже отобранные строки.
+    """
+    pushed = {table_name: [] for table_name in table_names}
+    residual = []
+    items = () if where is None else where.items if isinstance(where, And) else (where,)
+    for item in items:
+        tables = node_tables(item)
+        if len(tables) == 1:
+            table_name = tables.pop()
+            pushed[table_name].append(
+                rename_columns(item, lambda column: column.split(".", 1)[1])
+            )
+        else:
+            residual.append(item)
+    return {name: combine(items) for name, items in pushed.items()}, combine(residual)
+
+
+class JoinSide:
+    """Одна из соединяемых таблиц вместе с условием, опущенным в ее просмотр."""
+
+    def __init__(self, store, table_name, column, where):
+        self.store = store
+        self.table_name = table_name
+        self.column = column
+        self.columns = store.get_metadata()[table_name]["columns"]
+        self.predicate = compile_where(where, self.columns)
+        self.table_data = store.get_table(table_name)
+        self.plan = plan_query(store, table_name, self.predicate)
+        self.keys = [
+            (col["name"], f"{table_name}.{col['name']}") for col in self.columns
+        ]
+
+    @property
+    def estimated_rows(self):
+        return self.plan.estimated_rows
+
+    def rows(self):
+        if self.plan.empty:
+            return iter(())
+        return iter_records(
+            plan_data(self.plan, self.table_data), self.predicate, self.plan.indexes
+        )
+
+    def join_index(self):
+        """Индекс по столбцу соединения, если он есть у таблицы в виде строк."""
+        if isinstance(self.table_data, ColumnarTable):
+            return None
+        if self.column == "ID":
+            return self.store.get_primary_key(self.table_name)
+        return self.store.get_indexes(self.table_name).get(self.column)
+
+    def qualify(self, record):
+        return {key: record.get(name) for name, key in self.keys}
+
+
+class HashJoin:
+    """Соединение двух таблиц по равенству столбцов.
+
+    Меньшая (по оценке планировщика) сторона загружается в хеш-таблицу,
+    большая читается потоком. Если у одной из таблиц есть индекс по столбцу
+    соединения, хеш-таблица не строится: другая сторона ищет пары в индексе.
+    """
+
+    def __init__(self, store, table_name, join, where=None):
+        if join.table == table_name:
+            raise ValueError(
+                ERROR_MESSAGES["join_same_table"].format(table_name=table_name)
+            )
+        metadata = store.get_metadata()
+        if join.table not in metadata:
+            raise ValueError(
+                ERROR_MESSAGES["table_not_found"].format(table_name=join.table)
+            )
+
+        schemas = {
+            table_name: metadata[table_name]["columns"],
+            join.table: metadata[join.table]["columns"],
+        }
+        self.resolve = ColumnResolver(schemas)
+        self.resolve(f"{table_name}.{join.left_column}")
+        self.resolve(f"{join.table}.{join.right_column}")
+        self.columns = [
+            col
+            for name, columns in schemas.items()
+            for col in qualified_columns(name, columns)
+        ]
+
+        where = rename_columns(where, self.resolve) if where is not None else None
+        pushed, residual = push_down(where, schemas)
+        self.residual = compile_where(residual, self.columns)
+        left = JoinSide(store, table_name, join.left_column, pushed[table_name])
+        right = JoinSide(store, join.table, join.right_column, pushed[join.table])
+        self.left, self.right = left, right
+
+        # Индекс выгоднее всего у большей таблицы: тогда потоком идет меньшая
+        indexed = [side for side in (left, right) if side.join_index() is not None]
+        if indexed:
+            self.build = max(indexed, key=lambda side: side.estimated_rows)
+            self.method = "index"
+        else:
+            self.build = min((left, right), key=lambda side: side.estimated_rows)
+            self.method = "hash"
+        self.probe = right if self.build is left else left
+        column_types = {side: {col["name"]: col["type"] for col in side.columns}
+                        for side in (left, right)}
+        # Значения разных типов сравниваются как строки, как и в WHERE
+        self.same_types = (
+            column_types[left].get(left.column) == column_types[right].get(right.column)
+        )
+
+    def key(self, value):
+        return value if self.same_types else str(value)
+
+    def describe(self):
+        return JOIN_LABELS[self.method].format(
+            build=self.build.table_name, column=self.build.column,
+            rows=self.build.estimated_rows, probe=self.probe.table_name
+        )
+
+    def pairs(self):
+        """Пары (запись построения, запись прохода) с равными столбцами."""
+        probe_column = self.probe.column
+        if self.method == "index":
+            index = self.build.join_index()
+            predicate = self.build.predicate
+            test = predicate.test if predicate is not None else None
+            for record in self.probe.rows():
+                for match in index.lookup(record.get(probe_column)):
+                    if test is None or test(match):
+                        yield match, record
+            return
+
+        table = {}
+        key = self.key
+        build_column = self.build.column
+        for record in self.build.rows():
+            table.setdefault(key(record.get(build_column)), []).append(record)
+        for record in self.probe.rows():
+            for match in table.get(key(record.get(probe_column)), ()):
+                yield match, record
+
+    def __iter__(self):
+        """Поток соединенных записей с ключами <таблица>.<столбец>."""
+        build_is_left = self.build is self.left
+        residual = self.residual.test if self.residual is not None else None
+        for built, probed in self.pairs():
+            left, right = (built, probed) if build_is_left else (probed, built)
+            row = self.left.qualify(left)
+            row.update(self.right.qualify(right))
+            if residual is None or residual(row):
+                yield row
@@ -0,0 +1,133 @@
+
+import csv
+import json
+import os
+from itertools import islice
+
+from .constants import BULK_LOAD_CHUNK_SIZE, ERROR_MESSAGES, SUCCESS_MESSAGES
+from .core import reserve_ids
+from .decorators import handle_db_errors, log_time
+
+
+def convert_int(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, int):
+        return value
+    return int(value.strip())
+
+
+def convert_bool(value):
+    if isinstance(value, bool):
+        return value
+    lowered = str(value).strip().lower()
+    if lowered not in ("true", "false"):
+        raise ValueError(value)
+    return lowered == "true"
+
+
+COLUMN_CONVERTERS = {
+    "int": convert_int,
+    "str": str,
+    "bool": convert_bool,
+}
+
+
+def iter_csv_rows(filepath):
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def iter_jsonl_rows(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+READERS = {
+    ".csv": iter_csv_rows,
+    ".jsonl": iter_jsonl_rows,
+}
+
+
+def iter_chunks(rows, chunk_size=BULK_LOAD_CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def convert_chunk(chunk, columns, first_row_number):
+    """Проверяет и преобразует пачку строк по столбцам.
+
+    Возвращает список столбцов-значений в порядке columns.
+    """
+    converted = []
+    for column in columns:
+        name, col_type = column["name"], column["type"]
+        converter = COLUMN_CONVERTERS[col_type]
+        try:
+            raw = [row[name] for row in chunk]
+        except KeyError:
+            raise ValueError(ERROR_MESSAGES["missing_column"].format(column=name))
+
+        try:
+            converted.append([converter(value) for value in raw])
+        except (TypeError, ValueError, AttributeError):
+            # Медленный путь нужен только для того, чтобы указать строку с ошибкой
+            for offset, value in enumerate(raw):
+                try:
+                    converter(value)
+                except (TypeError, ValueError, AttributeError):
+                    raise ValueError(ERROR_MESSAGES["invalid_row_value"].format(
+                        row=first_row_number + offset, column=name,
+                        value=value, expected_type=col_type
+                    ))
+    return converted
+
+
+@handle_db_errors
+@log_time
+def bulk_load(metadata, table_name, filepath, table_data,
+              chunk_size=BULK_LOAD_CHUNK_SIZE):
+    """Загружает строки из CSV/JSONL в table_data.
+
+    Все пачки проверяются до изменения таблицы: при ошибке в любой строке
+    таблица остается прежней. Возвращает добавленные записи и сообщение.
+    """
+    if table_name not in metadata:
+        raise KeyError(ERROR_MESSAGES["table_not_found"].format(table_name=table_name))
+
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in READERS:
+        raise ValueError(ERROR_MESSAGES["unsupported_file"].format(
+            file=filepath, formats=", ".join(READERS)
+        ))
+
+    table_info = metadata[table_name]
+    columns = table_info["columns"][1:]
+    names = ["ID"] + [column["name"] for column in columns]
+    records = []
+    # Диапазон ID резервируется целиком только после успешной проверки файла
+    first_id = reserve_ids(table_info, 0, table_data)
+    next_id = first_id
+
+    for chunk in iter_chunks(READERS[extension](filepath), chunk_size):
+        values = convert_chunk(chunk, columns, len(records) + 1)
+        ids = range(next_id, next_id + len(chunk))
+        records.extend(dict(zip(names, row)) for row in zip(ids, *values))
+        next_id += len(chunk)
+
+    reserve_ids(table_info, len(records))
+    if isinstance(table_data, list):
+        table_data.extend(records)
+    else:
+        for record in records:
+            table_data.append(record)
+
+    return records, SUCCESS_MESSAGES["records_loaded"].format(
+        count=len(records), table_name=table_name
+    )
@@ -0,0 +1,86 @@
+
+import threading
+from contextlib import ExitStack, contextmanager
+
+
+class ReadWriteLock:
+    """Блокировка: много читателей одновременно или один писатель.
+
+    Ожидающий писатель не пропускает новых читателей вперед себя, чтобы
+    поток select не мог бесконечно откладывать изменения.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class LockManager:
+    """Блокировка каталога и по одной блокировке чтения-записи на таблицу.
+
+    Команды над данными берут каталог на чтение и свою таблицу; команды,
+    меняющие схему или файлы целиком, берут каталог на запись.
+    """
+
+    def __init__(self):
+        self.catalog = ReadWriteLock()
+        self.writer = threading.Lock()
+        self._tables = {}
+        self._mutex = threading.Lock()
+
+    def table(self, table_name):
+        with self._mutex:
+            lock = self._tables.get(table_name)
+            if lock is None:
+                lock = self._tables[table_name] = ReadWriteLock()
+            return lock
+
+    @contextmanager
+    def reading(self, *table_names):
+        # Несколько таблиц (JOIN) берутся в одном порядке всеми потоками
+        with self.catalog.read(), ExitStack() as stack:
+            for table_name in sorted(set(table_names)):
+                stack.enter_context(self.table(table_name).read())
+            yield
+
+    @contextmanager
+    def writing(self, table_name):
+        # Изменения сериализуются между собой, но не мешают select других таблиц
+        with self.catalog.read(), self.writer, self.table(table_name).write():
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        with self.catalog.write():
+            yield
@@ -1,10 +1,125 @@
 #!/usr/bin/env python3
 
-from .engine import run
+import argparse
+import sys
 
+# Движок, сервер и замеры импортируются в ветке режима, который их использует:
+# каждый запуск из конвейера оболочки не платит за то, что ему не нужно
+from .constants import (
+    BENCH_MESSAGES,
+    BENCH_OUTPUT_FILE,
+    BENCH_SAMPLES,
+    BENCH_SIZES,
+    SERVER_MESSAGES,
+    SOCKET_PATH,
+)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="database", description="Примитивная база данных"
+    )
+    parser.add_argument(
+        "mode", nargs="?", choices=("serve", "connect", "bench"),
+        help=("serve - запустить сервер, connect - подключиться к нему, "
+              "bench - замерить производительность")
+    )
+    parser.add_argument(
+        "--socket", default=SOCKET_PATH, metavar="ПУТЬ",
+        help=f"unix-сокет сервера (по умолчанию {SOCKET_PATH})"
+    )
+    parser.add_argument(
+        "-c", dest="command", metavar="КОМАНДА",
+        help="выполнить одну команду и выйти (с connect - на сервере)"
+    )
+    parser.add_argument(
+        "--script", metavar="ФАЙЛ",
+        help="выполнить команды из файла ('-' - из stdin) без диалога"
+    )
+    parser.add_argument(
+        "--yes", action="store_true",
+        help="отвечать 'y' на подтверждения в пакетном режиме"
+    )
+    parser.add_argument(
+        "--atomic", action="store_true",
+        help="при ошибке в пакете отменить все его изменения"
+    )
+    parser.add_argument(
+        "--sizes", type=parse_sizes, default=BENCH_SIZES, metavar="N,N,...",
+        help="bench: размеры синтетических таблиц в строках"
+    )
+    parser.add_argument(
+        "--samples", type=int, default=BENCH_SAMPLES, metavar="N",
+        help="bench: число замеров каждой операции"
+    )
+    parser.add_argument(
+        "--output", default=BENCH_OUTPUT_FILE, metavar="ФАЙЛ",
+        help=f"bench: файл результатов (по умолчанию {BENCH_OUTPUT_FILE})"
+    )
+    parser.add_argument(
+        "--baseline", metavar="ФАЙЛ",
+        help="bench: результаты прошлого запуска для сравнения"
+    )
+    return parser
+
+
+def parse_sizes(value):
+    try:
+        sizes = tuple(int(size) for size in value.split(","))
+    except ValueError:
+        sizes = ()
+    if not sizes or min(sizes) < 1:
+        raise argparse.ArgumentTypeError(
+            BENCH_MESSAGES["invalid_sizes"].format(value=value)
+        )
+    return sizes
+
+
+def run_client(args):
+    from .server import connect
+
+    if args.command is not None:
+        lines = args.command.splitlines()
+    else:
+        lines = None if sys.stdin.isatty() else sys.stdin
+    try:
+        return connect(args.socket, lines, assume_yes=args.yes)
+    except (ConnectionError, OSError) as e:
+        print(SERVER_MESSAGES["connect_failed"].format(path=args.socket, error=e))
+        return False
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.mode == "serve":
+        from .server import serve
+        serve(args.socket)
+        return
+    if args.mode == "connect":
+        sys.exit(0 if run_client(args) else 1)
+    if args.mode == "bench":
+        from .benchmarks import run_benchmarks
+        run_benchmarks(args.sizes, max(args.samples, 1), args.output, args.baseline)
+        return
+
+    from .engine import run, run_script
+
+    if args.command is not None:
+        # Одна команда: метаданные и таблицы читаются, только если она их касается
+        succeeded = run_script(
+            args.command.splitlines(), assume_yes=args.yes, atomic=args.atomic
+        )
+    elif args.script and args.script != "-":
+        with open(args.script, 'r', encoding='utf-8') as f:
+            succeeded = run_script(f, assume_yes=args.yes, atomic=args.atomic)
+    elif args.script == "-" or not sys.stdin.isatty():
+        succeeded = run_script(sys.stdin, assume_yes=args.yes, atomic=args.atomic)
+    else:
+        run()
+        return
+    sys.exit(0 if succeeded else 1)
 
-def main():
-    run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,263 @@
+
+import atexit
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from .columnar import ColumnarTable, StrColumn
+from .constants import PARALLEL_CHUNKS_PER_WORKER, PARALLEL_SCAN_MIN_ROWS
+from .predicates import compile_where
+from .utils import is_mapped_table
+
+# Сколько таблиц процесс пула держит открытыми между запросами
+ATTACHED_TABLES = 4
+ALIGNMENT = 8
+
+parallel_settings = {"min_rows": PARALLEL_SCAN_MIN_ROWS, "workers": os.cpu_count() or 1}
+
+
+class FileSource:
+    """Таблица в двоичном формате: процессы пула отображают тот же файл сами."""
+
+    def __init__(self, table):
+        self.path = os.path.abspath(table.filepath)
+        self.key = (self.path, table.file_id)
+
+    def open(self):
+        from .binary_format import MappedTable
+
+        table = MappedTable(self.path)
+        if (self.path, table.file_id) != self.key:
+            raise ValueError(f"Файл {self.path} изменился во время просмотра")
+        return table, None
+
+
+class SharedSource:
+    """Столбцы таблицы, скопированные в блок разделяемой памяти.
+
+    layout - (имя, тип, смещение, длина, словарь) для каждого столбца;
+    словарь есть только у str и хранится в формате двоичного файла таблицы.
+    """
+
+    def __init__(self, name, schema, rows, layout):
+        self.key = name
+        self.schema = schema
+        self.rows = rows
+        self.layout = layout
+
+    def open(self):
+        from multiprocessing.shared_memory import SharedMemory
+
+        from .binary_format import MappedBoolColumn, MappedIntColumn, MappedStrColumn
+
+        shm = SharedMemory(self.key)
+        table = ColumnarTable(self.schema)
+        for name, column_type, offset, length, dictionary in self.layout:
+            block = shm.buf[offset:offset + length]
+            if column_type == "int":
+                column = MappedIntColumn(block, self.rows)
+            elif column_type == "bool":
+                column = MappedBoolColumn(block, self.rows)
+            else:
+                column = StrColumn()
+                column.values = block.cast(column.typecode)
+                start, size, count = dictionary
+                values = MappedStrColumn(shm.buf[start:start + size], count)
+                column.dictionary = [values.get(i) for i in range(count)]
+            table.columns[name] = column
+        table._length = self.rows
+        return table, shm
+
+
+def export_columns(table):
+    """Копирует массивы колоночной таблицы в разделяемую память."""
+    from multiprocessing.shared_memory import SharedMemory
+
+    from .binary_format import encode_column
+
+    blocks = []
+    layout = []
+    offset = 0
+
+    def place(data):
+        nonlocal offset
+        offset += -offset % ALIGNMENT
+        blocks.append((offset, data))
+        start = offset
+        offset += len(data)
+        return start, len(data)
+
+    for col in table.schema:
+        column = table.columns[col["name"]]
+        start, length = place(memoryview(column.values).cast('B'))
+        dictionary = None
+        if col["type"] == "str":
+            encoded = encode_column("str", column.dictionary)
+            dictionary = (*place(encoded), len(column.dictionary))
+        layout.append((col["name"], col["type"], start, length, dictionary))
+
+    shm = SharedMemory(create=True, size=max(offset, 1))
+    for start, data in blocks:
+        shm.buf[start:start + len(data)] = data
+    return shm, SharedSource(shm.name, table.schema, len(table), layout)
+
+
+def release_shared(shm):
+    shm.close()
+    shm.unlink()
+
+
+_exports = weakref.WeakKeyDictionary()
+_exports_lock = threading.Lock()
+
+
+def shared_source(table):
+    """Источник данных таблицы для процессов пула.
+
+    Копия в разделяемой памяти делается один раз на версию таблицы и
+    удаляется, когда таблица меняется или перестает использоваться.
+    """
+    if is_mapped_table(table):
+        return FileSource(table)
+
+    with _exports_lock:
+        exported = _exports.get(table)
+        if exported is not None and exported[0] == table.version:
+            return exported[1]
+        if exported is not None:
+            exported[2]()
+        shm, source = export_columns(table)
+        release = weakref.finalize(table, release_shared, shm)
+        _exports[table] = (table.version, source, release)
+        return source
+
+
+_attached = OrderedDict()
+
+
+def attached_table(source):
+    """Открывает источник в процессе пула, переиспользуя уже открытые."""
+    entry = _attached.get(source.key)
+    if entry is not None:
+        _attached.move_to_end(source.key)
+        return entry[0]
+
+    _attached[source.key] = source.open()
+    while len(_attached) > ATTACHED_TABLES:
+        detach(_attached.popitem(last=False)[1])
+    return _attached[source.key][0]
+
+
+def detach(entry):
+    table, shm = entry
+    # Отображение можно закрыть только после освобождения столбцов
+    del entry, table
+    if shm is not None:
+        shm.close()
+
+
+def detach_all():
+    while _attached:
+        detach(_attached.popitem()[1])
+
+
+def init_worker():
+    # Иначе при завершении процесса память закрывается раньше столбцов
+    atexit.register(detach_all)
+
+
+def scan_chunk(source, ast, column_types, start, stop):
+    """Выполняется в процессе пула: номера подходящих строк диапазона."""
+    table = attached_table(source)
+    return list(table.evaluate(ast, range(start, stop), column_types))
+
+
+_pool = {"executor": None, "workers": 0}
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers):
+    # multiprocessing и concurrent.futures нужны только большим колоночным
+    # таблицам, поэтому не импортируются при запуске
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    with _pool_lock:
+        if _pool["executor"] is None or _pool["workers"] != workers:
+            if _pool["executor"] is not None:
+                _pool["executor"].shutdown(wait=False, cancel_futures=True)
+            # spawn безопасен и в многопоточном сервере, и на любой ОС
+            _pool["executor"] = ProcessPoolExecutor(
+                workers, mp_context=get_context("spawn"), initializer=init_worker
+            )
+            _pool["workers"] = workers
+        return _pool["executor"]
+
+
+def shutdown_pool():
+    with _pool_lock:
+        if _pool["executor"] is not None:
+            _pool["executor"].shutdown(cancel_futures=True)
+        _pool["executor"] = None
+        _pool["workers"] = 0
+
+
+def scan_workers(table_data):
+    """Число процессов для просмотра таблицы; 1 - просмотр в этом процессе."""
+    workers = parallel_settings["workers"]
+    if workers < 2 or not isinstance(table_data, ColumnarTable):
+        return 1
+    if len(table_data) < parallel_settings["min_rows"]:
+        return 1
+    return workers
+
+
+def split_rows(rows, parts):
+    size = -(-rows // parts)
+    return [(start, min(start + size, rows)) for start in range(0, rows, size)]
+
+
+def filter_positions(table_data, where_clause):
+    """Номера строк колоночной таблицы, подходящих под условие.
+
+    Большая таблица делится на диапазоны строк, которые проверяют процессы
+    пула; строки не пересылаются, процессы читают столбцы из разделяемой
+    памяти или из отображенного файла.
+    """
+    predicate = compile_where(where_clause, table_data.schema)
+    workers = scan_workers(table_data)
+    if predicate is None or workers == 1:
+        return table_data.filter(predicate)
+
+    from concurrent.futures.process import BrokenProcessPool
+
+    try:
+        source = shared_source(table_data)
+        pool = get_pool(workers)
+        ranges = split_rows(len(table_data), workers * PARALLEL_CHUNKS_PER_WORKER)
+        futures = [
+            pool.submit(
+                scan_chunk, source, predicate.ast, predicate.column_types, start, stop
+            )
+            for start, stop in ranges
+        ]
+        positions = []
+        for future in futures:
+            positions.extend(future.result())
+        return positions
+    except BrokenProcessPool:
+        # Процесс пула завершился аварийно - следующий запрос создаст новый пул
+        shutdown_pool()
+        return table_data.filter(predicate)
+    except Exception:
+        # Пул недоступен (нет процессов, разделяемой памяти и т.п.) -
+        # последовательный просмотр дает тот же результат
+        return table_data.filter(predicate)
+
+
+def configure_parallel_scan(min_rows=None, workers=None):
+    if min_rows is not None:
+        parallel_settings["min_rows"] = min_rows
+    if workers is not None:
+        parallel_settings["workers"] = max(workers, 1)
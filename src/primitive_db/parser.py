@@ -1,10 +1,81 @@
 
 import re
+import shlex
 
 
+from collections import namedtuple
 from .constants import ERROR_MESSAGES
 
 
+# Условие сравнения в WHERE, отличное от равенства: op in <, <=, >, >=, between.
+# Для between value - пара (нижняя_граница, верхняя_граница).
+Comparison = namedtuple("Comparison", ["op", "value"])
+
+RANGE_OPERATORS = ("<=", ">=", "<", ">")
+
+# Узлы дерева выражения WHERE
+Compare = namedtuple("Compare", ["column", "op", "value"])
+InList = namedtuple("InList", ["column", "values", "negated"])
+Like = namedtuple("Like", ["column", "pattern", "negated"])
+And = namedtuple("And", ["items"])
+Or = namedtuple("Or", ["items"])
+Not = namedtuple("Not", ["item"])
+
+AGGREGATE_FUNCTIONS = ("count", "sum", "avg", "min", "max")
+
+
+class Aggregate(namedtuple("Aggregate", ["func", "column"])):
+    """Агрегатная функция из списка SELECT; column - "*" для count(*)."""
+
+    def __str__(self):
+        return f"{self.func}({self.column})"
+
+
+# Имя столбца; в JOIN - с именем таблицы: <таблица>.<столбец>
+COLUMN_NAME = r"\w+(?:\.\w+)?"
+
+SELECT_ITEM = re.compile(rf"(\w+)\s*\(\s*(\*|{COLUMN_NAME})\s*\)|({COLUMN_NAME})")
+
+# Соединение с таблицей table по условию <левая>.left_column = <table>.right_column
+Join = namedtuple("Join", ["table", "left_column", "right_column"])
+
+JOIN_CONDITION = re.compile(r"(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)")
+# Одно присваивание из SET: <столбец> = <значение>
+SET_ASSIGNMENT = re.compile(r"\s*(\w+)\s*=\s*(.+?)\s*", re.DOTALL)
+
+# Ключи options, которые задают сам результат, а не порядок и страницу
+QUERY_OPTIONS = ("columns", "group_by", "join")
+
+SELECT_TAIL_KEYWORDS = ('where', 'group', 'order', 'limit', 'offset')
+
+COMPARE_OPERATORS = {
+    "=": "=", "!=": "!=", "<>": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">=",
+}
+
+WHERE_TOKEN = re.compile(
+    r"""\s*(?:(?P<string>"[^"]*"|'[^']*')|(?P<op><=|>=|!=|<>|=|<|>)"""
+    r"""|(?P<punct>[(),])|(?P<word>[^\s(),=<>!"']+))"""
+)
+
+# Маркер параметра ? в команде prepare (см. statements.mark_placeholders)
+PLACEHOLDER = re.compile("\x00(\\d+)\x00")
+
+# Аргумент-значение без кавычек: значение, знаки и скобки после него
+# (v - значение). В списке IN через запятую бывает несколько значений.
+VALUE_SHAPE = re.compile(r"v\)*")
+IN_VALUES_SHAPE = re.compile(r"v(?:,v)*(?:,|\)*)")
+
+
+def parse_command(user_input):
+    try:
+        parts = shlex.split(user_input)
+        if not parts:
+            return None, []
+        return parts[0].lower(), parts[1:]
+    except ValueError as e:
+        return None, [ERROR_MESSAGES["parse_error"].format(error=e)]
+
+
 def parse_insert_values(values_str):
     values_str = values_str.strip()
     if values_str.startswith('(') and values_str.endswith(')'):
@@ -36,37 +107,292 @@ def parse_insert_values(values_str):
     return values
 
 
-def parse_where_clause(where_str):
-    if not where_str:
+def next_token(text, position):
+    """Лексема условия, которая начинается в text с position, и ее конец."""
+    match = WHERE_TOKEN.match(text, position)
+    if not match or match.end() == position:
+        raise ValueError(f"Неожиданный символ в условии: {text[position:]}")
+    kind = match.lastgroup
+    value = match.group(kind)
+    if kind == "string":
+        value = value[1:-1]
+    return (kind, value), match.end()
+
+
+def lex_where(text):
+    """Разбивает текст условия с кавычками на лексемы (kind, text)."""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        token, position = next_token(text, position)
+        tokens.append(token)
+    return tokens
+
+
+def is_keyword(token, *keywords):
+    return token[0] == "word" and token[1].lower() in keywords
+
+
+def expects_value(tokens):
+    """True, если следующая лексема условия - значение, а не столбец или слово."""
+    if not tokens:
+        return False
+    last = tokens[-1]
+    if last[0] == "op" or last == ("punct", ","):
+        return True
+    if last == ("punct", "("):
+        return len(tokens) > 1 and is_keyword(tokens[-2], "in")
+    if is_keyword(last, "like", "between"):
+        return True
+    return is_keyword(last, "and") and len(tokens) > 2 and is_keyword(
+        tokens[-3], "between"
+    )
+
+
+def lex_value(text, tokens):
+    """Лексемы аргумента shlex на месте значения.
+
+    Значение без кавычек вроде 5), 1, или 1,2) в списке IN разбирается как
+    обычно. Иначе shlex уже снял с аргумента кавычки, и он целиком -
+    строковая константа: от нее отделяются только закрывающие скобки
+    открытых выражений и запятая списка IN. Поэтому в списке IN строка
+    с запятой без пробелов неотличима от двух значений.
+    """
+    in_list = tokens[-1] in (("punct", ","), ("punct", "("))
+    try:
+        lexed = lex_where(text)
+    except ValueError:
+        lexed = []
+    shape = "".join("v" if kind != "punct" else value for kind, value in lexed)
+    if (IN_VALUES_SHAPE if in_list else VALUE_SHAPE).fullmatch(shape):
+        return lexed
+
+    tail = []
+    if in_list and text.endswith(","):
+        text, tail = text[:-1], [("punct", ",")]
+    else:
+        depth = tokens.count(("punct", "(")) - tokens.count(("punct", ")"))
+        while depth > 0 and text.endswith(")"):
+            text, tail, depth = text[:-1], tail + [("punct", ")")], depth - 1
+    if not text and tail:
+        # Одни скобки вместо значения - ошибку покажет разбор условия
+        return tail
+    return [("string", text)] + tail
+
+
+def tokenize_where(where, starts=None):
+    """Разбивает условие на лексемы.
+
+    Принимает строку или список аргументов после shlex. В списке аргумент
+    на месте значения (после оператора, LIKE, BETWEEN и в списке IN) с
+    символами вроде ! = ' , был в кавычках и считается строковой константой.
+    starts получает номер аргумента, с которого начинается каждая лексема.
+    """
+    if isinstance(where, str):
+        return lex_where(where)
+
+    tokens = []
+    for number, part in enumerate(where):
+        if starts is not None:
+            starts.setdefault(len(tokens), number)
+        if expects_value(tokens):
+            tokens.extend(lex_value(part, tokens))
+            continue
+
+        position = 0
+        part = part.rstrip()
+        while position < len(part):
+            if expects_value(tokens):
+                tokens.extend(lex_value(part[position:], tokens))
+                break
+            token, position = next_token(part, position)
+            tokens.append(token)
+    return tokens
+
+
+class WhereParser:
+    """Разбор условия WHERE методом рекурсивного спуска.
+
+    expr    := and_expr (OR and_expr)*
+    and_expr:= not_expr (AND not_expr)*
+    not_expr:= NOT not_expr | '(' expr ')' | условие
+    условие := столбец (оп значение | [NOT] IN (значение, ...)
+               | [NOT] LIKE шаблон | [NOT] BETWEEN значение AND значение)
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def accept_keyword(self, keyword):
+        kind, text = self.peek()
+        if kind == "word" and text.lower() == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind, text=None):
+        token_kind, token_text = self.take()
+        if token_kind != kind or (text is not None and token_text != text):
+            raise ValueError(f"Ожидалось {text or kind}")
+        return token_text
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Лишний текст в условии: {self.peek()[1]}")
+        return node
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.accept_keyword("or"):
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def parse_and(self):
+        items = [self.parse_not()]
+        while self.accept_keyword("and"):
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def parse_not(self):
+        if self.accept_keyword("not"):
+            return Not(self.parse_not())
+        if self.peek() == ("punct", "("):
+            self.take()
+            node = self.parse_or()
+            self.expect("punct", ")")
+            return node
+        return self.parse_condition()
+
+    def parse_value(self):
+        kind, text = self.take()
+        if kind == "string":
+            return text
+        if kind == "word":
+            return parse_value(text)
+        raise ValueError("Ожидалось значение")
+
+    def parse_condition(self):
+        column = self.expect("word")
+        if not re.fullmatch(COLUMN_NAME, column):
+            raise ValueError(f"Некорректное имя столбца: {column}")
+
+        kind, text = self.peek()
+        if kind == "op":
+            self.take()
+            return Compare(column, COMPARE_OPERATORS[text], self.parse_value())
+
+        negated = self.accept_keyword("not")
+        if self.accept_keyword("in"):
+            self.expect("punct", "(")
+            values = [self.parse_value()]
+            while self.peek() == ("punct", ","):
+                self.take()
+                values.append(self.parse_value())
+            self.expect("punct", ")")
+            return InList(column, tuple(values), negated)
+        if self.accept_keyword("like"):
+            return Like(column, str(self.parse_value()), negated)
+        if self.accept_keyword("between"):
+            low = self.parse_value()
+            if not self.accept_keyword("and"):
+                raise ValueError("Ожидалось AND в BETWEEN")
+            node = Compare(column, "between", (low, self.parse_value()))
+            return Not(node) if negated else node
+        raise ValueError(f"Ожидался оператор после {column}")
+
+
+def parse_where_prefix(args):
+    """Разбирает условие WHERE в начале списка аргументов.
+
+    Возвращает (дерево, число занятых аргументов): условие заканчивается
+    там, где грамматика не может его продолжить. Поэтому group, order,
+    limit и offset в роли значений (shlex уже снял с них кавычки) не
+    считаются началом хвоста SELECT. При ошибке - ValueError.
+    """
+    starts = {}
+    tokens = tokenize_where(args, starts)
+    parser = WhereParser(tokens)
+    node = parser.parse_or()
+    if parser.position == len(tokens):
+        return node, len(args)
+    if parser.position not in starts:
+        raise ValueError(f"Лишний текст в условии: {parser.peek()[1]}")
+    return node, starts[parser.position]
+
+
+def parse_where_clause(where):
+    """Разбирает условие WHERE в дерево выражения или возвращает None."""
+    if not where:
         return None
     
-    pattern = r'^\s*(\w+)\s*=\s*(.+)\s*$'
-    match = re.match(pattern, where_str)
-    
-    if not match:
+    try:
+        return WhereParser(tokenize_where(where)).parse()
+    except ValueError:
         return None
+
+
+def format_where(node):
+    """Собирает из дерева читаемое условие для сообщений и ключей кэша."""
+    if isinstance(node, And):
+        return "(" + " and ".join(format_where(item) for item in node.items) + ")"
+    if isinstance(node, Or):
+        return "(" + " or ".join(format_where(item) for item in node.items) + ")"
+    if isinstance(node, Not):
+        return f"not {format_where(node.item)}"
+    if isinstance(node, InList):
+        values = ", ".join(repr(value) for value in node.values)
+        return f"{node.column} {'not in' if node.negated else 'in'} ({values})"
+    if isinstance(node, Like):
+        operator = "not like" if node.negated else "like"
+        return f"{node.column} {operator} {node.pattern!r}"
+    if node.op == "between":
+        low, high = node.value
+        return f"{node.column} between {low!r} and {high!r}"
+    return f"{node.column} {node.op} {node.value!r}"
+
+
+def quote_argument(part):
+    """Возвращает кавычки аргументу с пробелами, чтобы запятые в нем не делили SET.
     
-    column = match.group(1)
-    value_str = match.group(2).strip()
-    
-    value = parse_value(value_str)
-    
-    return {column: value}
+    shlex приклеивает запятую после кавычек к значению: "a b", -> a b,
+    """
+    if not any(char.isspace() for char in part):
+        return part
+    if part.endswith(","):
+        return f'"{part[:-1]}",'
+    return f'"{part}"'
 
 
 def parse_set_clause(set_str):
-    pattern = r'^\s*(\w+)\s*=\s*(.+)\s*$'
-    match = re.match(pattern, set_str)
-    
-    if not match:
-        return None
+    """Разбирает <столбец> = <значение>[, <столбец> = <значение> ...] в словарь.
     
-    column = match.group(1)
-    value_str = match.group(2).strip()
+    Принимает строку или список аргументов после shlex (аргумент с пробелами
+    был в кавычках). Возвращает None при ошибке или повторе столбца.
+    """
+    if not isinstance(set_str, str):
+        set_str = " ".join(quote_argument(part) for part in set_str)
     
-    value = parse_value(value_str)
+    set_clause = {}
+    for assignment in parse_insert_values(set_str):
+        match = SET_ASSIGNMENT.fullmatch(assignment)
+        if not match or match.group(1) in set_clause:
+            return None
+        set_clause[match.group(1)] = parse_value(match.group(2))
     
-    return {column: value}
+    return set_clause or None
 
 
 def parse_value(value_str):
@@ -100,21 +426,159 @@ def parse_insert_command(args):
     return table_name, values
 
 
+def parse_select_list(text):
+    """Разбирает список SELECT: столбцы и агрегаты через запятую.
+
+    Возвращает None для "*" и при ошибке - ValueError.
+    """
+    if text.strip() == "*":
+        return None
+    items = []
+    for part in text.split(","):
+        match = SELECT_ITEM.fullmatch(part.strip())
+        if not match:
+            raise ValueError(f"Некорректный элемент списка SELECT: {part.strip()}")
+        func, column, name = match.groups()
+        if name:
+            items.append(name)
+            continue
+        func = func.lower()
+        if func not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Неизвестная функция {func}")
+        if column == "*" and func != "count":
+            raise ValueError(f"Функция {func} требует столбец")
+        items.append(Aggregate(func, column))
+    return items
+
+
+def parse_join_clause(left_table, right_table, condition):
+    """Разбирает ON <таблица>.<столбец> = <таблица>.<столбец> в Join."""
+    match = JOIN_CONDITION.fullmatch(condition.strip())
+    if not match:
+        raise ValueError(
+            "Условие JOIN должно иметь вид <таблица>.<столбец> = <таблица>.<столбец>"
+        )
+    first_table, first_column, second_table, second_column = match.groups()
+    if (first_table, second_table) == (right_table, left_table):
+        first_column, second_column = second_column, first_column
+    elif (first_table, second_table) != (left_table, right_table):
+        raise ValueError(
+            f"Условие JOIN должно связывать таблицы {left_table} и {right_table}"
+        )
+    return Join(right_table, first_column, second_column)
+
+
+def split_select_options(options):
+    """Отделяет список SELECT и GROUP BY от порядка и страницы результата."""
+    page = {key: value for key, value in options.items() if key not in QUERY_OPTIONS}
+    query = {key: options.get(key) for key in QUERY_OPTIONS}
+    return page, query
+
+
+def parse_page_value(text):
+    """Число LIMIT/OFFSET; маркер параметра остается до execute, иначе None."""
+    if text.isdigit():
+        return int(text)
+    return text if PLACEHOLDER.fullmatch(text) else None
+
+
+def parse_select_options(args):
+    """Разбирает хвост SELECT: group by, order by [asc|desc], limit и offset."""
+    options = {"order_by": None, "descending": False, "limit": None, "offset": 0}
+    lowered = [arg.lower() for arg in args]
+    i = 0
+
+    while i < len(args):
+        if lowered[i] == 'group' and i + 2 < len(args) and lowered[i + 1] == 'by':
+            options["group_by"] = args[i + 2]
+            i += 3
+        elif lowered[i] == 'order' and i + 2 < len(args) and lowered[i + 1] == 'by':
+            options["order_by"] = args[i + 2]
+            i += 3
+            if i < len(args) and lowered[i] in ('asc', 'desc'):
+                options["descending"] = lowered[i] == 'desc'
+                i += 1
+        elif lowered[i] in ('limit', 'offset') and i + 1 < len(args):
+            value = parse_page_value(args[i + 1])
+            if value is None:
+                return None
+            options[lowered[i]] = value
+            i += 2
+        else:
+            return None
+
+    return options
+
+
 def parse_select_command(args):
+    """Разбирает select [<список>] from <таблица> [join ... on ...] [where ...] ...
+
+    Список SELECT, GROUP BY и JOIN попадают в options под ключами columns,
+    group_by и join (см. split_select_options).
+    """
+    lowered = [arg.lower() for arg in args]
+    columns = None
+    if args and lowered[0] != 'from' and 'from' in lowered:
+        from_index = lowered.index('from')
+        try:
+            columns = parse_select_list(" ".join(args[:from_index]))
+        except ValueError as e:
+            return None, None, None, ERROR_MESSAGES["parse_error"].format(error=e)
+        args = args[from_index:]
+
     if len(args) < 2 or args[0].lower() != 'from':
-        return None, None, ERROR_MESSAGES["parse_error"].format(error="Некорректный формат команды SELECT")
+        return None, None, None, ERROR_MESSAGES["parse_error"].format(
+            error="Некорректный формат команды SELECT"
+        )
     
     table_name = args[1]
     where_clause = None
     
-    # Проверяем наличие WHERE
-    if len(args) > 3 and args[2].lower() == 'where':
-        where_str = ' '.join(args[3:])
-        where_clause = parse_where_clause(where_str)
-        if where_clause is None:
-            return table_name, None, ERROR_MESSAGES["parse_error"].format(error="Некорректное WHERE условие")
-    
-    return table_name, where_clause, None
+    lowered = [arg.lower() for arg in args]
+    join = None
+    if len(args) > 2 and lowered[2] == 'join':
+        if len(args) < 6 or lowered[4] != 'on':
+            error = ERROR_MESSAGES["parse_error"].format(
+                error="Некорректный формат JOIN"
+            )
+            return table_name, None, None, error
+        end = next(
+            (i for i in range(5, len(args)) if lowered[i] in SELECT_TAIL_KEYWORDS),
+            len(args),
+        )
+        try:
+            join = parse_join_clause(table_name, args[3], " ".join(args[5:end]))
+        except ValueError as e:
+            return table_name, None, None, ERROR_MESSAGES["parse_error"].format(error=e)
+        # Дальше команда разбирается так, будто JOIN в ней не было
+        args = args[:2] + args[end:]
+        lowered = lowered[:2] + lowered[end:]
+
+    # Хвост ищется после WHERE: иначе значение "order" в условии обрезало бы его
+    tail_start = 2
+    error = None
+    if len(args) > 2 and lowered[2] == 'where':
+        try:
+            where_clause, consumed = parse_where_prefix(args[3:])
+        except ValueError:
+            consumed = 0
+        tail_start = 3 + consumed
+        tail = lowered[tail_start:tail_start + 1]
+        if not consumed or (tail and tail[0] not in SELECT_TAIL_KEYWORDS):
+            error = "Некорректное WHERE условие"
+    elif len(args) > 2 and lowered[2] not in SELECT_TAIL_KEYWORDS:
+        error = "Некорректный формат команды SELECT"
+    if error:
+        return table_name, None, None, ERROR_MESSAGES["parse_error"].format(error=error)
+
+    options = parse_select_options(args[tail_start:])
+    if options is None:
+        return table_name, None, None, ERROR_MESSAGES["invalid_select_tail"]
+    options["columns"] = columns
+    options.setdefault("group_by", None)
+    options["join"] = join
+
+    return table_name, where_clause, options, None
 
 
 def parse_update_command(args):
@@ -126,13 +590,11 @@ def parse_update_command(args):
     set_index = args.index('set') if 'set' in args else args.index('SET')
     where_index = args.index('where') if 'where' in args else args.index('WHERE')
     
-    set_str = ' '.join(args[set_index + 1:where_index])
-    set_clause = parse_set_clause(set_str)
+    set_clause = parse_set_clause(args[set_index + 1:where_index])
     if set_clause is None:
         return None, None, None, ERROR_MESSAGES["parse_error"].format(error="Некорректное SET условие")
     
-    where_str = ' '.join(args[where_index + 1:])
-    where_clause = parse_where_clause(where_str)
+    where_clause = parse_where_clause(args[where_index + 1:])
     if where_clause is None:
         return None, None, None, ERROR_MESSAGES["parse_error"].format(error="Некорректное WHERE условие")
     
@@ -144,8 +606,7 @@ def parse_delete_command(args):
         return None, None, ERROR_MESSAGES["parse_error"].format(error="Некорректный формат команды DELETE")
     
     table_name = args[1]
-    where_str = ' '.join(args[3:])
-    where_clause = parse_where_clause(where_str)
+    where_clause = parse_where_clause(args[3:])
     
     if where_clause is None:
         return table_name, None, ERROR_MESSAGES["parse_error"].format(error="Некорректное WHERE условие")
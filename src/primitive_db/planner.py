@@ -0,0 +1,536 @@
+
+import math
+
+from .columnar import ColumnarTable
+from .constants import (
+    EXPLAIN_MESSAGES,
+    INDEX_ROW_COST,
+    PARALLEL_SCAN_LABEL,
+    PLAN_ACCESS_LABELS,
+    SCAN_ROW_COST,
+)
+from .core import select, select_query_key
+from .decorators import cacher
+from .indexes import SortedIndex
+from .parallel import scan_workers
+from .parser import And, Compare, Comparison, InList, Like, Not, Or
+from .predicates import convert_constant
+from .segments import (
+    SegmentedTable,
+    segment_key,
+    split_by_segment,
+    split_ids,
+)
+
+PRIMARY_KEY = "ID"
+
+
+def column_values(table_data, column_name):
+    """Значения столбца без превращения колоночной таблицы в словари."""
+    if isinstance(table_data, ColumnarTable):
+        column = table_data.columns[column_name]
+        if hasattr(column, "dictionary"):
+            # Словарь может хранить уже удаленные значения: границы лишь шире
+            return column.dictionary
+        if hasattr(column, "values"):
+            return column.values
+        return (column.get(i) for i in range(len(table_data)))
+    return (record.get(column_name) for record in table_data)
+
+
+def collect_stats(columns, table_data):
+    """Считает число строк, число различных значений и min/max по столбцам."""
+    stats = {"rows": len(table_data), "columns": {}}
+    for col in columns:
+        distinct = set(column_values(table_data, col["name"]))
+        entry = {"distinct": len(distinct)}
+        if distinct:
+            try:
+                entry["min"], entry["max"] = min(distinct), max(distinct)
+            except TypeError:
+                pass
+        stats["columns"][col["name"]] = entry
+    return stats
+
+
+def merge_stats(entries):
+    """Статистика таблицы из статистик ее сегментов.
+
+    Столбец, почти уникальный в каждом сегменте, считается уникальным и в
+    таблице; у остальных значения считаются повторяющимися между сегментами.
+    """
+    entries = [entry for entry in entries if entry["rows"]]
+    stats = {"rows": sum(entry["rows"] for entry in entries), "columns": {}}
+    names = dict.fromkeys(name for entry in entries for name in entry["columns"])
+    for name in names:
+        columns = [entry["columns"].get(name, {}) for entry in entries]
+        distinct = [column.get("distinct", 0) for column in columns]
+        merged = {"distinct": max(distinct)}
+        if sum(distinct) >= 0.9 * stats["rows"]:
+            merged["distinct"] = min(sum(distinct), stats["rows"])
+        if all("min" in column for column in columns):
+            try:
+                merged["min"] = min(column["min"] for column in columns)
+                merged["max"] = max(column["max"] for column in columns)
+            except TypeError:
+                merged.pop("min", None)
+        stats["columns"][name] = merged
+    return stats
+
+
+def get_stats(store, table_name, table_data):
+    """Возвращает статистику из метаданных, пересчитывая ее при расхождении."""
+    # select пересчитывает статистику под блокировкой чтения таблицы
+    with store.building(table_name):
+        if isinstance(table_data, SegmentedTable):
+            # Статистика сегментов поддерживается изменениями: таблицу читать не нужно
+            return merge_stats(stats for number, stats in table_data.all_stats())
+        table_info = store.get_metadata()[table_name]
+        stats = table_info.get("stats")
+        if stats is None or stats["rows"] != len(table_data):
+            stats = collect_stats(table_info["columns"], table_data)
+            table_info["stats"] = stats
+            store.mark_metadata_dirty()
+        return stats
+
+
+def add_to_stats(stats, records):
+    if stats["rows"] == 0:
+        # У пустой таблицы нет границ min/max - они берутся из самих записей
+        names = [{"name": name} for name in stats["columns"]]
+        stats.update(collect_stats(names, records))
+        return
+    stats["rows"] += len(records)
+    for name, entry in stats["columns"].items():
+        values = [record.get(name) for record in records]
+        if "min" not in entry:
+            continue
+        try:
+            low, high = entry["min"], entry["max"]
+            # Значения вне прежних границ точно новые, внутри - считаем повторами
+            new_values = {value for value in values if value < low or value > high}
+            entry["min"], entry["max"] = min(low, *values), max(high, *values)
+        except TypeError:
+            del entry["min"], entry["max"]
+            continue
+        entry["distinct"] = min(entry["distinct"] + len(new_values), stats["rows"])
+
+
+def note_inserted(table_info, records):
+    """Дополняет статистику вставленными записями, не просматривая таблицу."""
+    if not records:
+        return
+    if table_info.get("stats") is not None:
+        add_to_stats(table_info["stats"], records)
+    segments = table_info.get("segments")
+    if segments is None:
+        return
+    for number, group in split_by_segment(records, segments["size"]).items():
+        entry = segments["stats"].get(segment_key(number))
+        if entry is None:
+            # Сегмент без статистики был пуст: прочитанный сегмент ее получает
+            segments["stats"][segment_key(number)] = collect_stats(
+                table_info["columns"], group
+            )
+        else:
+            add_to_stats(entry, group)
+
+
+def remove_from_stats(stats, count):
+    # Границы min/max остаются верными (только шире), уточняется число строк
+    stats["rows"] = max(stats["rows"] - count, 0)
+    for entry in stats["columns"].values():
+        entry["distinct"] = min(entry["distinct"], stats["rows"])
+
+
+def note_deleted(table_info, ids):
+    if table_info.get("stats") is not None:
+        remove_from_stats(table_info["stats"], len(ids))
+    segments = table_info.get("segments")
+    if segments is None:
+        return
+    for number, group in split_ids(ids, segments["size"]).items():
+        entry = segments["stats"].get(segment_key(number))
+        if entry is not None:
+            remove_from_stats(entry, len(group))
+
+
+def update_stats(stats, values, count):
+    """Учитывает count записей, получивших значения values из SET.
+
+    Границы min/max только расширяются новым значением; значение вне
+    прежних границ точно новое. Если обновлены все строки, столбец
+    известен целиком: у него одно значение.
+    """
+    for name, value in values.items():
+        entry = stats["columns"].get(name)
+        if entry is None:
+            continue
+        if count >= stats["rows"]:
+            entry.clear()
+            entry.update({"distinct": 1, "min": value, "max": value})
+            continue
+        if "min" not in entry:
+            continue
+        try:
+            new_value = value < entry["min"] or value > entry["max"]
+            entry["min"] = min(entry["min"], value)
+            entry["max"] = max(entry["max"], value)
+        except TypeError:
+            del entry["min"], entry["max"]
+            continue
+        if new_value:
+            entry["distinct"] = min(entry["distinct"] + 1, stats["rows"])
+
+
+def note_updated(table_info, ids, values):
+    """Дополняет статистику обновленными значениями, не просматривая таблицу."""
+    if not ids:
+        return
+    if table_info.get("stats") is not None:
+        update_stats(table_info["stats"], values, len(ids))
+    segments = table_info.get("segments")
+    if segments is None:
+        return
+    for number, group in split_ids(ids, segments["size"]).items():
+        entry = segments["stats"].get(segment_key(number))
+        if entry is not None:
+            update_stats(entry, values, len(group))
+
+
+class Bounds:
+    """Выводы об условии по границам min/max столбцов.
+
+    never/always возвращают True, только если результат известен наверняка.
+    """
+
+    def __init__(self, stats, column_types):
+        self.stats = stats
+        self.column_types = column_types
+
+    def entry(self, column):
+        entry = self.stats["columns"].get(column)
+        column_type = self.column_types.get(column)
+        if entry is None or "min" not in entry or column_type is None:
+            return None, None
+        return entry, column_type
+
+    def convert(self, value, column_type):
+        try:
+            return convert_constant(value, column_type)
+        except ValueError:
+            return None
+
+    def never(self, node):
+        if self.stats["rows"] == 0:
+            return True
+        if isinstance(node, And):
+            return any(self.never(item) for item in node.items)
+        if isinstance(node, Or):
+            return all(self.never(item) for item in node.items)
+        if isinstance(node, Not):
+            return self.always(node.item)
+        return self.check_leaf(node, expected=False)
+
+    def always(self, node):
+        if self.stats["rows"] == 0:
+            return False
+        if isinstance(node, And):
+            return all(self.always(item) for item in node.items)
+        if isinstance(node, Or):
+            return any(self.always(item) for item in node.items)
+        if isinstance(node, Not):
+            return self.never(node.item)
+        return self.check_leaf(node, expected=True)
+
+    def check_leaf(self, node, expected):
+        try:
+            return self.leaf(node, expected)
+        except TypeError:
+            # Значения столбца и константа несравнимы - выводов не делаем
+            return False
+
+    def leaf(self, node, expected):
+        """Возвращает True, если условие узла точно равно expected для всех строк."""
+        if isinstance(node, Like):
+            return False
+        entry, column_type = self.entry(node.column)
+        if entry is None:
+            return False
+        low, high = entry["min"], entry["max"]
+
+        if isinstance(node, InList):
+            values = [self.convert(value, column_type) for value in node.values]
+            if any(value is None for value in values):
+                return False
+            outside = all(value < low or value > high for value in values)
+            return outside if expected == node.negated else False
+
+        if node.op == "between":
+            bounds = [self.convert(value, column_type) for value in node.value]
+            if None in bounds:
+                return False
+            first, last = bounds
+            if expected:
+                return first <= low and high <= last
+            return last < low or first > high or first > last
+
+        value = self.convert(node.value, column_type)
+        if value is None:
+            return False
+        single = low == high == value
+        outside = value < low or value > high
+        checks = {
+            "=": (single, outside),
+            "!=": (outside, single),
+            "<": (high < value, low >= value),
+            "<=": (high <= value, low > value),
+            ">": (low > value, high <= value),
+            ">=": (low >= value, high < value),
+        }
+        if node.op not in checks:
+            return False
+        return checks[node.op][0 if expected else 1]
+
+
+def estimate_selectivity(node, stats, column_types):
+    """Доля строк, проходящих условие, в предположении независимости столбцов."""
+    if isinstance(node, And):
+        result = 1.0
+        for item in node.items:
+            result *= estimate_selectivity(item, stats, column_types)
+        return result
+    if isinstance(node, Or):
+        missed = 1.0
+        for item in node.items:
+            missed *= 1.0 - estimate_selectivity(item, stats, column_types)
+        return 1.0 - missed
+    if isinstance(node, Not):
+        return 1.0 - estimate_selectivity(node.item, stats, column_types)
+    if isinstance(node, Like):
+        return 0.25
+
+    rows = max(stats["rows"], 1)
+    entry = stats["columns"].get(node.column, {})
+    distinct = max(entry.get("distinct", rows), 1)
+    if node.column == PRIMARY_KEY:
+        distinct = rows
+
+    if isinstance(node, InList):
+        fraction = min(len(node.values) / distinct, 1.0)
+        return 1.0 - fraction if node.negated else fraction
+    if node.op == "=":
+        return 1.0 / distinct
+    if node.op == "!=":
+        return 1.0 - 1.0 / distinct
+
+    if column_types.get(node.column) == "int" and "min" in entry:
+        span = entry["max"] - entry["min"]
+        try:
+            if node.op == "between":
+                low, high = (int(value) for value in node.value)
+            elif node.op in ("<", "<="):
+                low, high = entry["min"], int(node.value)
+            else:
+                low, high = int(node.value), entry["max"]
+        except (TypeError, ValueError):
+            return 1.0 / 3
+        if span <= 0:
+            return 1.0
+        covered = min(high, entry["max"]) - max(low, entry["min"])
+        return min(max(covered / span, 1.0 / rows), 1.0)
+    return 0.25 if node.op == "between" else 1.0 / 3
+
+
+class Plan:
+    """Выбранный способ выполнения запроса и его оценка."""
+
+    def __init__(self, table_name, predicate, access, estimated_rows, cost,
+                 indexes=None, column=None, order_index=None, workers=1,
+                 segments=None, total_segments=0):
+        self.table_name = table_name
+        self.predicate = predicate
+        self.access = access
+        self.estimated_rows = estimated_rows
+        self.cost = cost
+        self.indexes = indexes or {}
+        self.column = column
+        self.order_index = order_index
+        self.workers = workers
+        # Номера сегментов, которые нужно прочитать (None - таблица целиком)
+        self.segments = segments
+        self.total_segments = total_segments
+
+    @property
+    def empty(self):
+        return self.access == "empty"
+
+    def describe_access(self):
+        label = PLAN_ACCESS_LABELS[self.access]
+        if self.access == "index":
+            index = self.indexes[self.column]
+            return label.format(index_type=index.kind, column=self.column)
+        if self.access == "segments":
+            return label.format(read=len(self.segments), total=self.total_segments)
+        if self.workers > 1:
+            return PARALLEL_SCAN_LABEL.format(access=label, workers=self.workers)
+        return label
+
+    def describe(self, query):
+        lines = [
+            EXPLAIN_MESSAGES["plan"].format(query=query),
+            EXPLAIN_MESSAGES["access"].format(access=self.describe_access()),
+        ]
+        if self.order_index is not None:
+            lines.append(EXPLAIN_MESSAGES["order"].format(
+                index_type=self.order_index.kind, column=self.order_index.column
+            ))
+        lines.append(EXPLAIN_MESSAGES["estimate"].format(
+            rows=self.estimated_rows, cost=self.cost
+        ))
+        return "\n".join(lines)
+
+
+def usable_index(index, condition):
+    if isinstance(condition, Comparison):
+        return isinstance(index, SortedIndex)
+    return index is not None
+
+
+def plan_query(store, table_name, predicate=None, options=None, use_cache=False):
+    """Выбирает между кэшем, первичным ключом, индексом и полным просмотром.
+
+    Статистика из метаданных дает оценку числа строк; условие, которое по
+    границам столбцов не может выполниться, отсекается без чтения данных.
+    У сегментной таблицы, прочитанной не целиком, так же отсекаются сегменты.
+    """
+    options = options or {}
+    table_data = store.get_table(table_name)
+    stats = get_stats(store, table_name, table_data)
+    if isinstance(table_data, SegmentedTable) and not table_data.complete:
+        return plan_segments(
+            table_name, table_data, stats, predicate, options, use_cache
+        )
+    rows = stats["rows"]
+    scan_access = "column_scan" if isinstance(table_data, ColumnarTable) else "scan"
+    workers = scan_workers(table_data)
+    # Диапазоны строк просматриваются процессами одновременно
+    scan_cost = rows * SCAN_ROW_COST / workers
+
+    indexes = store.get_indexes(table_name)
+    order_index = indexes.get(options.get("order_by"))
+    if not isinstance(order_index, SortedIndex):
+        order_index = None
+    base_indexes = {order_index.column: order_index} if order_index else {}
+
+    if predicate is None:
+        return Plan(table_name, None, scan_access, rows, rows * SCAN_ROW_COST,
+                    dict(base_indexes), order_index=order_index)
+
+    column_types = predicate.column_types
+    if Bounds(stats, column_types).never(predicate.ast):
+        return Plan(table_name, predicate, "empty", 0, 0.0)
+
+    selectivity = estimate_selectivity(predicate.ast, stats, column_types)
+    estimated = round(selectivity * rows)
+
+    if use_cache:
+        key = cacher.key(table_name, select_query_key(predicate, **options))
+        if cacher.contains(key):
+            return Plan(table_name, predicate, "cache", estimated, 0.0)
+
+    best = Plan(table_name, predicate, scan_access, estimated, scan_cost,
+                dict(base_indexes), order_index=order_index, workers=workers)
+    if scan_access == "column_scan":
+        return best
+
+    conjuncts = predicate.conjuncts
+    if PRIMARY_KEY in conjuncts and not isinstance(conjuncts[PRIMARY_KEY], Comparison):
+        if PRIMARY_KEY not in indexes:
+            store.get_primary_key(table_name)
+        return Plan(table_name, predicate, "primary_key", min(estimated, 1), 1.0,
+                    {PRIMARY_KEY: indexes[PRIMARY_KEY], **base_indexes},
+                    order_index=order_index)
+
+    for column, condition in conjuncts.items():
+        index = indexes.get(column)
+        if not usable_index(index, condition):
+            continue
+        node = Compare(column, condition.op, condition.value) \
+            if isinstance(condition, Comparison) else Compare(column, "=", condition)
+        candidates = estimate_selectivity(node, stats, column_types) * rows
+        cost = candidates * INDEX_ROW_COST + math.log2(rows + 1)
+        if cost < best.cost:
+            best = Plan(table_name, predicate, "index", estimated, cost,
+                        {column: index, **base_indexes}, column=column,
+                        order_index=order_index)
+    return best
+
+
+def limit_segments(segments, options):
+    """Сегменты, строк которых хватает на offset + limit записей в порядке ID."""
+    numbers = [number for number, stats in segments if stats["rows"]]
+    limit, order_by = options.get("limit"), options.get("order_by")
+    if limit is None or order_by not in (None, PRIMARY_KEY):
+        return numbers
+    descending = order_by is not None and options.get("descending")
+    needed = (options.get("offset") or 0) + limit
+    chosen = []
+    for number, stats in (reversed(segments) if descending else segments):
+        if needed <= 0:
+            break
+        if stats["rows"]:
+            chosen.append(number)
+            needed -= stats["rows"]
+    return sorted(chosen)
+
+
+def plan_segments(table_name, table_data, stats, predicate, options, use_cache):
+    """План для сегментной таблицы, которая прочитана не целиком.
+
+    Индексов у нее еще нет, поэтому выбираются сегменты, которые условие
+    не отсекает по их min/max; без условия, но с limit - сегменты с
+    нужного конца, которых хватает на limit строк.
+    """
+    segments = table_data.all_stats()
+    if predicate is None:
+        chosen = limit_segments(segments, options)
+        estimated = stats["rows"]
+    else:
+        column_types = predicate.column_types
+        if Bounds(stats, column_types).never(predicate.ast):
+            return Plan(table_name, predicate, "empty", 0, 0.0)
+        chosen = [
+            number for number, entry in segments
+            if not Bounds(entry, column_types).never(predicate.ast)
+        ]
+        if not chosen:
+            return Plan(table_name, predicate, "empty", 0, 0.0)
+        selectivity = estimate_selectivity(predicate.ast, stats, column_types)
+        estimated = round(selectivity * stats["rows"])
+
+    access = "segments"
+    cost = sum(table_data.segment_rows(number) for number in chosen) * SCAN_ROW_COST
+    if use_cache and predicate is not None:
+        key = cacher.key(table_name, select_query_key(predicate, **options))
+        if cacher.contains(key):
+            access, cost = "cache", 0.0
+    return Plan(table_name, predicate, access, estimated, cost,
+                segments=chosen, total_segments=len(segments))
+
+
+def plan_data(plan, table_data):
+    """Данные, которые читает план: у сегментной таблицы - только его сегменты."""
+    if plan.segments is None:
+        return table_data
+    return table_data.view(plan.segments)
+
+
+def execute_plan(plan, table_data, options=None, use_cache=True):
+    """Выполняет SELECT по плану; для пустого плана данные не читаются."""
+    if plan.empty:
+        return []
+    return select(
+        plan_data(plan, table_data), plan.predicate, use_cache=use_cache,
+        indexes=plan.indexes, table_name=plan.table_name, **(options or {})
+    )
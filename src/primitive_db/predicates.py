@@ -0,0 +1,202 @@
+
+import re
+
+from .indexes import comparison_matches
+from .parser import (
+    RANGE_OPERATORS,
+    And,
+    Compare,
+    Comparison,
+    InList,
+    Like,
+    Not,
+    Or,
+    format_where,
+)
+
+
+def where_to_ast(where_clause):
+    """Переводит условие-словарь {столбец: значение} в дерево выражения."""
+    items = []
+    for column, value in where_clause.items():
+        if isinstance(value, Comparison):
+            items.append(Compare(column, value.op, value.value))
+        else:
+            items.append(Compare(column, "=", value))
+    return items[0] if len(items) == 1 else And(tuple(items))
+
+
+def convert_constant(value, column_type):
+    """Приводит константу к типу столбца; ValueError, если это невозможно."""
+    if column_type == "int":
+        if isinstance(value, bool):
+            raise ValueError(value)
+        return int(value)
+    if column_type == "bool":
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ("true", "false"):
+            return str(value).lower() == "true"
+        raise ValueError(value)
+    return str(value)
+
+
+def like_to_regex(pattern):
+    parts = []
+    for char in pattern:
+        if char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+class PredicateCompiler:
+    """Генерирует из дерева WHERE одну функцию record -> bool.
+
+    Константы заранее приводятся к типам столбцов, поэтому в цикле по
+    записям не остается ни str(), ни обхода словаря условий.
+    """
+
+    def __init__(self, column_types):
+        self.column_types = column_types
+        self.constants = {}
+
+    def constant(self, value):
+        name = f"c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def access(self, column):
+        return f"r.get({column!r}, '')"
+
+    def compile(self, node):
+        source = self.generate(node)
+        namespace = {"__builtins__": {"str": str}, "_cmp": comparison_matches}
+        namespace.update(self.constants)
+        return eval(f"lambda r: {source}", namespace), source
+
+    def generate(self, node):
+        if isinstance(node, And):
+            return "(" + " and ".join(self.generate(item) for item in node.items) + ")"
+        if isinstance(node, Or):
+            return "(" + " or ".join(self.generate(item) for item in node.items) + ")"
+        if isinstance(node, Not):
+            return f"(not {self.generate(node.item)})"
+        if isinstance(node, InList):
+            return self.generate_in(node)
+        if isinstance(node, Like):
+            regex = self.constant(like_to_regex(node.pattern))
+            check = "is None" if node.negated else "is not None"
+            return f"({regex}.fullmatch(str({self.access(node.column)})) {check})"
+        return self.generate_compare(node)
+
+    def generate_in(self, node):
+        column_type = self.column_types.get(node.column)
+        operator = "not in" if node.negated else "in"
+        if column_type is None:
+            values = self.constant(frozenset(str(value) for value in node.values))
+            return f"(str({self.access(node.column)}) {operator} {values})"
+
+        converted = set()
+        for value in node.values:
+            try:
+                converted.add(convert_constant(value, column_type))
+            except ValueError:
+                continue
+        values = self.constant(frozenset(converted))
+        return f"({self.access(node.column)} {operator} {values})"
+
+    def generate_compare(self, node):
+        column_type = self.column_types.get(node.column)
+        access = self.access(node.column)
+
+        if node.op in ("=", "!="):
+            python_op = "==" if node.op == "=" else "!="
+            if column_type is None:
+                # Схема неизвестна: прежнее сравнение строковых представлений
+                return f"(str({access}) {python_op} {self.constant(str(node.value))})"
+            try:
+                value = convert_constant(node.value, column_type)
+            except ValueError:
+                return "False" if node.op == "=" else "True"
+            return f"({access} {python_op} {self.constant(value)})"
+
+        if column_type in ("int", "str"):
+            try:
+                if node.op == "between":
+                    low, high = (
+                        self.constant(convert_constant(bound, column_type))
+                        for bound in node.value
+                    )
+                    return f"({low} <= {access} <= {high})"
+                if node.op in RANGE_OPERATORS:
+                    value = convert_constant(node.value, column_type)
+                    return f"({access} {node.op} {self.constant(value)})"
+            except ValueError:
+                pass
+
+        comparison = self.constant(Comparison(node.op, node.value))
+        return f"_cmp({access}, {comparison})"
+
+
+class Predicate:
+    """Скомпилированное условие WHERE.
+
+    ast - дерево выражения, test - функция проверки записи, conjuncts -
+    простые условия верхнего уровня ({столбец: значение|Comparison}),
+    по которым можно выбрать индекс.
+    """
+
+    def __init__(self, ast, columns=None):
+        self.ast = ast
+        self.column_types = {col["name"]: col["type"] for col in columns or []}
+        self.test, self.source = PredicateCompiler(self.column_types).compile(ast)
+        self.conjuncts = extract_conjuncts(ast, self.column_types)
+
+    def __call__(self, record):
+        return self.test(record)
+
+    def __str__(self):
+        return format_where(self.ast)
+
+    def __repr__(self):
+        return f"Predicate({self})"
+
+
+def extract_conjuncts(ast, column_types=None):
+    """Простые условия верхнего уровня с константами, приведенными к типам."""
+    column_types = column_types or {}
+    items = ast.items if isinstance(ast, And) else (ast,)
+    conjuncts = {}
+    for item in items:
+        if not isinstance(item, Compare) or item.column in conjuncts:
+            continue
+        value = typed_constant(item.value, column_types.get(item.column))
+        if item.op == "=":
+            conjuncts[item.column] = value
+        elif item.op == "between" or item.op in RANGE_OPERATORS:
+            conjuncts[item.column] = Comparison(item.op, value)
+    return conjuncts
+
+
+def typed_constant(value, column_type):
+    if column_type is None:
+        return value
+    try:
+        if isinstance(value, tuple):
+            return tuple(convert_constant(bound, column_type) for bound in value)
+        return convert_constant(value, column_type)
+    except ValueError:
+        return value
+
+
+def compile_where(where_clause, columns=None):
+    """Компилирует условие (дерево или словарь) против схемы таблицы."""
+    if where_clause is None or isinstance(where_clause, Predicate):
+        return where_clause
+    if isinstance(where_clause, dict):
+        where_clause = where_to_ast(where_clause)
+    return Predicate(where_clause, columns)
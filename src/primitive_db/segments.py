@@ -0,0 +1,147 @@
+
+from .constants import SEGMENT_FILE_PREFIX
+from .utils import list_segment_numbers
+
+
+def segment_number(record_id, size):
+    return (record_id - 1) // size
+
+
+def segment_key(number):
+    """Ключ статистики сегмента в метаданных - имя его файла без расширения."""
+    return f"{SEGMENT_FILE_PREFIX}{number:06d}"
+
+
+def key_number(key):
+    return int(key[len(SEGMENT_FILE_PREFIX):])
+
+
+def split_by_segment(records, size):
+    """Раскладывает записи по номерам сегментов, сохраняя их порядок."""
+    groups = {}
+    for record in records:
+        groups.setdefault(segment_number(record["ID"], size), []).append(record)
+    return groups
+
+
+def split_ids(ids, size):
+    groups = {}
+    for record_id in ids:
+        groups.setdefault(segment_number(record_id, size), []).append(record_id)
+    return groups
+
+
+class SegmentedTable:
+    """Таблица, разбитая на сегменты по диапазонам ID.
+
+    Сегмент n хранит записи с ID от n * size + 1 до (n + 1) * size в своем
+    файле и журнале, а его статистика (число строк, min/max столбцов) лежит
+    в метаданных. Хранилище читает сегмент при первом обращении к нему,
+    поэтому поиск по условию и вставка не читают таблицу целиком.
+    """
+
+    def __init__(self, store, table_name):
+        self.store = store
+        self.table_name = table_name
+        self.loaded = {}
+        # Сегменты, записанные до сбоя, могут отсутствовать в метаданных
+        self.on_disk = list_segment_numbers(table_name)
+
+    @property
+    def info(self):
+        return self.store.get_metadata()[self.table_name]["segments"]
+
+    @property
+    def size(self):
+        return self.info["size"]
+
+    def number(self, record_id):
+        return segment_number(record_id, self.size)
+
+    def numbers(self):
+        numbers = {key_number(key) for key in self.info["stats"]}
+        numbers.update(self.on_disk)
+        numbers.update(number for number, records in self.loaded.items() if records)
+        return sorted(numbers)
+
+    def stats(self, number):
+        return self.info["stats"].get(segment_key(number))
+
+    def all_stats(self):
+        """Пары (номер, статистика); сегмент без статистики читается и получает ее."""
+        result = []
+        for number in self.numbers():
+            if self.stats(number) is None:
+                self.segment(number)
+            stats = self.stats(number)
+            if stats is not None:
+                result.append((number, stats))
+        return result
+
+    @property
+    def complete(self):
+        """Прочитаны все сегменты: таблицу можно обходить как обычный список."""
+        return all(number in self.loaded for number in self.numbers())
+
+    def segment(self, number):
+        records = self.loaded.get(number)
+        if records is None:
+            with self.store.building(self.table_name):
+                records = self.loaded.get(number)
+                if records is None:
+                    records = self.store.load_segment(self.table_name, number)
+                    self.loaded[number] = records
+        return records
+
+    def segment_rows(self, number):
+        if number in self.loaded:
+            return len(self.loaded[number])
+        stats = self.stats(number)
+        return stats["rows"] if stats is not None else len(self.segment(number))
+
+    def forget(self, number):
+        self.loaded.pop(number, None)
+
+    def view(self, numbers):
+        return SegmentView(self, numbers)
+
+    def append(self, record):
+        self.segment(self.number(record["ID"])).append(record)
+
+    def __len__(self):
+        # Число строк берется из статистики, непрочитанные сегменты не читаются
+        return sum(self.segment_rows(number) for number in self.numbers())
+
+    def __iter__(self):
+        for number in self.numbers():
+            yield from self.segment(number)
+
+    def __setitem__(self, key, records):
+        self.view(self.numbers())[key] = records
+
+
+class SegmentView:
+    """Записи выбранных сегментов в порядке ID.
+
+    Сегмент читается, когда до него дошел обход, поэтому выборка с limit
+    останавливается, не читая остальные.
+    """
+
+    def __init__(self, table, numbers):
+        self.table = table
+        self.numbers = list(numbers)
+
+    def __len__(self):
+        return sum(self.table.segment_rows(number) for number in self.numbers)
+
+    def __iter__(self):
+        for number in self.numbers:
+            yield from self.table.segment(number)
+
+    def __setitem__(self, key, records):
+        """Поддерживает view[:] = записи: так удаление пересобирает данные."""
+        if key != slice(None):
+            raise TypeError("сегменты заменяются только целиком: view[:] = записи")
+        groups = split_by_segment(records, self.table.size)
+        for number in self.numbers:
+            self.table.loaded[number] = groups.get(number, [])
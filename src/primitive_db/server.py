@@ -0,0 +1,246 @@
+
+import io
+import os
+import socket
+import socketserver
+import sys
+import threading
+from contextlib import contextmanager, nullcontext
+
+from .constants import ERROR_MESSAGES, SERVER_MESSAGES, SOCKET_PATH
+from .decorators import configure_session
+from .engine import (
+    command_failed,
+    execute_statement,
+    iter_script_lines,
+    print_error,
+    reset_command_status,
+)
+from .locks import LockManager
+from .parser import parse_command, parse_select_command
+from .statements import statement_cache
+from .store import TableStore
+
+READ_COMMANDS = {"select", "explain", "export", "info"}
+WRITE_COMMANDS = {"insert", "update", "delete", "load"}
+# Не трогают таблицы или защищены собственными блокировками
+UNLOCKED_COMMANDS = {
+    "help", "cache_stats", "clear_cache", "cache_limit", "prepare", "stats", "exit"
+}
+# Транзакция хранилища одна на процесс и не может принадлежать одному клиенту
+SESSION_COMMANDS = {"begin", "commit", "rollback"}
+# Клиент спрашивает подтверждение сам: у сервера нет терминала
+CONFIRMED_COMMANDS = {"delete", "drop_table"}
+
+
+class ThreadLocalOutput(io.TextIOBase):
+    """Подменяет sys.stdout: вывод каждого потока попадает в его буфер."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        (buffer if buffer is not None else self.fallback).write(text)
+        return len(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+    @contextmanager
+    def capture(self):
+        self.local.buffer = io.StringIO()
+        try:
+            yield self.local.buffer
+        finally:
+            self.local.buffer = None
+
+
+def select_tables(parsed):
+    table_name, where_clause, options, error = parsed
+    join = (options or {}).get("join")
+    return [table_name, join.table] if join is not None else [table_name]
+
+
+def statement_tables(statement):
+    """Имена таблиц, с которыми работает команда (пустой список - неизвестны)."""
+    args = statement.args
+    if statement.command == "select":
+        tables = select_tables(statement.parsed)
+    elif statement.parsed is not None:
+        tables = [statement.parsed[0]]
+    elif statement.command == "explain" and args:
+        tables = select_tables(parse_select_command(args[1:]))
+    elif (statement.command == "export" and args
+          and args[0].lower().startswith("select")):
+        tables = select_tables(parse_select_command(parse_command(args[0])[1]))
+    else:
+        tables = args[:1]
+    return [table_name for table_name in tables if table_name]
+
+
+class DatabaseEngine:
+    """Одно хранилище в памяти на всех клиентов сервера."""
+
+    def __init__(self, store=None):
+        self.store = store or TableStore()
+        self.locks = LockManager()
+        # Метаданные и незавершенная фиксация читаются до появления клиентов
+        self.store.get_metadata()
+
+    def lock_for(self, statement):
+        command = statement.command
+        tables = statement_tables(statement)
+        if command in UNLOCKED_COMMANDS:
+            return nullcontext()
+        if command == "list_tables":
+            return self.locks.catalog.read()
+        if command in READ_COMMANDS and tables:
+            return self.locks.reading(*tables)
+        if command in WRITE_COMMANDS and tables:
+            return self.locks.writing(tables[0])
+        return self.locks.exclusive()
+
+    def execute(self, line):
+        """Выполняет одну команду клиента; возвращает (вывод, ошибка, продолжать)."""
+        with sys.stdout.capture() as output:
+            reset_command_status()
+            keep_going = self.run(statement_cache.parse(line))
+        return output.getvalue(), command_failed(), keep_going
+
+    def run(self, statement):
+        if statement.command in SESSION_COMMANDS:
+            print_error(ERROR_MESSAGES["server_command"].format(command=statement.command))
+            return True
+        if statement.command == "execute":
+            try:
+                statement = statement_cache.execute(statement.args)
+            except (KeyError, ValueError) as e:
+                print_error(e.args[0])
+                return True
+        if statement.command == "exit":
+            return False
+
+        try:
+            with self.lock_for(statement):
+                execute_statement(self.store, statement)
+            if statement.command not in READ_COMMANDS | UNLOCKED_COMMANDS:
+                # Запись на диск переставляет файлы и обходит метаданные целиком
+                with self.locks.exclusive():
+                    self.store.flush()
+        except Exception as e:
+            print_error(f"Неожиданная ошибка: {e}")
+        return True
+
+
+def send_response(wfile, output, failed=False, closing=False):
+    payload = output.encode('utf-8')
+    status = "bye" if closing else ("error" if failed else "ok")
+    wfile.write(f"{status} {len(payload)}\n".encode('ascii') + payload)
+    wfile.flush()
+
+
+def read_response(rfile):
+    header = rfile.readline()
+    if not header:
+        raise ConnectionError(SERVER_MESSAGES["disconnected"])
+    status, length = header.decode('ascii').split()
+    return status, rfile.read(int(length)).decode('utf-8')
+
+
+class ClientHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.decode('utf-8').strip()
+            if not line:
+                continue
+            output, failed, keep_going = self.server.engine.execute(line)
+            send_response(self.wfile, output, failed, closing=not keep_going)
+            if not keep_going:
+                break
+
+
+class DatabaseServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, engine):
+        self.engine = engine
+        super().__init__(socket_path, ClientHandler)
+
+
+def serve(socket_path=SOCKET_PATH):
+    """Обслуживает клиентов через unix-сокет, пока процесс не прервут."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    configure_session(confirm="yes", show_timing=False)
+    stdout = sys.stdout
+    sys.stdout = ThreadLocalOutput(stdout)
+    engine = DatabaseEngine()
+    try:
+        with DatabaseServer(socket_path, engine) as server:
+            print(SERVER_MESSAGES["listening"].format(path=socket_path))
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print(SERVER_MESSAGES["stopped"])
+    finally:
+        with engine.locks.exclusive():
+            engine.store.flush()
+        sys.stdout = stdout
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def confirm(line):
+    command, args = parse_command(line)
+    if command not in CONFIRMED_COMMANDS:
+        return True
+    response = input(f'Вы уверены, что хотите выполнить "{line}"? [y/n]: ')
+    return response.strip().lower() == 'y'
+
+
+def iter_prompt_lines():
+    while True:
+        try:
+            line = input(">>>Введите команду: ").strip()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if line:
+            yield line
+
+
+def connect(socket_path=SOCKET_PATH, lines=None, assume_yes=False):
+    """Тонкий клиент: отправляет команды серверу и печатает ответы.
+
+    Без lines читает команды с терминала и сам спрашивает подтверждение
+    удалений; пакет из lines подтверждается только с assume_yes.
+    Возвращает True, если ни одна команда не завершилась ошибкой.
+    """
+    interactive = lines is None
+    commands = iter_prompt_lines() if interactive else (
+        line for number, line in iter_script_lines(lines)
+    )
+    succeeded = True
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        rfile, wfile = client.makefile('rb'), client.makefile('wb')
+        for line in commands:
+            confirmed = confirm(line) if interactive else (
+                assume_yes or parse_command(line)[0] not in CONFIRMED_COMMANDS
+            )
+            if not confirmed:
+                print("Операция отменена.")
+                # Как в пакетном режиме: неподтвержденное удаление - ошибка пакета
+                succeeded = succeeded and interactive
+                continue
+
+            wfile.write(line.encode('utf-8') + b"\n")
+            wfile.flush()
+            status, output = read_response(rfile)
+            print(output, end="")
+            succeeded = succeeded and status != "error"
+            if status == "bye":
+                break
+    return succeeded
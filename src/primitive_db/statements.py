@@ -0,0 +1,204 @@
+
+import re
+import threading
+from collections import OrderedDict
+
+from .constants import ERROR_MESSAGES, STATEMENT_CACHE_SIZE
+from .metrics import metrics
+from .parser import (
+    PLACEHOLDER,
+    parse_command,
+    parse_delete_command,
+    parse_insert_command,
+    parse_insert_values,
+    parse_select_command,
+    parse_update_command,
+    parse_value,
+)
+from .predicates import compile_where
+
+STATEMENT_PARSERS = {
+    "insert": parse_insert_command,
+    "select": parse_select_command,
+    "update": parse_update_command,
+    "delete": parse_delete_command,
+}
+
+# Пробелы вне кавычек не меняют смысла команды
+NORMALIZE = re.compile(r"""("[^"]*"|'[^']*')|\s+""")
+PREPARE = re.compile(r"^\s*prepare\s+(\w+)\s+as\s+(.+)$", re.IGNORECASE | re.DOTALL)
+
+
+def normalize_statement(text):
+    return NORMALIZE.sub(lambda match: match.group(1) or " ", text.strip())
+
+
+class Statement:
+    """Разобранная команда: имя, аргументы и результат разбора ее парсером.
+
+    Скомпилированные условия WHERE запоминаются по схеме таблицы, поэтому
+    повторное выполнение не разбирает и не компилирует команду заново.
+    """
+
+    def __init__(self, text, command, args, parsed=None):
+        self.text = text
+        self.command = command
+        self.args = args
+        self.parsed = parsed
+        self._predicates = {}
+
+    def predicate(self, where_clause, columns):
+        key = tuple((col["name"], col["type"]) for col in columns)
+        if key not in self._predicates:
+            self._predicates[key] = compile_where(where_clause, columns)
+        return self._predicates[key]
+
+
+def parse_statement(text):
+    command, args = parse_command(text)
+    parser = STATEMENT_PARSERS.get(command)
+    return Statement(text, command, args, parser(args) if parser else None)
+
+
+def mark_placeholders(text):
+    """Заменяет ? вне кавычек на маркеры; возвращает текст и число параметров."""
+    result = []
+    count = 0
+    quote_char = None
+    for char in text:
+        if quote_char:
+            if char == quote_char:
+                quote_char = None
+        elif char in ('"', "'"):
+            quote_char = char
+        elif char == "?":
+            char = f"\x00{count}\x00"
+            count += 1
+        result.append(char)
+    return "".join(result), count
+
+
+def bind_parameters(node, params):
+    """Подставляет значения параметров вместо маркеров в результат разбора."""
+    if isinstance(node, str):
+        match = PLACEHOLDER.fullmatch(node)
+        return params[int(match.group(1))] if match else node
+    if isinstance(node, tuple) and hasattr(node, "_fields"):
+        return type(node)(*(bind_parameters(item, params) for item in node))
+    if isinstance(node, (tuple, list)):
+        return type(node)(bind_parameters(item, params) for item in node)
+    if isinstance(node, dict):
+        return {key: bind_parameters(value, params) for key, value in node.items()}
+    return node
+
+
+def check_page_options(options):
+    """LIMIT и OFFSET из параметров должны быть целыми неотрицательными."""
+    for option in ("limit", "offset"):
+        value = options.get(option)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(ERROR_MESSAGES["invalid_page_param"].format(
+                option=option.upper(), value=value
+            ))
+
+
+class PreparedStatement:
+    """Команда с параметрами ?, разобранная один раз при prepare."""
+
+    def __init__(self, name, statement, param_count):
+        self.name = name
+        self.statement = statement
+        self.param_count = param_count
+
+    def bind(self, values):
+        if len(values) != self.param_count:
+            raise ValueError(ERROR_MESSAGES["params_count_mismatch"].format(
+                name=self.name, expected=self.param_count, actual=len(values)
+            ))
+        # INSERT проверяет исходные строки сам, остальным нужны разобранные значения
+        if self.statement.command != "insert":
+            values = [parse_value(value) for value in values]
+        statement = self.statement
+        parsed = bind_parameters(statement.parsed, values)
+        if statement.command == "select" and parsed[2] is not None:
+            check_page_options(parsed[2])
+        return Statement(statement.text, statement.command, statement.args, parsed)
+
+
+class StatementCache:
+    """LRU-кэш разобранных команд по нормализованному тексту и набор prepare."""
+
+    def __init__(self, max_entries=STATEMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._statements = OrderedDict()
+        self.prepared = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def parse(self, text):
+        key = normalize_statement(text)
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is not None:
+                self._statements.move_to_end(key)
+                self.hits += 1
+                return statement
+            self.misses += 1
+
+        with metrics.timer("stage_seconds", stage="parse"):
+            statement = parse_statement(key)
+        if statement.command in STATEMENT_PARSERS:
+            with self._lock:
+                self._statements[key] = statement
+                while len(self._statements) > self.max_entries:
+                    self._statements.popitem(last=False)
+        return statement
+
+    def prepare(self, text):
+        """Разбирает prepare <имя> as <команда>; возвращает PreparedStatement."""
+        match = PREPARE.match(text)
+        if not match:
+            raise ValueError(ERROR_MESSAGES["insufficient_args"].format(
+                usage="prepare <имя> as <команда с параметрами ?>"
+            ))
+
+        name, body = match.groups()
+        marked, param_count = mark_placeholders(body)
+        statement = parse_statement(marked)
+        if statement.command not in STATEMENT_PARSERS:
+            raise ValueError(ERROR_MESSAGES["invalid_prepared"].format(
+                commands=", ".join(STATEMENT_PARSERS)
+            ))
+        error = statement.parsed[-1]
+        if statement.parsed[0] is None or (isinstance(error, str) and error):
+            raise ValueError(error)
+
+        self.prepared[name] = PreparedStatement(name, statement, param_count)
+        return self.prepared[name]
+
+    def execute(self, args):
+        """Связывает execute <имя> (<значение1>, ...) с подготовленной командой."""
+        if not args:
+            raise ValueError(ERROR_MESSAGES["insufficient_args"].format(
+                usage="execute <имя> [(<значение1>, ...)]"
+            ))
+        prepared = self.prepared.get(args[0])
+        if prepared is None:
+            raise KeyError(ERROR_MESSAGES["prepared_not_found"].format(name=args[0]))
+        values = parse_insert_values(" ".join(args[1:])) if args[1:] else []
+        return prepared.bind(values)
+
+    def stats(self):
+        return {
+            "size": len(self._statements),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "prepared": sorted(self.prepared),
+        }
+
+
+statement_cache = StatementCache()
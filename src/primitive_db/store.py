@@ -0,0 +1,527 @@
+
+import os
+import threading
+
+from .columnar import ColumnarTable
+from .constants import LOG_COMPACTION_THRESHOLD, METADATA_FILE
+from .core import get_next_id
+from .decorators import cacher
+from .indexes import PrimaryKeyIndex, build_indexes
+from .metrics import metrics
+from .planner import collect_stats
+from .segments import (
+    SegmentedTable,
+    segment_key,
+    segment_number,
+    split_by_segment,
+    split_ids,
+)
+from .utils import (
+    append_table_log,
+    commit_files,
+    count_table_log,
+    delete_table_file,
+    get_segment_name,
+    get_table_filepath,
+    get_table_files,
+    get_table_log_filepath,
+    is_mapped_table,
+    list_segment_numbers,
+    load_metadata,
+    load_table_data,
+    recover_commit,
+    write_log_temp,
+    write_metadata_temp,
+    write_table_temp,
+)
+
+
+def get_file_signature(*filepaths):
+    """Возвращает (mtime, размер) файлов, чтобы заметить их изменение извне."""
+    signature = []
+    for filepath in filepaths:
+        try:
+            stat = os.stat(filepath)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class TableStore:
+    """Хранит метаданные и таблицы в памяти на протяжении всей сессии.
+
+    Файл перечитывается, только если он изменился на диске, а записываются
+    лишь те таблицы, которые команда пометила как измененные.
+    """
+
+    def __init__(self, metadata_path=METADATA_FILE):
+        self.metadata_path = metadata_path
+        self._metadata = None
+        self._metadata_signature = None
+        self._metadata_dirty = False
+        self._tables = {}
+        self._signatures = {}
+        self._dirty = set()
+        self._indexes = {}
+        self.in_transaction = False
+        self._pending_log = []
+        self._pending_drops = []
+        # Число записей в журналах по их путям: длинный журнал сворачивается
+        self._log_sizes = {}
+        # Таблицы, индексы и статистику select достраивает под блокировкой
+        # чтения, поэтому одновременные select одной таблицы строят их по очереди
+        self._build_locks = {}
+        self._build_locks_mutex = threading.Lock()
+
+    def building(self, table_name):
+        """Повторно входимая блокировка ленивого построения данных таблицы."""
+        with self._build_locks_mutex:
+            lock = self._build_locks.get(table_name)
+            if lock is None:
+                lock = self._build_locks[table_name] = threading.RLock()
+            return lock
+
+    def _file_signature(self, name, table_format):
+        return get_file_signature(
+            get_table_filepath(name, table_format), get_table_log_filepath(name)
+        )
+
+    def _table_signature(self, table_name):
+        return self._file_signature(table_name, self.get_table_format(table_name))
+
+    def get_table_format(self, table_name):
+        return self.get_metadata().get(table_name, {}).get("format", "json")
+
+    def is_segmented(self, table_name):
+        return "segments" in self.get_metadata().get(table_name, {})
+
+    def storage_names(self, table_name):
+        """Имена для функций файлов таблиц: сама таблица или ее сегменты на диске."""
+        if not self.is_segmented(table_name):
+            return [table_name]
+        return [
+            get_segment_name(table_name, number)
+            for number in sorted(list_segment_numbers(table_name))
+        ]
+
+    def get_metadata(self):
+        signature = get_file_signature(self.metadata_path)
+        if self._metadata is None or (
+            signature != self._metadata_signature and not self._metadata_dirty
+        ):
+            if self._metadata is None and recover_commit():
+                signature = get_file_signature(self.metadata_path)
+            self._metadata = load_metadata(self.metadata_path)
+            self._metadata_signature = signature
+            self._indexes.clear()
+        return self._metadata
+
+    def mark_metadata_dirty(self):
+        self._metadata_dirty = True
+
+    def get_table(self, table_name, writable=False):
+        """Возвращает данные таблицы.
+
+        Двоичная таблица читается через mmap; writable=True разворачивает ее
+        в представление из метаданных, чтобы команду можно было изменить.
+        Сегментная таблица возвращается как SegmentedTable без чтения сегментов.
+        """
+        with self.building(table_name):
+            return self._load_table(table_name, writable)
+
+    def _load_table(self, table_name, writable):
+        if self.is_segmented(table_name):
+            return self._get_segmented_table(table_name, writable)
+        signature = self._table_signature(table_name)
+        if table_name not in self._tables or (
+            signature != self._signatures.get(table_name)
+            and table_name not in self._dirty
+        ):
+            with metrics.timer("stage_seconds", stage="load"):
+                data = load_table_data(table_name, self.get_table_format(table_name))
+                self._sync_sequence(table_name, data)
+                self._tables[table_name] = self._to_layout(table_name, data)
+            self._indexes.pop(table_name, None)
+            # Таблица изменилась на диске - кэшированные выборки устарели
+            cacher.invalidate(table_name)
+            # Загрузка могла свернуть журнал, поэтому подпись берется заново
+            self._signatures[table_name] = self._table_signature(table_name)
+        if writable and is_mapped_table(self._tables[table_name]):
+            self._tables[table_name] = self._to_layout(
+                table_name, self._tables[table_name], writable=True
+            )
+            self._indexes.pop(table_name, None)
+        return self._tables[table_name]
+
+    def _get_segmented_table(self, table_name, writable):
+        table = self._tables.get(table_name)
+        if not isinstance(table, SegmentedTable):
+            table = self._tables[table_name] = SegmentedTable(self, table_name)
+            self._indexes.pop(table_name, None)
+        elif table_name not in self._dirty and self._refresh_segments(table):
+            self._indexes.pop(table_name, None)
+            cacher.invalidate(table_name)
+        if writable:
+            # Вставка попадет в сегмент счетчика next_id: при его чтении
+            # счетчик сверяется с журналом сегмента
+            next_id = self.get_metadata()[table_name].get("next_id", 1)
+            table.segment(table.number(next_id))
+        return table
+
+    def _refresh_segments(self, table):
+        """Забывает сегменты, файлы которых изменились на диске.
+
+        Возвращает True, если такие сегменты были.
+        """
+        table_format = self.get_table_format(table.table_name)
+        changed = False
+        for number in list(table.loaded):
+            name = get_segment_name(table.table_name, number)
+            if self._file_signature(name, table_format) != self._signatures.get(name):
+                table.forget(number)
+                changed = True
+        return changed
+
+    def load_segment(self, table_name, number):
+        """Читает сегмент с его журналом и сверяет статистику сегмента с данными."""
+        name = get_segment_name(table_name, number)
+        table_format = self.get_table_format(table_name)
+        with metrics.timer("stage_seconds", stage="load"):
+            data = load_table_data(name, table_format)
+            if is_mapped_table(data):
+                data = data.to_records()
+        self._sync_sequence(table_name, data)
+
+        table_info = self.get_metadata()[table_name]
+        segment_stats = table_info["segments"]["stats"]
+        stats = segment_stats.get(segment_key(number))
+        if (stats["rows"] if stats else 0) != len(data):
+            # Журнал сегмента опередил метаданные (сбой между их записью)
+            segment_stats[segment_key(number)] = collect_stats(
+                table_info["columns"], data
+            )
+            self.mark_metadata_dirty()
+        self._signatures[name] = self._file_signature(name, table_format)
+        return data
+
+    def _sync_sequence(self, table_name, data):
+        # Журнал мог успеть записать вставку, а метаданные - нет (сбой между ними)
+        table_info = self.get_metadata().get(table_name)
+        if table_info is None:
+            return
+        next_id = get_next_id(data)
+        if table_info.get("next_id", 0) < next_id:
+            table_info["next_id"] = next_id
+            self.mark_metadata_dirty()
+
+    def _to_layout(self, table_name, data, writable=False):
+        table_info = self.get_metadata().get(table_name, {})
+        columnar = table_info.get("layout") == "columnar"
+        if is_mapped_table(data):
+            if not writable:
+                return data
+            return data.to_columnar() if columnar else data.to_records()
+        if columnar and not isinstance(data, ColumnarTable):
+            return ColumnarTable.from_records(table_info["columns"], data)
+        if not columnar and isinstance(data, ColumnarTable):
+            return data.to_records()
+        return data
+
+    def apply_layout(self, table_name):
+        """Перестраивает загруженную таблицу под представление из метаданных."""
+        if table_name in self._tables:
+            self._tables[table_name] = self._to_layout(
+                table_name, self._tables[table_name]
+            )
+            self._indexes.pop(table_name, None)
+
+    def set_table(self, table_name, data):
+        self._tables[table_name] = data
+        self._indexes.pop(table_name, None)
+        self.mark_dirty(table_name)
+
+    def get_indexes(self, table_name):
+        """Строит индексы таблицы при первом обращении после загрузки."""
+        table_data = self.get_table(table_name)
+        if isinstance(table_data, ColumnarTable):
+            # Колоночная таблица фильтруется сканированием столбцов
+            return {}
+        if isinstance(table_data, SegmentedTable) and not table_data.complete:
+            # Индексы строятся по всей таблице; до ее чтения сегменты
+            # отбирает планировщик
+            return {}
+        with self.building(table_name):
+            if table_name not in self._indexes:
+                table_info = self.get_metadata()[table_name]
+                self._indexes[table_name] = build_indexes(
+                    table_info.get("indexes", []), table_data, table_info["columns"]
+                )
+            return self._indexes[table_name]
+
+    def get_primary_key(self, table_name):
+        """Возвращает индекс по ID, достраивая его к индексам таблицы.
+
+        Для колоночной и не прочитанной целиком сегментной таблицы возвращает None.
+        """
+        indexes = self.get_indexes(table_name)
+        table_data = self.get_table(table_name)
+        if isinstance(table_data, ColumnarTable):
+            return None
+        if isinstance(table_data, SegmentedTable) and not table_data.complete:
+            return None
+        with self.building(table_name):
+            if "ID" not in indexes:
+                # Дальше индекс поддерживается вставками и удалениями, как и остальные
+                indexes["ID"] = PrimaryKeyIndex().build(table_data)
+            return indexes["ID"]
+
+    def invalidate_indexes(self, table_name):
+        self._indexes.pop(table_name, None)
+
+    def mark_dirty(self, table_name):
+        self._dirty.add(table_name)
+
+    def append_log(self, table_name, operation, **payload):
+        """Дописывает операцию в журнал, не перечитывая таблицу после этого.
+
+        Внутри транзакции операция откладывается до commit.
+        """
+        if self.in_transaction:
+            self._pending_log.append((table_name, operation, payload))
+            return True
+        table_format = self.get_table_format(table_name)
+        result = True
+        for name, part in self._log_targets(table_name, operation, payload):
+            self._log_size(name)
+            result = append_table_log(name, operation, **part) and result
+            self._note_logged(table_name, name, 1)
+            if table_name not in self._dirty:
+                self._signatures[name] = self._file_signature(name, table_format)
+        return result
+
+    def _log_size(self, name):
+        filepath = get_table_log_filepath(name)
+        if filepath not in self._log_sizes:
+            self._log_sizes[filepath] = count_table_log(name)
+        return self._log_sizes[filepath]
+
+    def _note_logged(self, table_name, name, count):
+        """Учитывает записанные в журнал операции.
+
+        Таблица с журналом длиннее LOG_COMPACTION_THRESHOLD помечается
+        измененной: ближайший flush запишет снимок и удалит журнал, как
+        это делает загрузка таблицы с диска.
+        """
+        filepath = get_table_log_filepath(name)
+        self._log_sizes[filepath] = self._log_size(name) + count
+        if self._log_sizes[filepath] >= LOG_COMPACTION_THRESHOLD:
+            self.mark_dirty(table_name)
+
+    def _log_targets(self, table_name, operation, payload):
+        """Пары (журнал, данные).
+
+        У сегментной таблицы - журналы затронутых сегментов.
+        """
+        segments = self.get_metadata().get(table_name, {}).get("segments")
+        if segments is None:
+            return [(table_name, payload)]
+        size = segments["size"]
+        if operation == "insert":
+            number = segment_number(payload["record"]["ID"], size)
+            return [(get_segment_name(table_name, number), payload)]
+        return [
+            (get_segment_name(table_name, number), {**payload, "ids": ids})
+            for number, ids in split_ids(payload["ids"], size).items()
+        ]
+
+    def drop_table(self, table_name):
+        self._tables.pop(table_name, None)
+        self._signatures.pop(table_name, None)
+        self._indexes.pop(table_name, None)
+        self._dirty.discard(table_name)
+        if self.in_transaction:
+            self._pending_log = [
+                entry for entry in self._pending_log if entry[0] != table_name
+            ]
+            self._pending_drops.append(table_name)
+            return True
+        self._forget_log_sizes(get_table_files(table_name))
+        return delete_table_file(table_name)
+
+    def _forget_log_sizes(self, filepaths):
+        for filepath in filepaths:
+            self._log_sizes.pop(filepath, None)
+
+    def convert_table(self, table_name, previous_format):
+        """Переписывает файлы таблицы в формате и разбиении из метаданных.
+
+        Прежние файлы (один или сегменты) читаются в формате previous_format,
+        новые встают на их место одной фиксацией вместе с метаданными.
+        """
+        table_info = self.get_metadata()[table_name]
+        table_format = self.get_table_format(table_name)
+        previous_files = get_table_files(table_name)
+        try:
+            data = []
+            for name in [table_name] + [
+                get_segment_name(table_name, number)
+                for number in sorted(list_segment_numbers(table_name))
+            ]:
+                part = load_table_data(name, previous_format)
+                if is_mapped_table(part):
+                    part = part.to_records()
+                data.extend(part)
+
+            segments = table_info.get("segments")
+            if segments is None:
+                replacements = [
+                    write_table_temp(
+                        table_name, data, table_format, table_info["columns"]
+                    )
+                ]
+            else:
+                replacements = []
+                segments["stats"] = {}
+                for number, records in split_by_segment(data, segments["size"]).items():
+                    replacements.append(write_table_temp(
+                        get_segment_name(table_name, number), records, table_format,
+                        table_info["columns"]
+                    ))
+                    segments["stats"][segment_key(number)] = collect_stats(
+                        table_info["columns"], records
+                    )
+            targets = {target for temp_path, target in replacements}
+            self._tables.pop(table_name, None)
+            self._indexes.pop(table_name, None)
+            self._dirty.discard(table_name)
+            self.mark_metadata_dirty()
+            stale_files = [path for path in previous_files if path not in targets]
+            self.flush(replacements, stale_files)
+            return True
+        except Exception as e:
+            print(f"Ошибка при сохранении данных таблицы {table_name}: {e}")
+            return False
+
+    def prepare_table(self, table_name):
+        """Пишет снимок таблицы во временные файлы.
+
+        Возвращает [(имя, (временный, целевой))]. У сегментной таблицы
+        пишутся только прочитанные сегменты.
+        """
+        data = self._tables[table_name]
+        table_format = self.get_table_format(table_name)
+        columns = self.get_metadata()[table_name]["columns"]
+        if isinstance(data, SegmentedTable):
+            files = []
+            for number, records in sorted(data.loaded.items()):
+                # Пустой новый сегмент (еще без статистики) файла не получает
+                if records or data.stats(number) is not None:
+                    name = get_segment_name(table_name, number)
+                    temp = write_table_temp(name, records, table_format, columns)
+                    files.append((name, temp))
+            return files
+        if isinstance(data, ColumnarTable) and table_format != "binary":
+            data = data.to_records()
+        return [(table_name, write_table_temp(table_name, data, table_format, columns))]
+
+    def _refresh_signatures(self, table_name):
+        data = self._tables.get(table_name)
+        if not isinstance(data, SegmentedTable):
+            self._signatures[table_name] = self._table_signature(table_name)
+            return
+        table_format = self.get_table_format(table_name)
+        for number in data.loaded:
+            name = get_segment_name(table_name, number)
+            self._signatures[name] = self._file_signature(name, table_format)
+
+    def save_table(self, table_name):
+        files = self.prepare_table(table_name)
+        deletions = [get_table_log_filepath(name) for name, replacement in files]
+        commit_files([replacement for name, replacement in files], deletions)
+        self._forget_log_sizes(deletions)
+        self._refresh_signatures(table_name)
+
+    def flush(self, replacements=(), deletions=()):
+        """Атомарно записывает измененные таблицы и метаданные.
+
+        Каждый файл сначала пишется во временный, затем все они
+        переставляются одной фиксацией. Внутри транзакции ничего не делает.
+        """
+        if self.in_transaction:
+            return
+        replacements, deletions = list(replacements), list(deletions)
+        dirty = sorted(self._dirty)
+        for table_name in dirty:
+            for name, replacement in self.prepare_table(table_name):
+                replacements.append(replacement)
+                deletions.append(get_table_log_filepath(name))
+        if self._metadata_dirty:
+            temp_path = write_metadata_temp(self._metadata, self.metadata_path)
+            replacements.append((temp_path, self.metadata_path))
+
+        commit_files(replacements, deletions)
+        self._forget_log_sizes(deletions)
+        self._dirty.clear()
+        for table_name in dirty:
+            self._refresh_signatures(table_name)
+        if self._metadata_dirty:
+            self._metadata_signature = get_file_signature(self.metadata_path)
+            self._metadata_dirty = False
+
+    def begin(self):
+        """Начинает транзакцию: до commit на диск ничего не пишется."""
+        self.in_transaction = True
+        self._pending_log = []
+        self._pending_drops = []
+
+    def commit(self):
+        """Фиксирует транзакцию одной атомарной записью всех затронутых файлов.
+
+        Таблица, измененная целиком, пишется снимком; для остальных к
+        журналу добавляются отложенные операции. Сколько бы команд ни было
+        в транзакции, каждый файл переписывается один раз.
+        """
+        pending_log, pending_drops = self._pending_log, self._pending_drops
+        self.in_transaction = False
+        self._pending_log = []
+        self._pending_drops = []
+
+        deletions = []
+        for table_name in pending_drops:
+            deletions.extend(get_table_files(table_name))
+
+        by_log = {}
+        for table_name, operation, payload in pending_log:
+            for name, part in self._log_targets(table_name, operation, payload):
+                by_log.setdefault((table_name, name), []).append((operation, part))
+        for (table_name, name), entries in by_log.items():
+            self._note_logged(table_name, name, len(entries))
+        # Снимок измененной таблицы и так содержит эти операции
+        by_log = {
+            key: entries for key, entries in by_log.items() if key[0] not in self._dirty
+        }
+        replacements = [
+            write_log_temp(name, entries)
+            for (table_name, name), entries in by_log.items()
+        ]
+        self.flush(replacements, deletions)
+        for table_name, name in by_log:
+            self._signatures[name] = self._file_signature(
+                name, self.get_table_format(table_name)
+            )
+
+    def rollback(self):
+        """Отбрасывает изменения транзакции и все, что было загружено в память."""
+        self.in_transaction = False
+        self._pending_log = []
+        self._pending_drops = []
+        self._metadata = None
+        self._metadata_signature = None
+        self._metadata_dirty = False
+        self._tables.clear()
+        self._signatures.clear()
+        self._dirty.clear()
+        self._indexes.clear()
+        self._log_sizes.clear()
+        cacher.clear()
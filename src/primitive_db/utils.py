@@ -1,69 +1,481 @@
 
 import json
 import os
+import sys
 
 from pathlib import Path
-from .constants import METADATA_FILE, DATA_DIR, TABLE_DATA_EXTENSION
+from .constants import (
+    METADATA_FILE, DATA_DIR, TABLE_DATA_EXTENSION, TABLE_BINARY_EXTENSION,
+    TABLE_LOG_EXTENSION, LOG_COMPACTION_THRESHOLD, COMMIT_JOURNAL_FILE,
+    SEGMENT_FILE_PREFIX, TABLE_COMPRESSED_EXTENSIONS, COMPRESSED_TABLE_FORMATS,
+    VALID_TABLE_FORMATS
+)
+from .metrics import metrics
 
 
-def ensure_data_dir():
-    Path(DATA_DIR).mkdir(exist_ok=True)
+TABLE_EXTENSIONS = (
+    TABLE_DATA_EXTENSION, TABLE_BINARY_EXTENSION, *TABLE_COMPRESSED_EXTENSIONS.values()
+)
+
+
+def file_kind(filepath):
+    """Метка файла для счетчиков прочитанных и записанных байт."""
+    if filepath.endswith(TABLE_LOG_EXTENSION):
+        return "log"
+    if os.path.basename(filepath) == os.path.basename(METADATA_FILE):
+        return "metadata"
+    if filepath.endswith(TABLE_EXTENSIONS):
+        return "table"
+    return "other"
+
+
+def count_read(filepath, size):
+    metrics.increment("bytes_read_total", size, file=file_kind(filepath))
+
+
+def count_written(filepath, size):
+    metrics.increment("bytes_written_total", size, file=file_kind(filepath))
+
+
+def ensure_data_dir(directory=DATA_DIR):
+    Path(directory).mkdir(parents=True, exist_ok=True)
+
+
+def fsync_directory(path):
+    # Без этого переименование файла может не пережить сбой питания
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_temp_file(filepath, write, mode='w'):
+    """Пишет файл рядом с filepath во временный и сбрасывает его на диск.
+
+    Возвращает путь временного файла; на место filepath его ставит os.replace.
+    """
+    temp_path = f"{filepath}.tmp"
+    encoding = None if 'b' in mode else 'utf-8'
+    with metrics.timer("stage_seconds", stage="save"):
+        with open(temp_path, mode, encoding=encoding) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+            count_written(filepath, os.fstat(f.fileno()).st_size)
+    return temp_path
+
+
+def replace_file(filepath, write, mode='w'):
+    """Атомарно заменяет filepath: старое или новое содержимое, но не смесь."""
+    os.replace(write_temp_file(filepath, write, mode), filepath)
+    fsync_directory(os.path.dirname(filepath))
+
+
+def write_json(data):
+    return lambda f: json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def remove_empty_directory(directory):
+    """Удаляет каталог сегментов, в котором не осталось файлов."""
+    if directory != DATA_DIR and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+
+
+def apply_commit_journal(journal):
+    # Повторное применение безопасно: уже перемещенных временных файлов нет
+    for filepath in journal.get("delete", []):
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    for directory in {os.path.dirname(path) for path in journal.get("delete", [])}:
+        remove_empty_directory(directory)
+    for temp_path, filepath in journal.get("replace", []):
+        if os.path.exists(temp_path):
+            os.replace(temp_path, filepath)
+    for directory in {os.path.dirname(path) for _, path in journal.get("replace", [])}:
+        fsync_directory(directory)
+
+
+def commit_files(replacements, deletions=(), journal_path=COMMIT_JOURNAL_FILE):
+    """Атомарно применяет набор подготовленных файлов.
+
+    replacements - пары (временный файл, целевой файл), уже записанные на
+    диск. Сначала на диск попадает журнал фиксации со всем списком, затем
+    файлы переставляются. Если процесс упадет посередине, при следующем
+    запуске recover_commit доведет фиксацию до конца.
+    """
+    if not replacements and not deletions:
+        return
+    journal = {
+        "replace": [list(pair) for pair in replacements],
+        "delete": list(deletions),
+    }
+    ensure_data_dir()
+    replace_file(journal_path, write_json(journal))
+    apply_commit_journal(journal)
+    os.remove(journal_path)
+
+
+def recover_commit(journal_path=COMMIT_JOURNAL_FILE):
+    """Завершает фиксацию, прерванную сбоем. Возвращает True, если она была."""
+    try:
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+    except FileNotFoundError:
+        return False
+    except json.JSONDecodeError:
+        # Журнал не дописан - ни один целевой файл еще не тронут
+        os.remove(journal_path)
+        return False
+    apply_commit_journal(journal)
+    os.remove(journal_path)
+    return True
+
+
+def preserve_corrupted_file(filepath):
+    backup_path = f"{filepath}.corrupt"
+    os.replace(filepath, backup_path)
+    print(f"Ошибка: Файл {filepath} поврежден и сохранен как {backup_path}. "
+          "Создан новый.")
 
 
 def load_metadata(filepath=METADATA_FILE):
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
+            count_read(filepath, os.fstat(f.fileno()).st_size)
             return json.load(f)
     except FileNotFoundError:
         return {}
     except json.JSONDecodeError:
-        print(f"Ошибка: Файл {filepath} поврежден. Создан новый.")
+        preserve_corrupted_file(filepath)
         return {}
 
 
+def write_metadata_temp(data, filepath=METADATA_FILE):
+    return write_temp_file(filepath, write_json(data))
+
+
 def save_metadata(data, filepath=METADATA_FILE):
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        replace_file(filepath, write_json(data))
         return True
     except Exception as e:
         print(f"Ошибка при сохранении файла: {e}")
         return False
 
 
-def load_table_data(table_name):
-    ensure_data_dir()
-    filepath = f"{DATA_DIR}/{table_name}{TABLE_DATA_EXTENSION}"
-    
+def get_table_filepath(table_name, table_format="json"):
+    if table_format == "binary":
+        extension = TABLE_BINARY_EXTENSION
+    else:
+        extension = TABLE_COMPRESSED_EXTENSIONS.get(table_format, TABLE_DATA_EXTENSION)
+    return f"{DATA_DIR}/{table_name}{extension}"
+
+
+def get_table_log_filepath(table_name):
+    return f"{DATA_DIR}/{table_name}{TABLE_LOG_EXTENSION}"
+
+
+def get_segment_name(table_name, number):
+    """Имя сегмента для функций файлов таблиц: <таблица>/seg_<номер>."""
+    return f"{table_name}/{SEGMENT_FILE_PREFIX}{number:06d}"
+
+
+def list_segment_numbers(table_name):
+    """Номера сегментов таблицы, файлы которых есть на диске."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-    except json.JSONDecodeError:
-        print(f"Ошибка: Файл {filepath} поврежден. Создан новый.")
-        return []
+        filenames = os.listdir(f"{DATA_DIR}/{table_name}")
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+    numbers = set()
+    for filename in filenames:
+        stem, extension = os.path.splitext(filename)
+        if stem.startswith(SEGMENT_FILE_PREFIX) and extension in (
+            *TABLE_EXTENSIONS, TABLE_LOG_EXTENSION
+        ):
+            number = stem[len(SEGMENT_FILE_PREFIX):]
+            if number.isdigit():
+                numbers.add(int(number))
+    return numbers
 
 
-def save_table_data(table_name, data):
+def is_mapped_table(data):
+    """True для двоичной таблицы, отображенной в память (MappedTable).
+
+    Такая таблица бывает, только если binary_format уже загружен: проверка
+    не загружает модуль формата ради таблиц в других форматах.
+    """
+    binary_format = sys.modules.get(f"{__package__}.binary_format")
+    return binary_format is not None and isinstance(data, binary_format.MappedTable)
+
+
+def load_table_data(table_name, table_format="json"):
+    """Загружает снимок таблицы и применяет к нему журнал изменений.
+
+    Двоичная таблица без журнала возвращается как MappedTable и не
+    разворачивается в список записей.
+    """
     ensure_data_dir()
-    filepath = f"{DATA_DIR}/{table_name}{TABLE_DATA_EXTENSION}"
+    filepath = get_table_filepath(table_name, table_format)
+    schema = None
     
+    if table_format == "binary":
+        from .binary_format import MappedTable, read_binary_table
+
+        try:
+            data = read_binary_table(filepath)
+            # Файл отображается в память: учитывается его размер, а не чтение страниц
+            count_read(filepath, os.path.getsize(filepath))
+        except FileNotFoundError:
+            data = []
+        except ValueError as e:
+            print(f"Ошибка: {e}. Создан новый.")
+            data = []
+        if not os.path.exists(get_table_log_filepath(table_name)):
+            return data
+        if isinstance(data, MappedTable):
+            schema = data.schema
+            data = data.to_records()
+    elif table_format in COMPRESSED_TABLE_FORMATS:
+        from .compressed_format import read_compressed_table
+
+        try:
+            data = read_compressed_table(filepath, table_format)
+            count_read(filepath, os.path.getsize(filepath))
+        except FileNotFoundError:
+            data = []
+        except ValueError:
+            preserve_corrupted_file(filepath)
+            data = []
+    else:
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                count_read(filepath, os.fstat(f.fileno()).st_size)
+                data = json.load(f)
+        except FileNotFoundError:
+            data = []
+        except json.JSONDecodeError:
+            preserve_corrupted_file(filepath)
+            data = []
+
+    data, applied = replay_table_log(table_name, data)
+    if applied >= LOG_COMPACTION_THRESHOLD:
+        save_table_data(table_name, data, table_format, schema)
+
+    return data
+
+
+def columns_from_records(data):
+    # Схема для двоичного снимка, когда метаданные недоступны
+    if not data:
+        return []
+    types = {bool: "bool", int: "int"}
+    return [
+        {"name": name, "type": types.get(type(value), "str")}
+        for name, value in data[0].items()
+    ]
+
+
+def write_table_temp(table_name, data, table_format="json", columns=None):
+    """Записывает снимок таблицы во временный файл; возвращает (временный, целевой)."""
+    filepath = get_table_filepath(table_name, table_format)
+    ensure_data_dir(os.path.dirname(filepath))
+    if table_format == "binary":
+        from .binary_format import write_binary_table
+
+        if columns is None:
+            columns = getattr(data, "schema", None) or columns_from_records(data)
+        temp_path = f"{filepath}.tmp"
+        with metrics.timer("stage_seconds", stage="save"):
+            write_binary_table(temp_path, columns, data)
+        count_written(filepath, os.path.getsize(temp_path))
+    elif table_format in COMPRESSED_TABLE_FORMATS:
+        from .compressed_format import write_compressed_table
+
+        if columns is None:
+            columns = columns_from_records(data)
+        temp_path = write_temp_file(
+            filepath,
+            lambda f: write_compressed_table(f, table_format, columns, data),
+            'wb',
+        )
+    else:
+        if not isinstance(data, list):
+            data = list(data)
+        temp_path = write_temp_file(filepath, write_json(data))
+    return temp_path, filepath
+
+
+def save_table_data(table_name, data, table_format="json", columns=None):
+    """Записывает полный снимок таблицы; журнал после этого не нужен."""
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        replacement = write_table_temp(table_name, data, table_format, columns)
+        commit_files([replacement], [get_table_log_filepath(table_name)])
         return True
     except Exception as e:
         print(f"Ошибка при сохранении данных таблицы {table_name}: {e}")
         return False
 
 
-def delete_table_file(table_name):
-    filepath = f"{DATA_DIR}/{table_name}{TABLE_DATA_EXTENSION}"
+def write_log_temp(table_name, entries):
+    """Готовит новую версию журнала: прежние записи и entries [(операция, данные)]."""
+    filepath = get_table_log_filepath(table_name)
+    ensure_data_dir(os.path.dirname(filepath))
+
+    def write(f):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as current:
+                content = current.read()
+        except FileNotFoundError:
+            content = ""
+        if content and not content.endswith("\n"):
+            # Оборванная последняя строка не должна склеиться с новой
+            content += "\n"
+        f.write(content)
+        for operation, payload in entries:
+            f.write(json.dumps({"op": operation, **payload}, ensure_ascii=False) + "\n")
+
+    return write_temp_file(filepath, write), filepath
+
+
+def get_table_files(table_name):
+    """Все возможные файлы таблицы, включая файлы ее сегментов на диске."""
+    names = [table_name] + [
+        get_segment_name(table_name, number)
+        for number in sorted(list_segment_numbers(table_name))
+    ]
+    formats = sorted(VALID_TABLE_FORMATS)
+    return [
+        filepath
+        for name in names
+        for filepath in (
+            *[get_table_filepath(name, table_format) for table_format in formats],
+            get_table_log_filepath(name),
+        )
+    ]
+
+
+def append_table_log(table_name, operation, **payload):
+    """Дописывает одну операцию (insert/update/delete) в журнал таблицы."""
+    filepath = get_table_log_filepath(table_name)
+    ensure_data_dir(os.path.dirname(filepath))
+    entry = {"op": operation, **payload}
+
     try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            return True
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with metrics.timer("stage_seconds", stage="save"):
+            with open(filepath, 'a', encoding='utf-8') as f:
+                f.write(line)
+        count_written(filepath, len(line.encode('utf-8')))
+        return True
+    except Exception as e:
+        print(f"Ошибка при записи журнала таблицы {table_name}: {e}")
+        return False
+
+
+def read_table_log(table_name):
+    filepath = get_table_log_filepath(table_name)
+
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            count_read(filepath, os.fstat(f.fileno()).st_size)
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Оборванная при сбое последняя запись журнала
+                    print(f"Ошибка: Пропущена поврежденная запись в {filepath}.")
+    except FileNotFoundError:
+        return
+
+
+def count_table_log(table_name):
+    """Число записей в журнале таблицы (без чтения самих операций)."""
+    try:
+        with open(get_table_log_filepath(table_name), 'rb') as f:
+            return sum(1 for line in f if line.strip())
+    except FileNotFoundError:
+        return 0
+
+
+def replay_table_log(table_name, data):
+    """Применяет журнал к снимку за один проход по данным.
+
+    Возвращает итоговые данные и количество примененных записей журнала.
+    """
+    entries = list(read_table_log(table_name))
+    if not entries:
+        # Без журнала индекс по ID не нужен: на больших таблицах он дороже чтения файла
+        return data, 0
+
+    by_id = {}
+    for record in data:
+        by_id.setdefault(record.get("ID"), []).append(record)
+
+    removed = set()
+    applied = 0
+
+    for entry in entries:
+        operation = entry.get("op")
+        if operation == "insert":
+            record = entry["record"]
+            data.append(record)
+            by_id.setdefault(record.get("ID"), []).append(record)
+        elif operation == "update":
+            values = entry.get("values", {})
+            for record_id in entry.get("ids", []):
+                for record in by_id.get(record_id, []):
+                    for column, new_value in values.items():
+                        if column in record:
+                            record[column] = new_value
+        elif operation == "delete":
+            for record_id in entry.get("ids", []):
+                for record in by_id.pop(record_id, []):
+                    removed.add(id(record))
+        applied += 1
+
+    if removed:
+        data = [record for record in data if id(record) not in removed]
+
+    return data, applied
+
+
+def compact_table_log(table_name, table_format="json", columns=None):
+    """Сворачивает журнал таблицы в снимок."""
+    data = load_table_data(table_name, table_format)
+    return save_table_data(table_name, data, table_format, columns)
+
+
+def remove_table_log(table_name):
+    filepath = get_table_log_filepath(table_name)
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+
+def delete_table_file(table_name, table_format=None):
+    """Удаляет файлы таблицы; без table_format - во всех форматах и с сегментами."""
+    formats = [table_format] if table_format else sorted(VALID_TABLE_FORMATS)
+    removed = False
+    try:
+        if table_format is None:
+            remove_table_log(table_name)
+            for number in list_segment_numbers(table_name):
+                segment_name = get_segment_name(table_name, number)
+                removed = delete_table_file(segment_name) or removed
+            remove_empty_directory(f"{DATA_DIR}/{table_name}")
+        for current_format in formats:
+            filepath = get_table_filepath(table_name, current_format)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+                removed = True
     except Exception as e:
         print(f"Ошибка при удалении файла таблицы {table_name}: {e}")
-    return False
+    return removed
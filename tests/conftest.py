@@ -0,0 +1,105 @@
+import csv
+
+import pytest
+
+from src.primitive_db.core import clear_select_cache
+from src.primitive_db.decorators import configure_session
+from src.primitive_db.engine import command_failed, execute_command
+from src.primitive_db.metrics import metrics
+from src.primitive_db.statements import statement_cache
+from src.primitive_db.store import TableStore
+
+
+class Session:
+    """Хранилище в каталоге теста; команды выполняются как в диалоге."""
+
+    def __init__(self, capsys):
+        self.capsys = capsys
+        self.store = TableStore()
+
+    def run(self, command):
+        """Выполняет команду и возвращает ее вывод."""
+        self.capsys.readouterr()
+        execute_command(self.store, command)
+        self.store.flush()
+        return self.capsys.readouterr().out
+
+    def ok(self, command):
+        output = self.run(command)
+        assert not command_failed(), output
+        return output
+
+    def fails(self, command):
+        output = self.run(command)
+        assert command_failed(), output
+        return output
+
+    def ids(self, command):
+        """ID записей в выводе select (первый столбец таблицы)."""
+        return [
+            int(line.split("|")[1])
+            for line in self.ok(command).splitlines()
+            if line.startswith("|") and line.split("|")[1].strip().isdigit()
+        ]
+
+    def rows(self, command):
+        """Строки таблиц в выводе команды: списки значений без заголовков страниц."""
+        rows = []
+        previous = ""
+        header_next = False
+        for line in self.ok(command).splitlines():
+            if line.startswith("+"):
+                # Рамка не после строки таблицы открывает новую страницу
+                header_next = header_next or not previous.startswith("|")
+            elif line.startswith("|"):
+                if not header_next:
+                    rows.append([cell.strip() for cell in line.split("|")[1:-1]])
+                header_next = False
+            previous = line
+        return rows
+
+    def load(self, table_name, columns, rows):
+        """Загружает строки командой load из CSV-файла в каталоге теста."""
+        filepath = f"{table_name}.csv"
+        with open(filepath, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        return self.ok(f"load {table_name} from {filepath}")
+
+    def reopen(self):
+        """Новое хранилище над теми же файлами, как при следующем запуске."""
+        self.store = TableStore()
+        clear_select_cache()
+        return self
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    configure_session(confirm="yes", show_timing=False)
+    clear_select_cache()
+    statement_cache.prepared.clear()
+    metrics.reset()
+    yield tmp_path
+    configure_session(confirm="ask")
+
+
+@pytest.fixture
+def db(workdir, capsys):
+    return Session(capsys)
+
+
+PEOPLE_ROWS = 500
+
+
+@pytest.fixture
+def people(db):
+    """Таблица people: ID i + 1, name n<i % 50>, age i, active - нечетные i."""
+    db.ok("create_table people name:str age:int active:bool")
+    db.load(
+        "people",
+        ["name", "age", "active"],
+        [(f"n{i % 50}", i, "true" if i % 2 else "false") for i in range(PEOPLE_ROWS)],
+    )
+    return db
@@ -0,0 +1,63 @@
+import pytest
+
+from src.primitive_db.constants import ERROR_MESSAGES
+
+GROUPED = [
+    ["False", "250", "62250", "249.0", "0", "498"],
+    ["True", "250", "62500", "250.0", "1", "499"],
+]
+
+
+def test_whole_table_aggregates(people):
+    assert people.rows(
+        "select count(*), sum(age), avg(age), min(age), max(age) from people"
+    ) == [["500", "124750", "249.5", "0", "499"]]
+    assert people.rows("select min(name), max(name) from people") == [["n0", "n9"]]
+
+
+def test_where_limits_the_aggregated_rows(people):
+    assert people.rows('select count(*), sum(age) from people where name = "n1"') == [
+        ["10", "2260"]
+    ]
+    assert people.rows("select count(*), max(age) from people where age > 10000") == [
+        ["0", "None"]
+    ]
+
+
+@pytest.mark.parametrize("setup", [[], ["create_index people age sorted"],
+                                   ["set_layout people columnar"]])
+def test_group_by_matches_on_every_access_path(people, setup):
+    for command in setup:
+        people.ok(command)
+    people.ok("clear_cache")
+    rows = people.rows(
+        "select active, count(*), sum(age), avg(age), min(age), max(age) "
+        "from people group by active"
+    )
+    assert sorted(rows) == GROUPED
+
+
+def test_groups_can_be_ordered_and_limited(people):
+    assert people.rows(
+        "select name, sum(age) from people group by name order by sum(age) desc limit 2"
+    ) == [["n49", "2740"], ["n48", "2730"]]
+
+
+def test_min_max_use_the_sorted_index(people):
+    people.ok("create_index people age sorted")
+    output = people.ok("explain select min(age), max(age) from people where age > 5")
+    assert "по упорядоченному индексу" in output
+    assert people.rows("select min(age), max(age) from people where age > 5") == [
+        ["6", "499"]
+    ]
+
+
+def test_aggregate_errors(people):
+    assert ERROR_MESSAGES["not_grouped"].format(column="name") in people.fails(
+        "select name, count(*) from people"
+    )
+    assert "Функция sum применима только к столбцам int" in people.fails(
+        "select sum(name) from people"
+    )
+    people.fails("select avg(weight) from people")
+    people.fails("select count(*) from people group by")
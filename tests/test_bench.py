@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from src.primitive_db.benchmarks import generate_rows, runner
+from src.primitive_db.main import build_arg_parser
+
+
+def test_percentile_uses_nearest_rank():
+    ordered = list(range(1, 21))
+    assert runner.percentile(ordered, 50) == 10
+    assert runner.percentile(ordered, 99) == 20
+    assert runner.percentile([5], 99) == 5
+
+
+def test_summary_of_latencies():
+    stats = runner.summarize([0.2, 0.1, 0.3, 0.4], items=8, unit="ops/s")
+    assert stats["samples"] == 4
+    assert stats["total_s"] == 1.0
+    assert stats["throughput"] == 8.0
+    assert (stats["p50_ms"], stats["p99_ms"]) == (200.0, 400.0)
+
+
+def test_rows_are_deterministic():
+    assert list(generate_rows(5)) == list(generate_rows(5))
+    assert list(generate_rows(5)) != list(generate_rows(5, seed=1))
+
+
+def test_cases_run_on_a_small_table(workdir, monkeypatch):
+    started = []
+    monkeypatch.setattr(runner, "start_process", lambda *args: started.append(args))
+    cases = runner.run_cases(rows=50, samples=3)
+    assert {"bulk_load", "select_eq", "select_range", "insert", "update", "delete",
+            "save_zlib", "load_lzma", "segmented_oneshot_insert"} <= set(cases)
+    assert cases["insert"]["samples"] == 3
+    assert all(case["p50_ms"] <= case["p99_ms"] for case in cases.values())
+    assert len(started) == 4 * runner.FILE_SAMPLES
+
+
+def test_report_compares_with_baseline(workdir):
+    case = runner.summarize([0.002], items=1, unit="ops/s")
+    results = [{"rows": 10, "peak_rss_kb": None, "cases": {"insert": case}}]
+    with open("base.json", "w", encoding="utf-8") as f:
+        json.dump({"results": [{"rows": 10, "cases": {"insert": {"p50_ms": 4.0}}}]}, f)
+
+    report = runner.format_report(results, runner.load_baseline("base.json"))
+    assert "-50.0%" in report
+    assert "p50 к базовому" not in runner.format_report(results)
+
+
+def test_missing_baseline_is_reported(workdir, capsys):
+    assert runner.load_baseline("missing.json") == {}
+    assert "Нет замеров в missing.json" in capsys.readouterr().out
+    assert runner.format_change(1.0, None) == "-"
+
+
+def test_invalid_sizes_are_rejected(capsys):
+    with pytest.raises(SystemExit):
+        build_arg_parser().parse_args(["bench", "--sizes", "10,x"])
+    assert "Размеры таблиц задаются целыми числами" in capsys.readouterr().err
+    assert build_arg_parser().parse_args(["bench", "--sizes", "5,10"]).sizes == (5, 10)
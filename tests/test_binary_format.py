@@ -0,0 +1,75 @@
+import os
+
+from src.primitive_db.binary_format import (
+    MappedTable,
+    read_binary_table,
+    write_binary_table,
+)
+from src.primitive_db.constants import ERROR_MESSAGES
+from src.primitive_db.parser import Comparison
+from src.primitive_db.utils import load_table_data
+
+COLUMNS = [
+    {"name": "ID", "type": "int"},
+    {"name": "name", "type": "str"},
+    {"name": "active", "type": "bool"},
+]
+RECORDS = [
+    {"ID": 1, "name": "Анна", "active": True},
+    {"ID": -2, "name": "", "active": False},
+    {"ID": 2**40, "name": "x y", "active": True},
+]
+
+
+def test_binary_file_round_trip(workdir):
+    write_binary_table("t.tbl", COLUMNS, RECORDS)
+    table = read_binary_table("t.tbl")
+    assert isinstance(table, MappedTable)
+    assert table.schema == COLUMNS
+    assert table.to_records() == RECORDS
+    assert table.columns["name"].match("Анна", None) == [0]
+    assert table.columns["ID"].match(Comparison(">", 0), None) == [0, 2]
+
+
+def test_converted_table_is_memory_mapped(people):
+    people.ok("convert people binary")
+    assert os.path.exists("data/people.tbl")
+    assert not os.path.exists("data/people.json")
+
+    people.reopen()
+    assert isinstance(people.store.get_table("people"), MappedTable)
+    assert people.ids('select from people where name = "n3"') == list(range(4, 501, 50))
+
+
+def test_binary_table_accepts_changes(people):
+    people.ok("convert people binary")
+    people.ok('insert into people values ("new", 1, true)')
+    people.ok("delete from people where age > 2")
+    people.reopen()
+    assert people.ids("select from people") == [1, 2, 3, 501]
+
+    people.ok("compact people")
+    assert not os.path.exists("data/people.log")
+    assert people.reopen().ids("select from people") == [1, 2, 3, 501]
+
+
+def test_table_converts_back_to_json(people):
+    people.ok("convert people binary")
+    people.ok("convert people json")
+    assert not os.path.exists("data/people.tbl")
+    assert len(load_table_data("people")) == 500
+
+
+def test_damaged_binary_file_is_replaced(workdir, capsys):
+    os.makedirs("data")
+    with open("data/t.tbl", "wb") as f:
+        f.write(b"garbage" * 10)
+    assert load_table_data("t", "binary") == []
+    assert "не является таблицей" in capsys.readouterr().out
+
+
+def test_unknown_format_is_rejected(people):
+    output = people.fails("convert people yaml")
+    assert ERROR_MESSAGES["invalid_table_format"].format(
+        table_format="yaml", valid_formats="binary, json, lzma, zlib"
+    ) in output
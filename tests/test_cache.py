@@ -0,0 +1,73 @@
+import pytest
+
+from src.primitive_db.constants import CACHE_MAX_BYTES, CACHE_MAX_ENTRIES
+from src.primitive_db.core import configure_select_cache, get_cache_statistics
+from src.primitive_db.decorators import create_cacher
+
+
+@pytest.fixture(autouse=True)
+def default_limits():
+    yield
+    configure_select_cache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cacher = create_cacher(max_entries=2)
+    for query in ("a", "b"):
+        cacher(cacher.key("t", query), str.upper, query)
+    cacher(cacher.key("t", "a"), str.upper, "a")
+    cacher(cacher.key("t", "c"), str.upper, "c")
+
+    stats = cacher.stats()
+    assert stats["keys"] == ["t@v0: a", "t@v0: c"]
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+
+
+def test_invalidation_only_drops_the_changed_table():
+    cacher = create_cacher()
+    cacher(cacher.key("t", "q"), str.upper, "q")
+    cacher(cacher.key("u", "q"), str.upper, "q")
+    cacher.invalidate("t")
+
+    assert cacher.stats()["keys"] == ["u@v0: q"]
+    assert not cacher.contains(("t", 0, "q"))
+    assert cacher.key("t", "q") == ("t", 1, "q")
+
+
+def test_oversized_result_is_not_cached():
+    cacher = create_cacher(max_bytes=10)
+    assert cacher(cacher.key("t", "q"), lambda: "x" * 100) == "x" * 100
+    assert cacher.stats()["size"] == 0
+
+
+def test_repeated_select_is_served_from_cache(people):
+    query = 'select from people where name = "n3"'
+    first = people.ok(query)
+    assert people.ok(query) == first
+    assert get_cache_statistics()["hits"] == 1
+    assert "кэш результатов" in people.ok(f"explain {query}")
+
+
+def test_write_invalidates_only_its_table(people):
+    people.ok("create_table pets kind:str")
+    people.ok('insert into pets values ("cat")')
+    people.ok('select from pets where kind = "cat"')
+    people.ok("select from people where age < 3")
+
+    people.ok('insert into people values ("new", 1, true)')
+    keys = get_cache_statistics()["keys"]
+    assert len(keys) == 1 and keys[0].startswith("pets@")
+    assert people.ids("select from people where age < 3") == [1, 2, 3, 501]
+
+
+def test_cache_limit_command(people):
+    people.ok("cache_limit 1")
+    people.ok("select from people where age < 3")
+    people.ok("select from people where age < 4")
+    stats = get_cache_statistics()
+    assert (stats["size"], stats["max_entries"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_cache_limit_requires_numbers(db):
+    assert "cache_limit <записей> [байт]" in db.fails("cache_limit many")
+    assert get_cache_statistics()["max_entries"] == CACHE_MAX_ENTRIES
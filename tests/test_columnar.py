@@ -0,0 +1,41 @@
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.constants import ERROR_MESSAGES
+
+QUERIES = [
+    'select from people where name = "n3"',
+    "select from people where age between 100 and 110 and active = true",
+    "select from people where not age < 490 or name = \"n1\"",
+    "select from people order by age desc limit 4",
+]
+
+
+def test_columnar_layout_gives_the_same_results(people):
+    expected = [people.ids(query) for query in QUERIES]
+    people.ok("set_layout people columnar")
+    people.ok("clear_cache")
+    assert isinstance(people.store.get_table("people"), ColumnarTable)
+    assert [people.ids(query) for query in QUERIES] == expected
+
+
+def test_columnar_table_accepts_changes(people):
+    people.ok("set_layout people columnar")
+    people.ok('insert into people values ("new", 7, true)')
+    people.ok('update people set name = "upd" where age = 7')
+    people.ok("delete from people where age > 10")
+    assert people.ids('select from people where name = "upd"') == [8, 501]
+    assert len(people.ids("select from people")) == 12
+
+
+def test_layout_survives_a_new_session(people):
+    people.ok("set_layout people columnar")
+    people.ok('insert into people values ("new", 7, true)')
+    people.reopen()
+    assert isinstance(people.store.get_table("people"), ColumnarTable)
+    assert people.ids('select from people where name = "new"') == [501]
+
+
+def test_unknown_layout_is_rejected(people):
+    output = people.fails("set_layout people sideways")
+    assert ERROR_MESSAGES["invalid_layout"].format(
+        layout="sideways", valid_layouts="columnar, rows"
+    ) in output
@@ -0,0 +1,82 @@
+import io
+import os
+
+import pytest
+
+from src.primitive_db import compressed_format
+from src.primitive_db.compressed_format import (
+    iter_compressed_table,
+    read_compressed_table,
+    write_compressed_table,
+)
+from src.primitive_db.constants import ERROR_MESSAGES
+from src.primitive_db.utils import load_table_data
+
+COLUMNS = [{"name": "ID", "type": "int"}, {"name": "text", "type": "str"}]
+RECORDS = [
+    {"ID": i, "text": f"строка {i}\nс переводом, [скобкой]"} for i in range(1, 40)
+]
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_round_trip_in_small_chunks(workdir, monkeypatch, codec):
+    # Куски чтения и пачки записи меньше файла: строки разрезаются на границах
+    monkeypatch.setattr(compressed_format, "READ_CHUNK_SIZE", 16)
+    monkeypatch.setattr(compressed_format, "WRITE_BATCH_ROWS", 7)
+    with open("t.bin", "wb") as f:
+        write_compressed_table(f, codec, COLUMNS, RECORDS)
+    assert read_compressed_table("t.bin", codec) == RECORDS
+    with open("t.bin", "rb") as f:
+        assert next(iter_compressed_table(f, codec)) == RECORDS[0]
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_damaged_stream_is_an_error(codec):
+    stream = io.BytesIO()
+    write_compressed_table(stream, codec, COLUMNS, RECORDS)
+    data = stream.getvalue()
+    with pytest.raises(ValueError, match="оборван"):
+        list(iter_compressed_table(io.BytesIO(data[: len(data) // 2]), codec))
+    with pytest.raises(ValueError):
+        list(iter_compressed_table(io.BytesIO(b"not compressed" * 10), codec))
+
+
+@pytest.mark.parametrize("codec, extension", [("zlib", ".zz"), ("lzma", ".xz")])
+def test_compressed_table_end_to_end(people, codec, extension):
+    expected = people.ids('select from people where name = "n3"')
+    people.ok(f"convert people {codec}")
+    assert os.path.exists(f"data/people{extension}")
+    assert not os.path.exists("data/people.json")
+
+    people.reopen()
+    assert people.ids('select from people where name = "n3"') == expected
+    people.ok('insert into people values ("n3", 1, true)')
+    people.ok("compact people")
+    people.reopen()
+    assert people.ids('select from people where name = "n3"') == expected + [501]
+
+
+def test_create_table_in_compressed_format(db):
+    db.ok("create_table notes text:str zlib")
+    db.ok('insert into notes values ("a")')
+    db.ok("compact notes")
+    assert os.path.exists("data/notes.zz")
+    assert db.reopen().ids("select from notes") == [1]
+
+
+def test_truncated_table_file_is_preserved(people, capsys):
+    people.ok("convert people zlib")
+    with open("data/people.zz", "rb") as f:
+        data = f.read()
+    with open("data/people.zz", "wb") as f:
+        f.write(data[:-20])
+
+    assert load_table_data("people", "zlib") == []
+    assert "сохранен как data/people.zz.corrupt" in capsys.readouterr().out
+    assert os.path.exists("data/people.zz.corrupt")
+
+
+def test_unknown_format_is_rejected(db):
+    assert ERROR_MESSAGES["invalid_table_format"].format(
+        table_format="bz2", valid_formats="binary, json, lzma, zlib"
+    ) in db.fails("create_table notes text:str bz2")
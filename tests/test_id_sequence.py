@@ -0,0 +1,51 @@
+import json
+
+from src.primitive_db.utils import append_table_log, load_metadata
+
+
+def test_deleted_ids_are_not_reused(db):
+    db.ok("create_table people name:str")
+    for name in ("a", "b", "c"):
+        db.ok(f'insert into people values ("{name}")')
+    db.ok('delete from people where name = "c"')
+    db.ok('insert into people values ("d")')
+    assert db.ids("select from people") == [1, 2, 4]
+
+
+def test_sequence_survives_restart(db):
+    db.ok("create_table people name:str")
+    db.load("people", ["name"], [("a",), ("b",)])
+    db.ok("delete from people where ID = 2")
+    assert load_metadata()["people"]["next_id"] == 3
+
+    db.reopen().ok('insert into people values ("c")')
+    assert db.ids("select from people") == [1, 3]
+
+
+def test_sequence_catches_up_with_the_log(db):
+    db.ok("create_table people name:str")
+    # Вставка попала в журнал, а метаданные с новым счетчиком не записались
+    append_table_log("people", "insert", record={"ID": 1, "name": "a"})
+
+    db.reopen().ok('insert into people values ("b")')
+    assert db.ids("select from people") == [1, 2]
+
+
+def test_table_without_counter_gets_one_from_data(db):
+    db.ok("create_table people name:str")
+    db.load("people", ["name"], [("a",), ("b",)])
+    with open("db_meta.json", encoding="utf-8") as f:
+        metadata = json.load(f)
+    del metadata["people"]["next_id"]
+    with open("db_meta.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+
+    db.reopen().ok('insert into people values ("c")')
+    assert db.ids("select from people") == [1, 2, 3]
+
+
+def test_failed_insert_does_not_take_an_id(db):
+    db.ok("create_table people name:str age:int")
+    db.fails('insert into people values ("a", "old")')
+    db.ok('insert into people values ("b", 1)')
+    assert db.ids("select from people") == [1]
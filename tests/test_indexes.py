@@ -0,0 +1,50 @@
+from src.primitive_db.constants import ERROR_MESSAGES
+
+
+def plan(db, query):
+    return db.ok(f"explain {query}")
+
+
+def test_hash_index_answers_equality(people):
+    people.ok("create_index people name")
+    assert "индекс hash по столбцу name" in plan(
+        people, 'select from people where name = "n7"'
+    )
+    assert people.ids('select from people where name = "n7"') == list(
+        range(8, 501, 50)
+    )
+
+
+def test_hash_index_follows_changes(people):
+    people.ok("create_index people name")
+    people.ok('insert into people values ("fresh", 1, true)')
+    people.ok('update people set name = "fresh" where ID = 1')
+    people.ok("delete from people where ID = 51")
+    assert sorted(people.ids('select from people where name = "fresh"')) == [1, 501]
+    assert 51 not in people.ids('select from people where name = "n0"')
+
+
+def test_index_definitions_survive_a_new_session(people):
+    people.ok("create_index people name")
+    people.reopen()
+    assert "индекс hash" in plan(people, 'select from people where name = "n1"')
+
+
+def test_drop_index_falls_back_to_scan(people):
+    people.ok("create_index people name")
+    people.ok("drop_index people name")
+    assert "полный просмотр" in plan(people, 'select from people where name = "n1"')
+
+
+def test_index_errors(people):
+    people.ok("create_index people name")
+    assert ERROR_MESSAGES["index_exists"].format(
+        column="name", table_name="people"
+    ) in people.fails("create_index people name")
+    assert ERROR_MESSAGES["column_not_found"].format(
+        column="nope", table_name="people"
+    ) in people.fails("create_index people nope")
+    assert ERROR_MESSAGES["index_not_found"].format(
+        column="age", table_name="people"
+    ) in people.fails("drop_index people age")
+    people.fails("create_index people name bogus")
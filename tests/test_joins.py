@@ -0,0 +1,72 @@
+import pytest
+
+from src.primitive_db.constants import ERROR_MESSAGES
+
+JOIN = "select people.ID, orders.ID from people join orders on people.ID = orders.owner"
+ORDERS = [(i * 7 % 600, i) for i in range(300)]
+
+
+@pytest.fixture
+def shop(people):
+    people.ok("create_table orders owner:int total:int")
+    people.load("orders", ["owner", "total"], ORDERS)
+    return people
+
+
+def expected_pairs(condition=lambda owner, total: True):
+    return sorted(
+        [owner, order_id]
+        for order_id, (owner, total) in enumerate(ORDERS, 1)
+        if 1 <= owner <= 500 and condition(owner, total)
+    )
+
+
+def pairs(db, command):
+    return sorted([int(value) for value in row] for row in db.rows(command))
+
+
+def test_join_on_primary_key(shop):
+    assert pairs(shop, JOIN) == expected_pairs()
+    assert "по индексу столбца ID таблицы people" in shop.ok(f"explain {JOIN}")
+
+
+def test_hash_join_without_index(shop):
+    query = (
+        "select people.ID, orders.ID from people join orders "
+        "on people.age = orders.total where total < 50"
+    )
+    # age = ID - 1, поэтому пары находятся и без первичного ключа
+    assert pairs(shop, query) == sorted(
+        [total + 1, order_id]
+        for order_id, (_, total) in enumerate(ORDERS, 1)
+        if total < 50
+    )
+    assert "хеш-таблица" in shop.ok(f"explain {query}")
+
+
+def test_join_uses_an_index_on_the_join_column(shop):
+    shop.ok("create_index orders owner hash")
+    query = f"{JOIN} where people.age < 100"
+    assert pairs(shop, query) == expected_pairs(lambda owner, total: owner <= 100)
+    assert "по индексу столбца owner таблицы orders" in shop.ok(f"explain {query}")
+
+
+def test_where_mixes_both_tables(shop):
+    query = f"{JOIN} where total > 200 or name = \"n3\""
+    assert pairs(shop, query) == expected_pairs(
+        lambda owner, total: total > 200 or (owner - 1) % 50 == 3
+    )
+
+
+def test_join_errors(shop):
+    assert ERROR_MESSAGES["ambiguous_column"].format(
+        column="ID", tables="people, orders"
+    ) in shop.fails("select ID from people join orders on people.ID = orders.owner")
+    assert ERROR_MESSAGES["join_same_table"].format(table_name="people") in shop.fails(
+        "select from people join people on people.ID = people.age"
+    )
+    assert ERROR_MESSAGES["table_not_found"].format(table_name="pets") in shop.fails(
+        "select from people join pets on people.ID = pets.owner"
+    )
+    shop.fails("select from people join orders on people.ID = orders.missing")
+    shop.fails("select from people join orders on people.ID")
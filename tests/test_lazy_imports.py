@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import src.primitive_db as package
+from src.primitive_db.main import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_modules(statement):
+    """Модули, загруженные в новом процессе после выполнения statement."""
+    code = f"import sys; {statement}; print(' '.join(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+        check=True,
+    )
+    return set(result.stdout.splitlines()[-1].split())
+
+
+def test_package_import_defers_the_engine():
+    modules = loaded_modules("import src.primitive_db")
+    assert "src.primitive_db.main" in modules
+    assert not {"prettytable", "src.primitive_db.engine", "multiprocessing"} & modules
+
+
+def test_engine_import_defers_output_and_processes():
+    modules = loaded_modules("import src.primitive_db.engine")
+    assert not {"prettytable", "multiprocessing", "cProfile"} & modules
+    assert not {"csv", "lzma", "zlib", "mmap"} & modules
+    assert not {
+        f"src.primitive_db.{name}"
+        for name in ("aggregates", "joins", "loader", "exporter", "planner", "store")
+    } & modules
+
+
+def test_simple_commands_skip_file_formats_and_query_modules(tmp_path):
+    modules = loaded_modules(
+        "import os; from src.primitive_db.engine import run_script; "
+        f"os.chdir({str(tmp_path)!r}); "
+        "run_script(['help', 'list_tables', 'create_table t a:int'], True)"
+    )
+    assert not {"csv", "lzma", "mmap", "src.primitive_db.aggregates"} & modules
+    assert not {"src.primitive_db.joins", "src.primitive_db.loader"} & modules
+
+
+def test_exports_resolve_on_first_use():
+    from src.primitive_db.store import TableStore
+
+    assert package.TableStore is TableStore
+    assert "select" in dir(package)
+    with pytest.raises(AttributeError):
+        package.missing_name
+
+
+def test_one_shot_command_without_metadata(workdir, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["-c", "help"])
+    assert exit_info.value.code == 0
+    assert "create_table" in capsys.readouterr().out
+    assert not os.path.exists("db_meta.json")
+
+
+def test_one_shot_commands_and_exit_code(workdir, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["-c", "create_table t name:str\ninsert into t values (\"a\")"])
+    assert exit_info.value.code == 0
+    with pytest.raises(SystemExit) as exit_info:
+        main(["-c", "insert into t values (1, 2)"])
+    assert exit_info.value.code == 1
@@ -0,0 +1,61 @@
+import json
+
+from src.primitive_db.constants import BULK_LOAD_CHUNK_SIZE, ERROR_MESSAGES
+
+
+def write_lines(filepath, lines):
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_load_csv_converts_values(db):
+    db.ok("create_table people name:str age:int active:bool")
+    output = db.load(
+        "people", ["name", "age", "active"], [("a", " 7 ", "TRUE"), ("b", 8, "false")]
+    )
+    assert 'Загружено 2 записей в таблицу "people"' in output
+    assert db.ids("select from people where active = true") == [1]
+    assert db.reopen().ids("select from people where age = 8") == [2]
+
+
+def test_load_jsonl_across_chunks(db):
+    db.ok("create_table items name:str count:int")
+    rows = BULK_LOAD_CHUNK_SIZE + 3
+    write_lines(
+        "items.jsonl",
+        [json.dumps({"name": f"i{i}", "count": i}) for i in range(rows)] + [""],
+    )
+    db.ok("load items from items.jsonl")
+    db.ok('insert into items values ("last", 0)')
+    assert db.ids(f"select from items where count >= {rows - 1}") == [rows]
+    assert db.ids('select from items where name = "last"') == [rows + 1]
+
+
+def test_bad_value_leaves_table_unchanged(db):
+    db.ok("create_table people name:str age:int")
+    db.load("people", ["name", "age"], [("a", 1)])
+    write_lines("bad.csv", ["name,age", "b,2", "c,old"])
+
+    output = db.fails("load people from bad.csv")
+    assert ERROR_MESSAGES["invalid_row_value"].format(
+        row=2, column="age", value="old", expected_type="int"
+    ) in output
+    db.ok('insert into people values ("d", 4)')
+    assert db.ids("select from people") == [1, 2]
+
+
+def test_missing_column_is_reported(db):
+    db.ok("create_table people name:str age:int")
+    write_lines("people.jsonl", ['{"name": "a"}'])
+    output = db.fails("load people from people.jsonl")
+    assert ERROR_MESSAGES["missing_column"].format(column="age") in output
+
+
+def test_unsupported_file_and_unknown_table(db):
+    db.ok("create_table people name:str")
+    write_lines("people.txt", ["name", "a"])
+    output = db.fails("load people from people.txt")
+    assert 'Неподдерживаемый файл "people.txt"' in output
+    output = db.fails("load pets from people.csv")
+    assert ERROR_MESSAGES["table_not_found"].format(table_name="pets") in output
+    assert "load <имя_таблицы> from" in db.fails("load people people.csv")
@@ -0,0 +1,96 @@
+import json
+import os
+
+from src.primitive_db import store as store_module
+from src.primitive_db.utils import load_table_data, read_table_log
+
+LOG = "data/users.log"
+SNAPSHOT = "data/users.json"
+
+
+def create_users(db):
+    db.ok("create_table users name:str age:int")
+
+
+def read_snapshot():
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_insert_appends_to_log_without_rewriting_snapshot(db):
+    create_users(db)
+    snapshot = os.stat(SNAPSHOT).st_mtime_ns
+    db.ok('insert into users values ("Ann", 30)')
+    db.ok('update users set age = 31 where name = "Ann"')
+
+    assert os.stat(SNAPSHOT).st_mtime_ns == snapshot
+    assert [entry["op"] for entry in read_table_log("users")] == ["insert", "update"]
+    assert load_table_data("users") == [{"ID": 1, "name": "Ann", "age": 31}]
+
+
+def test_log_is_replayed_by_a_new_session(db):
+    create_users(db)
+    db.ok('insert into users values ("Ann", 30)')
+    db.ok('insert into users values ("Bob", 25)')
+    db.ok("delete from users where ID = 1")
+
+    output = db.reopen().ok("select from users")
+    assert "Bob" in output and "Ann" not in output
+
+
+def test_truncated_last_log_line_is_skipped(db, capsys):
+    create_users(db)
+    db.ok('insert into users values ("Ann", 30)')
+    with open(LOG, "a", encoding="utf-8") as f:
+        f.write('{"op": "insert", "record": {"ID": 2, "na')
+
+    assert load_table_data("users") == [{"ID": 1, "name": "Ann", "age": 30}]
+    assert "поврежденная запись" in capsys.readouterr().out
+
+
+def test_compact_folds_log_into_snapshot(db):
+    create_users(db)
+    db.ok('insert into users values ("Ann", 30)')
+    db.ok("compact users")
+
+    assert not os.path.exists(LOG)
+    assert read_snapshot() == [{"ID": 1, "name": "Ann", "age": 30}]
+
+
+def test_long_log_is_compacted_during_the_session(db, monkeypatch):
+    monkeypatch.setattr(store_module, "LOG_COMPACTION_THRESHOLD", 3)
+    create_users(db)
+    db.ok('insert into users values ("Ann", 30)')
+    db.ok('insert into users values ("Bob", 25)')
+    assert len(list(read_table_log("users"))) == 2
+
+    db.ok('insert into users values ("Eve", 40)')
+    assert not os.path.exists(LOG)
+    assert [record["name"] for record in read_snapshot()] == ["Ann", "Bob", "Eve"]
+
+    db.ok('insert into users values ("Dan", 20)')
+    assert len(list(read_table_log("users"))) == 1
+
+
+def test_log_written_by_a_previous_session_counts_toward_compaction(
+    db, monkeypatch
+):
+    monkeypatch.setattr(store_module, "LOG_COMPACTION_THRESHOLD", 3)
+    create_users(db)
+    db.ok('insert into users values ("Ann", 30)')
+    db.ok('insert into users values ("Bob", 25)')
+
+    db.reopen().ok('insert into users values ("Eve", 40)')
+    assert not os.path.exists(LOG)
+
+
+def test_transaction_commit_counts_toward_compaction(db, monkeypatch):
+    monkeypatch.setattr(store_module, "LOG_COMPACTION_THRESHOLD", 3)
+    create_users(db)
+    db.ok("begin")
+    for name in ("Ann", "Bob", "Eve"):
+        db.ok(f'insert into users values ("{name}", 1)')
+    db.ok("commit")
+
+    assert not os.path.exists(LOG)
+    assert len(read_snapshot()) == 3
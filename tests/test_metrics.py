@@ -0,0 +1,75 @@
+import json
+
+from src.primitive_db.engine import stats_command
+from src.primitive_db.metrics import Histogram, Metrics, metrics
+
+
+def test_histogram_quantiles_are_bucket_bounds():
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    assert histogram.quantile(0.5) is None
+    for value in [0.0005] * 6 + [0.005] * 3 + [1.0]:
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.9) == 0.01
+    assert histogram.quantile(0.99) == float("inf")
+    assert list(histogram.cumulative()) == [
+        (0.001, 6), (0.01, 9), (0.1, 9), ("+Inf", 10)
+    ]
+
+
+def test_prometheus_exposition():
+    registry = Metrics()
+    registry.increment("commands_total", command="select")
+    registry.increment("commands_total", 2, command="select")
+    registry.observe("stage_seconds", 0.002, stage="parse")
+    text = registry.to_prometheus()
+    assert "# TYPE primitive_db_commands_total counter" in text
+    assert 'primitive_db_commands_total{command="select"} 3' in text
+    assert "# TYPE primitive_db_stage_seconds histogram" in text
+    assert 'primitive_db_stage_seconds_bucket{stage="parse",le="0.005"} 1' in text
+    assert 'primitive_db_stage_seconds_count{stage="parse"} 1' in text
+
+
+def counter(name, **labels):
+    return sum(
+        item["value"] for item in metrics.snapshot()["counters"]
+        if item["name"] == name and labels.items() <= item["labels"].items()
+    )
+
+
+def test_commands_update_counters(people):
+    metrics.reset()
+    people.ok("select from people where age < 10")
+    people.fails("select from pets")
+    assert counter("commands_total", command="select") == 2
+    assert counter("command_errors_total") == 1
+    assert counter("rows_scanned_total") == 500
+    assert counter("rows_returned_total") == 10
+    assert counter("bytes_written_total", file="table") == 0
+
+    people.ok('insert into people values ("x", 1, true)')
+    assert counter("bytes_written_total", file="log") > 0
+
+
+def test_stats_command_outputs(people):
+    assert "Счетчики:" in people.ok("stats")
+    people.ok("stats json metrics.json")
+    with open("metrics.json", encoding="utf-8") as f:
+        assert json.load(f)["counters"]
+    assert "# TYPE primitive_db_commands_total counter" in people.ok("stats prometheus")
+    assert "Метрики сброшены" in people.ok("stats reset")
+    # Сама команда stats уже учтена в счетчиках, поэтому пустая сводка - без нее
+    metrics.reset()
+    stats_command([])
+    assert "Замеров пока нет" in people.capsys.readouterr().out
+
+
+def test_profile_runs_the_command(people):
+    output = people.ok("profile select from people where age < 2")
+    assert "Профиль команды" in output
+    assert "| n1 " in output and "cumulative" in output.lower()
+
+
+def test_metrics_command_errors(people):
+    assert "stats [json|prometheus" in people.fails("stats bogus")
+    assert "profile <команда>" in people.fails("profile")
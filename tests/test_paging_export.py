@@ -0,0 +1,63 @@
+import csv
+import json
+
+from src.primitive_db.constants import SELECT_PAGE_SIZE
+from src.primitive_db.core import iter_formatted_pages
+
+COLUMNS = [{"name": "ID", "type": "int"}]
+
+
+def test_pages_are_rendered_lazily():
+    consumed = []
+
+    def records():
+        for i in range(SELECT_PAGE_SIZE * 2 + 1):
+            consumed.append(i)
+            yield {"ID": i}
+
+    pages = iter_formatted_pages(COLUMNS, records())
+    first = next(pages)
+    assert len(consumed) == SELECT_PAGE_SIZE
+    assert "| 0 " in first and f"| {SELECT_PAGE_SIZE} " not in first
+    assert len(list(pages)) == 2
+
+
+def test_limit_and_offset_page_through_results(people):
+    assert people.ids("select from people limit 3") == [1, 2, 3]
+    assert people.ids("select from people limit 3 offset 498") == [499, 500]
+    assert people.ids("select from people where age >= 100 offset 398") == [499, 500]
+    assert people.ids("select from people order by age desc limit 2 offset 1") == [
+        499, 498
+    ]
+
+
+def test_negative_limit_is_rejected(people):
+    people.fails("select from people limit -1")
+    people.fails("select from people offset x")
+
+
+def test_export_table_to_csv(people):
+    output = people.ok("export people to people.csv")
+    assert 'Выгружено 500 записей в файл "people.csv"' in output
+    with open("people.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[1] == {"ID": "2", "name": "n1", "age": "1", "active": "True"}
+
+
+def test_export_query_to_jsonl(people):
+    query = "select from people where age < 2 order by age desc"
+    people.ok(f'export "{query}" to out.txt jsonl')
+    with open("out.txt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert rows == [
+        {"ID": 2, "name": "n1", "age": 1, "active": True},
+        {"ID": 1, "name": "n0", "age": 0, "active": False},
+    ]
+
+
+def test_export_errors(people):
+    assert 'Неподдерживаемый файл "people.xml"' in people.fails(
+        "export people to people.xml"
+    )
+    assert "export <имя_таблицы" in people.fails("export people people.csv")
+    assert 'Таблица "pets" не существует' in people.fails("export pets to pets.csv")
@@ -0,0 +1,72 @@
+import pytest
+
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.constants import PARALLEL_SCAN_MIN_ROWS
+from src.primitive_db.parallel import (
+    configure_parallel_scan,
+    parallel_settings,
+    shutdown_pool,
+    split_rows,
+)
+
+QUERIES = [
+    'select from people where name = "n3" or age > 490',
+    "select from people where age between 100 and 110 and active = true",
+    'select from people where name like "n1%" and not active = true',
+]
+
+
+@pytest.fixture
+def parallel(people):
+    workers = parallel_settings["workers"]
+    expected = [people.ids(query) for query in QUERIES]
+    people.ok("set_layout people columnar")
+    people.ok("parallel_scan 100 2")
+    people.ok("clear_cache")
+    yield people, expected
+    shutdown_pool()
+    configure_parallel_scan(PARALLEL_SCAN_MIN_ROWS, workers)
+
+
+def test_rows_are_split_into_covering_ranges():
+    assert split_rows(10, 4) == [(0, 3), (3, 6), (6, 9), (9, 10)]
+    assert split_rows(2, 8) == [(0, 1), (1, 2)]
+
+
+def test_parallel_scan_gives_the_same_results(parallel, monkeypatch):
+    people, expected = parallel
+
+    def sequential(self, predicate=None):
+        raise AssertionError("просмотр должен выполняться в процессах пула")
+
+    # Процессы пула запускаются заново и подмену не видят
+    monkeypatch.setattr(ColumnarTable, "filter", sequential)
+    assert [sorted(people.ids(query)) for query in QUERIES] == expected
+    people.ok("clear_cache")
+    assert "параллельно в 2 процессах" in people.ok(f"explain {QUERIES[0]}")
+
+
+def test_binary_table_is_scanned_from_the_file(parallel):
+    people, expected = parallel
+    people.ok("convert people binary")
+    people.reopen()
+    assert [sorted(people.ids(query)) for query in QUERIES] == expected
+
+
+def test_changed_table_is_exported_again(parallel):
+    people, expected = parallel
+    people.ids(QUERIES[0])
+    people.ok('insert into people values ("n3", 7, true)')
+    assert people.ids(QUERIES[0]) == expected[0] + [501]
+
+
+def test_small_table_is_scanned_in_process(parallel):
+    people, _ = parallel
+    people.ok("parallel_scan 1000")
+    output = people.ok(f"explain {QUERIES[0]}")
+    assert "Доступ: просмотр столбцов\n" in output
+
+
+def test_parallel_scan_requires_numbers(db):
+    assert "parallel_scan <строк> [процессов]" in db.fails("parallel_scan many")
+    assert parallel_settings["min_rows"] == PARALLEL_SCAN_MIN_ROWS
@@ -0,0 +1,57 @@
+import shlex
+
+import pytest
+
+from src.primitive_db.constants import ERROR_MESSAGES
+from src.primitive_db.parser import Compare, parse_select_command
+
+
+def parse_select(text):
+    return parse_select_command(shlex.split(text))
+
+
+@pytest.mark.parametrize("keyword", ["order", "limit", "offset", "group", "where"])
+def test_quoted_keyword_value_is_part_of_where(keyword):
+    table_name, where, options, error = parse_select(
+        f'from t where name = "{keyword}"'
+    )
+    assert error is None
+    assert where == Compare("name", "=", keyword)
+    assert options["limit"] is None
+
+
+def test_tail_starts_after_where_with_keyword_value():
+    table_name, where, options, error = parse_select(
+        'from t where name = "order" order by ID desc limit 2 offset 1'
+    )
+    assert error is None
+    assert where == Compare("name", "=", "order")
+    assert (options["order_by"], options["descending"]) == ("ID", True)
+    assert (options["limit"], options["offset"]) == (2, 1)
+
+
+def test_stray_text_after_where_is_an_error():
+    assert parse_select("from t where a = 1 bogus")[3] is not None
+    assert parse_select("from t bogus")[3] is not None
+    assert parse_select("from t where")[3] is not None
+
+
+def test_select_keyword_value_end_to_end(db):
+    db.ok("create_table t name:str")
+    db.ok('insert into t values ("order")')
+    db.ok('insert into t values ("other")')
+    output = db.ok('select from t where name = "order"')
+    assert "order" in output and "other" not in output
+
+
+def test_invalid_tail_reports_tail_error():
+    error = parse_select("from t where name = group group by")[3]
+    assert error == ERROR_MESSAGES["invalid_select_tail"]
+
+
+def test_group_by_after_keyword_value(db):
+    db.ok("create_table t name:str n:int")
+    db.ok('insert into t values ("group", 1)')
+    db.ok('insert into t values ("group", 2)')
+    output = db.ok('select name, sum(n) from t where name = "group" group by name')
+    assert "| group" in output and "3" in output
@@ -0,0 +1,72 @@
+from src.primitive_db import planner
+from src.primitive_db.constants import ERROR_MESSAGES
+from src.primitive_db.utils import load_metadata
+
+
+def explain(db, condition):
+    db.ok("clear_cache")
+    return db.ok(f"explain select from people where {condition}")
+
+
+def test_id_lookup_uses_the_primary_key(people):
+    output = explain(people, "ID = 42")
+    assert "первичный ключ ID" in output
+    assert "Фактически: 1 строк(и)" in output
+    assert people.ids("select from people where ID = 42") == [42]
+
+
+def test_impossible_condition_reads_nothing(people):
+    output = explain(people, "age > 10000")
+    assert "пустой результат" in output
+    assert "Фактически: 0 строк(и)" in output
+
+
+def test_selective_range_uses_index_and_wide_range_scans(people):
+    people.ok("create_index people age sorted")
+    assert "индекс sorted по столбцу age" in explain(people, "age < 5")
+    assert "полный просмотр таблицы" in explain(people, "age > 10")
+    assert len(people.ids("select from people where age > 10")) == 489
+
+
+def test_repeated_query_is_planned_from_cache(people):
+    people.ok('select from people where name = "n1"')
+    output = people.ok('explain select from people where name = "n1"')
+    assert "кэш результатов" in output
+
+
+def test_stats_are_stored_and_maintained(people):
+    people.ok("select from people where age = 1")
+    stats = load_metadata()["people"]["stats"]
+    assert stats["rows"] == 500
+    assert stats["columns"]["age"] == {"distinct": 500, "min": 0, "max": 499}
+    assert stats["columns"]["name"]["distinct"] == 50
+
+    # Новая граница max: условие больше не отсекается по статистике
+    people.ok('insert into people values ("x", 20000, true)')
+    assert "пустой результат" not in explain(people, "age > 10000")
+    assert people.ids("select from people where age > 10000") == [501]
+    people.ok("delete from people where age > 10000")
+    assert load_metadata()["people"]["stats"]["rows"] == 500
+
+
+def test_update_adjusts_stats_without_rescanning(people, monkeypatch):
+    people.ok("select from people where age = 1")
+    monkeypatch.setattr(planner, "collect_stats", None)
+    people.ok("update people set age = 20000 where ID = 1")
+    stats = load_metadata()["people"]["stats"]
+    assert stats["rows"] == 500
+    assert stats["columns"]["age"] == {"distinct": 500, "min": 0, "max": 20000}
+    assert people.ids("select from people where age > 10000") == [1]
+
+    people.ok('update people set name = "same" where age >= 0')
+    assert load_metadata()["people"]["stats"]["columns"]["name"] == {
+        "distinct": 1, "min": "same", "max": "same"
+    }
+    assert "пустой результат" in explain(people, 'name = "other"')
+
+
+def test_explain_errors(people):
+    assert "explain select ..." in people.fails("explain from people")
+    assert ERROR_MESSAGES["table_not_found"].format(table_name="pets") in people.fails(
+        "explain select from pets"
+    )
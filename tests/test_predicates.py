@@ -0,0 +1,103 @@
+import shlex
+
+import pytest
+
+from src.primitive_db.parser import parse_select_command
+from src.primitive_db.predicates import compile_where
+
+COLUMNS = [
+    {"name": "ID", "type": "int"},
+    {"name": "name", "type": "str"},
+    {"name": "age", "type": "int"},
+    {"name": "active", "type": "bool"},
+]
+RECORDS = [
+    {"ID": i + 1, "name": f"n{i % 50}", "age": i, "active": bool(i % 2)}
+    for i in range(500)
+]
+
+
+def where(text, columns=COLUMNS):
+    _, ast, _, error = parse_select_command(shlex.split(f"from people where {text}"))
+    assert error is None, error
+    return compile_where(ast, columns)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("age = 10", lambda r: r["age"] == 10),
+    ("age != 10 and age < 12", lambda r: r["age"] < 12 and r["age"] != 10),
+    ("age <> 0 and age <= 2", lambda r: 0 < r["age"] <= 2),
+    ("age < 3 or age > 497", lambda r: r["age"] < 3 or r["age"] > 497),
+    ("not (age >= 5) and active = true", lambda r: r["age"] < 5 and r["active"]),
+    ("age between 10 and 12", lambda r: 10 <= r["age"] <= 12),
+    ('name in ("n1", "n2") and age < 100', lambda r: r["name"] in ("n1", "n2")
+     and r["age"] < 100),
+    ('name like "n4_" and age < 100', lambda r: r["name"].startswith("n4")
+     and len(r["name"]) == 3 and r["age"] < 100),
+    ('name not like "n%"', lambda r: False),
+    ("age in (1, x, 3)", lambda r: r["age"] in (1, 3)),
+])
+def test_compiled_predicate_matches_python(text, expected):
+    predicate = where(text)
+    assert [r["ID"] for r in RECORDS if predicate(r)] == [
+        r["ID"] for r in RECORDS if expected(r)
+    ]
+
+
+def test_constants_are_converted_to_column_types():
+    predicate = where('age = "7" and active = TRUE')
+    assert predicate.conjuncts == {"age": 7, "active": True}
+    assert predicate({"age": 7, "active": True})
+    # Строка не равна числу столбца int, вместо ошибки условие ложно
+    assert not where('age = "seven"')({"age": 7})
+    assert where('age != "seven"')({"age": 7})
+
+
+def test_without_schema_values_compare_as_strings():
+    predicate = where("age = 7", columns=None)
+    assert predicate({"age": 7}) and predicate({"age": "7"})
+
+
+@pytest.mark.parametrize("text", [
+    "(age = 1", "age = 1 and", "age in 1", "not", "age like",
+])
+def test_malformed_expressions_are_rejected(text):
+    _, _, _, error = parse_select_command(shlex.split(f"from people where {text}"))
+    assert error is not None
+
+
+def test_boolean_expression_in_select(people):
+    assert people.ids(
+        'select from people where (name = "n1" or name = "n2") and not age > 100'
+    ) == [2, 3, 52, 53]
+    assert people.ids('select from people where name like "n4_" and age < 60') == [
+        41, 42, 43, 44, 45, 46, 47, 48, 49, 50
+    ]
+    assert "Некорректное WHERE условие" in people.fails(
+        "select from people where (age = 1"
+    )
+
+
+
+@pytest.mark.parametrize("value", ["hi!", "x=y", "a,b", "O'Brien", "(x)", "a b"])
+def test_quoted_values_with_operator_characters(db, value):
+    # shlex снимает кавычки до разбора WHERE: значение целиком - строка
+    literal = f'"{value}"'
+    db.ok("create_table t name:str age:int")
+    db.load("t", ["name", "age"], [(value, 1), ("other", 2)])
+    assert db.ids(f"select from t where name = {literal}") == [1]
+    assert db.ids(f"select from t where name != {literal}") == [2]
+    if "," not in value:
+        # В списке IN запятая без пробелов делит значения
+        assert db.ids(f'select from t where name in ({literal}, "none")') == [1]
+    assert db.ids(f"select from t where (name = {literal}) and age < 5") == [1]
+    db.ok(f"update t set age = 10 where name = {literal} and age = 1")
+    assert db.ids("select from t where age = 10") == [1]
+    db.ok(f"delete from t where name = {literal}")
+    assert db.ids("select from t where age < 100") == [2]
+
+
+def test_unquoted_values_next_to_parentheses_and_commas():
+    assert where("(age = 5) or age in (7,8)")({"age": 8})
+    assert not where("(age = 5) or age in (7,8)")({"age": 6})
+    assert where('name in ("a,b",c)', columns=None)({"name": "c"})
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from src.primitive_db.engine import iter_script_lines, run_script
+from src.primitive_db.main import main
+from src.primitive_db.utils import load_metadata, load_table_data
+
+SCRIPT = """
+# таблица и данные
+create_table people name:str age:int;
+-- две записи
+insert into people values ("a", 1)
+insert into people values ("b", 2);
+"""
+
+
+def test_comments_and_semicolons_are_skipped():
+    assert list(iter_script_lines(SCRIPT.splitlines())) == [
+        (3, "create_table people name:str age:int"),
+        (5, 'insert into people values ("a", 1)'),
+        (6, 'insert into people values ("b", 2)'),
+    ]
+
+
+def test_script_runs_and_flushes(workdir, capsys):
+    assert run_script(SCRIPT.splitlines())
+    assert [r["name"] for r in load_table_data("people")] == ["a", "b"]
+    assert "выполнилась за" not in capsys.readouterr().out
+
+
+def test_confirmation_follows_yes_flag(workdir, capsys):
+    run_script(SCRIPT.splitlines())
+    capsys.readouterr()
+    assert not run_script(["delete from people where age = 1"])
+    assert capsys.readouterr().out.count("Операция отменена") == 1
+    assert not run_script(["drop_table people"])
+    assert capsys.readouterr().out.count("Операция отменена") == 1
+    assert len(load_table_data("people")) == 2
+
+    assert run_script(["delete from people where age = 1"], assume_yes=True)
+    assert len(load_table_data("people")) == 1
+
+
+def test_failure_continues_without_atomic(workdir):
+    lines = SCRIPT.splitlines() + ["insert into pets values (1)", "drop_table people"]
+    assert not run_script(lines, assume_yes=True)
+    assert "people" not in load_metadata()
+
+
+def test_atomic_failure_rolls_back_the_batch(workdir, capsys):
+    run_script(SCRIPT.splitlines())
+    lines = [
+        'insert into people values ("c", 3)',
+        "create_table pets kind:str",
+        'insert into people values ("d", "old")',
+        'insert into people values ("e", 5)',
+    ]
+    assert not run_script(lines, atomic=True)
+    assert 'Ошибка в строке 3: "insert into people values ("d", "old")"' in (
+        capsys.readouterr().out
+    )
+    assert [r["name"] for r in load_table_data("people")] == ["a", "b"]
+    assert "pets" not in load_metadata()
+    assert not os.path.exists("data/people.log")
+
+
+def test_atomic_success_commits(workdir):
+    assert run_script(SCRIPT.splitlines(), atomic=True)
+    assert len(load_table_data("people")) == 2
+
+
+def test_main_runs_a_script_file_and_one_command(workdir, capsys):
+    with open("setup.sql", "w", encoding="utf-8") as f:
+        f.write(SCRIPT)
+    with pytest.raises(SystemExit) as exit_info:
+        main(["--script", "setup.sql"])
+    assert exit_info.value.code == 0
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(["-c", "select from people where age = 2"])
+    assert exit_info.value.code == 0
+    assert "| b " in capsys.readouterr().out
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(["-c", "select from pets"])
+    assert exit_info.value.code == 1
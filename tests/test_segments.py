@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from src.primitive_db.constants import ERROR_MESSAGES
+from src.primitive_db.segments import SegmentedTable
+from src.primitive_db.utils import list_segment_numbers
+
+QUERIES = [
+    "select from people where ID = 250",
+    "select from people where ID between 95 and 105",
+    'select from people where name = "n7"',
+    "select from people order by ID desc limit 3",
+]
+
+
+def test_partition_splits_the_table_by_id(people):
+    expected = [sorted(people.ids(query)) for query in QUERIES]
+    output = people.ok("partition people 100")
+    assert 'Таблица "people" разбита на сегменты по 100 ID' in output
+    assert sorted(os.listdir("data/people")) == [
+        f"seg_{number:06d}.json" for number in range(5)
+    ]
+    assert not os.path.exists("data/people.json")
+
+    people.reopen()
+    assert [sorted(people.ids(query)) for query in QUERIES] == expected
+
+
+def test_lookup_reads_only_matching_segments(people):
+    people.ok("partition people 100")
+    people.reopen()
+    assert "просмотр сегментов: 1 из 5" in people.ok(
+        "explain select from people where ID = 250"
+    )
+    table = people.store.get_table("people")
+    assert isinstance(table, SegmentedTable)
+    assert sorted(table.loaded) == [2]
+    # Условие вне границ ID всех сегментов отсекается без чтения
+    assert "пустой результат" in people.ok("explain select from people where ID > 1000")
+    assert sorted(table.loaded) == [2]
+
+
+def test_changes_go_to_the_owning_segment(people):
+    people.ok("partition people 100")
+    people.reopen()
+    people.ok('insert into people values ("new", 1, true)')
+    people.ok('update people set name = "upd" where ID = 42')
+    assert os.path.exists("data/people/seg_000005.log")
+    assert os.path.exists("data/people/seg_000000.log")
+    assert sorted(people.store.get_table("people").loaded) == [0, 5]
+
+    people.reopen()
+    assert people.ids('select from people where name = "new" or name = "upd"') == [
+        42, 501
+    ]
+    people.ok("compact people")
+    assert not os.path.exists("data/people/seg_000005.log")
+    assert people.reopen().ids("select from people where ID >= 500") == [500, 501]
+
+
+def test_partition_off_merges_segments(people):
+    people.ok("partition people 100")
+    people.ok("delete from people where ID > 10")
+    assert 'Сегменты таблицы "people" объединены' in people.ok("partition people off")
+    assert not list_segment_numbers("people")
+    assert not os.path.exists("data/people")
+    assert os.path.exists("data/people.json")
+    assert people.reopen().ids("select from people") == list(range(1, 11))
+
+
+@pytest.mark.parametrize("size", ["0", "-5", "many"])
+def test_invalid_segment_size(people, size):
+    assert ERROR_MESSAGES["invalid_segment_size"].format(size=size) in people.fails(
+        f"partition people {size}"
+    )
+
+
+def test_columnar_table_is_not_partitioned(people):
+    people.ok("set_layout people columnar")
+    assert ERROR_MESSAGES["columnar_segments"].format(table_name="people") in (
+        people.fails("partition people 100")
+    )
+    assert ERROR_MESSAGES["table_not_found"].format(table_name="pets") in (
+        people.fails("partition pets 100")
+    )
+
+
+def test_drop_table_removes_segment_directory(people):
+    people.ok("partition people 100")
+    people.ok("drop_table people")
+    assert not os.path.exists("data/people")
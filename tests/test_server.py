@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from src.primitive_db import planner as planner_module
+from src.primitive_db import store as store_module
+from src.primitive_db.server import (
+    DatabaseEngine,
+    DatabaseServer,
+    ThreadLocalOutput,
+    connect,
+)
+
+SOCKET = "db.sock"
+
+
+@pytest.fixture
+def engine(db):
+    db.ok("create_table users name:str age:int")
+    db.ok("create_index users age sorted")
+    db.ok('insert into users values ("Ann", 30)')
+    db.ok('insert into users values ("Bob", 25)')
+    engine = DatabaseEngine()
+    # Первый select построит индексы и статистику заново
+    engine.store.get_metadata()["users"].pop("stats", None)
+    return engine
+
+
+def thread_output(monkeypatch):
+    """Как serve: вывод каждого потока попадает в его буфер.
+
+    Вызывается из самого теста: между подготовкой и выполнением теста
+    pytest восстанавливает sys.stdout.
+    """
+    monkeypatch.setattr(sys, "stdout", ThreadLocalOutput(sys.stdout))
+
+
+def run_concurrently(engine, lines):
+    results = [None] * len(lines)
+
+    def worker(position):
+        results[position] = engine.execute(lines[position])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(lines))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def counting(monkeypatch, module, name):
+    """Подменяет функцию модуля медленной копией и считает ее вызовы."""
+    original = getattr(module, name)
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(module, name, wrapper)
+    return calls
+
+
+def test_concurrent_selects_build_indexes_once(engine, monkeypatch):
+    thread_output(monkeypatch)
+    calls = counting(monkeypatch, store_module, "build_indexes")
+    lines = [f"select from users where age > {age}" for age in range(8)]
+    results = run_concurrently(engine, lines)
+    assert all(not failed for output, failed, keep_going in results)
+    assert len(calls) == 1
+
+
+def test_concurrent_selects_collect_stats_once(engine, monkeypatch):
+    thread_output(monkeypatch)
+    calls = counting(monkeypatch, planner_module, "collect_stats")
+    lines = [f"select from users where age = {age}" for age in range(8)]
+    run_concurrently(engine, lines)
+    assert len(calls) == 1
+    assert engine.store.get_metadata()["users"]["stats"]["rows"] == 2
+
+
+def test_writes_and_reads_from_many_threads(engine, monkeypatch):
+    thread_output(monkeypatch)
+    lines = [f'insert into users values ("user{i}", {i})' for i in range(20)]
+    lines += ["select from users where age >= 0"] * 5
+    results = run_concurrently(engine, lines)
+    assert all(not failed for output, failed, keep_going in results)
+    output, failed, keep_going = engine.execute("select count(*) from users")
+    assert "22" in output
+
+
+def test_session_commands_are_rejected(engine, monkeypatch):
+    thread_output(monkeypatch)
+    output, failed, keep_going = engine.execute("begin")
+    assert failed and keep_going
+
+
+@pytest.fixture
+def server(engine):
+    server = DatabaseServer(SOCKET, engine)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_round_trip(server, monkeypatch, capsys):
+    thread_output(monkeypatch)
+    lines = ['insert into users values ("Eve", 40)', "select from users"]
+    assert connect(SOCKET, lines)
+    output = capsys.readouterr().out
+    assert "Eve" in output and "Ann" in output
+
+
+def test_client_reports_failed_command(server, monkeypatch, capsys):
+    thread_output(monkeypatch)
+    assert not connect(SOCKET, ["select from missing"])
+    assert "missing" in capsys.readouterr().out
+
+
+def test_unconfirmed_delete_is_not_sent(server, monkeypatch):
+    thread_output(monkeypatch)
+    assert not connect(SOCKET, ["delete from users where ID = 1"])
+    output, failed, keep_going = server.engine.execute("select from users")
+    assert "Ann" in output
@@ -0,0 +1,46 @@
+import pytest
+
+from src.primitive_db.constants import ERROR_MESSAGES
+
+RANGE_QUERIES = [
+    "select from people where age > 495",
+    "select from people where age >= 495",
+    "select from people where age < 3",
+    "select from people where age <= 3",
+    "select from people where age between 10 and 12",
+]
+
+
+@pytest.mark.parametrize("query", RANGE_QUERIES)
+def test_sorted_index_matches_a_scan(people, query):
+    expected = people.ids(query)
+    people.ok("create_index people age sorted")
+    people.ok("clear_cache")
+    assert "индекс sorted по столбцу age" in people.ok(f"explain {query}")
+    assert sorted(people.ids(query)) == expected
+
+
+def test_order_by_limit_reads_the_index(people):
+    people.ok("create_index people age sorted")
+    query = "select from people order by age desc limit 3"
+    assert "Порядок: по индексу sorted столбца age" in people.ok(f"explain {query}")
+    assert people.ids(query) == [500, 499, 498]
+    assert people.ids("select from people order by age limit 2 offset 1") == [2, 3]
+
+
+def test_order_by_without_index(people):
+    assert people.ids("select from people order by age desc limit 2") == [500, 499]
+
+
+def test_sorted_index_follows_changes(people):
+    people.ok("create_index people age sorted")
+    people.ok("update people set age = 1000 where ID = 1")
+    people.ok("delete from people where ID = 500")
+    assert sorted(people.ids("select from people where age > 497")) == [1, 499]
+
+
+def test_sorted_index_rejects_bool_column(people):
+    output = people.fails("create_index people active sorted")
+    assert ERROR_MESSAGES["invalid_index_column"].format(
+        column="active", column_type="bool"
+    ) in output
@@ -0,0 +1,78 @@
+from src.primitive_db.constants import ERROR_MESSAGES
+from src.primitive_db.statements import (
+    StatementCache,
+    mark_placeholders,
+    normalize_statement,
+)
+
+
+def test_whitespace_outside_quotes_is_normalized():
+    assert normalize_statement('  select  from t   where a = "x   y" ') == (
+        'select from t where a = "x   y"'
+    )
+
+
+def test_placeholders_inside_quotes_are_kept():
+    marked, count = mark_placeholders('update t set a = ? where b = "?" and c = ?')
+    assert count == 2
+    assert '"?"' in marked and "?" not in marked.replace('"?"', "")
+
+
+def test_repeated_statement_is_parsed_once():
+    cache = StatementCache(max_entries=2)
+    first = cache.parse("select from t where a = 1")
+    assert cache.parse("select  from t where a = 1") is first
+    cache.parse("select from u")
+    cache.parse("select from v")
+    assert cache.parse("select from t where a = 1") is not first
+    assert (cache.hits, cache.misses) == (1, 4)
+    # Команды без своего парсера не кэшируются
+    cache.parse("help")
+    assert cache.stats()["size"] == 2
+
+
+def test_prepare_and_execute(people):
+    output = people.ok(
+        "prepare by_name as select from people where name = ? and age < ?"
+    )
+    assert 'Команда "by_name" подготовлена (параметров: 2)' in output
+    assert people.ids('execute by_name ("n1", 100)') == [2, 52]
+    assert people.ids('execute by_name ("n2", 60)') == [3, 53]
+
+    people.ok("prepare add as insert into people values (?, ?, ?)")
+    people.ok('execute add ("new", 7, true)')
+    people.ok("prepare rename as update people set name = ? where ID = ?")
+    people.ok('execute rename ("renamed", 501)')
+    assert people.ids('select from people where name = "renamed"') == [501]
+
+
+def test_execute_errors(people):
+    people.ok("prepare one as select from people where ID = ?")
+    assert ERROR_MESSAGES["params_count_mismatch"].format(
+        name="one", expected=1, actual=2
+    ) in people.fails("execute one (1, 2)")
+    assert ERROR_MESSAGES["prepared_not_found"].format(name="two") in people.fails(
+        "execute two (1)"
+    )
+    assert "Подготовить можно только команды" in people.fails(
+        "prepare bad as drop_table people"
+    )
+    people.fails("prepare broken as select from people where")
+    # Ошибка в значении параметра не ломает подготовленную команду
+    people.ok("prepare add as insert into people values (?, ?, ?)")
+    people.fails('execute add ("x", "old", true)')
+    assert people.ids("execute one (1)") == [1]
+
+
+def test_limit_and_offset_parameters(people):
+    people.ok(
+        "prepare page as select from people where age > ? order by age desc "
+        "limit ? offset ?"
+    )
+    assert people.ids("execute page (10, 3, 0)") == [500, 499, 498]
+    assert people.ids("execute page (10, 2, 5)") == [495, 494]
+    for values in ("(10, -1, 0)", '(10, "two", 0)', "(10, 2, true)"):
+        assert "должно быть целым неотрицательным числом" in people.fails(
+            f"execute page {values}"
+        )
+    assert people.ids("execute page (497, 10, 0)") == [500, 499]
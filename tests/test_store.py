@@ -0,0 +1,62 @@
+import json
+import os
+
+from src.primitive_db import store as store_module
+from src.primitive_db.constants import ERROR_MESSAGES
+
+
+def count_loads(monkeypatch):
+    calls = []
+    original = store_module.load_table_data
+
+    def wrapper(table_name, *args):
+        calls.append(table_name)
+        return original(table_name, *args)
+
+    monkeypatch.setattr(store_module, "load_table_data", wrapper)
+    return calls
+
+
+def test_table_stays_resident_between_commands(db, monkeypatch):
+    db.ok("create_table users name:str age:int")
+    db.ok('insert into users values ("Ann", 30)')
+    db.reopen()
+    loads = count_loads(monkeypatch)
+
+    db.ok("select from users")
+    db.ok('insert into users values ("Bob", 25)')
+    db.ok("select from users where age = 25")
+    db.ok("info users")
+    assert loads == ["users"]
+
+
+def test_file_changed_by_another_process_is_reloaded(db):
+    db.ok("create_table users name:str age:int")
+    db.ok('insert into users values ("Ann", 30)')
+    db.ok("compact users")
+    db.ok("select from users")
+
+    with open("data/users.json", "w", encoding="utf-8") as f:
+        json.dump([{"ID": 1, "name": "Changed", "age": 1}], f)
+    assert "Changed" in db.ok("select from users")
+
+
+def test_unchanged_tables_are_not_rewritten(db):
+    db.ok("create_table users name:str")
+    db.ok("create_table items title:str")
+    before = os.stat("data/items.json").st_mtime_ns
+    db.ok('insert into users values ("Ann")')
+    db.ok("set_layout users columnar")
+    assert os.stat("data/items.json").st_mtime_ns == before
+
+
+def test_metadata_written_by_another_process_is_reread(db):
+    db.ok("create_table users name:str")
+    other = type(db)(db.capsys)
+    other.ok("create_table items title:str")
+    assert "items" in db.ok("list_tables")
+
+
+def test_missing_table_is_an_error(db):
+    output = db.fails("select from missing")
+    assert ERROR_MESSAGES["table_not_found"].format(table_name="missing") in output
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from src.primitive_db import utils
+from src.primitive_db.constants import COMMIT_JOURNAL_FILE, ERROR_MESSAGES
+from src.primitive_db.utils import load_metadata, load_table_data, read_table_log
+
+
+@pytest.fixture
+def accounts(db):
+    db.ok("create_table accounts owner:str amount:int")
+    db.ok('insert into accounts values ("a", 10)')
+    db.ok('insert into accounts values ("b", 20)')
+    return db
+
+
+def amounts(db):
+    db.ok("clear_cache")
+    return {
+        record["owner"]: record["amount"]
+        for record in db.store.get_table("accounts")
+    }
+
+
+def test_commit_writes_all_changes_once(accounts):
+    accounts.ok("begin")
+    accounts.ok('update accounts set amount = 5 where owner = "a"')
+    accounts.ok('update accounts set amount = 25 where owner = "b"')
+    accounts.ok('insert into accounts values ("c", 1)')
+    # До commit на диске ничего не меняется
+    assert len(list(read_table_log("accounts"))) == 2
+    assert "Транзакция зафиксирована" in accounts.ok("commit")
+
+    assert amounts(accounts.reopen()) == {"a": 5, "b": 25, "c": 1}
+    assert not os.path.exists(COMMIT_JOURNAL_FILE)
+
+
+def test_rollback_discards_changes(accounts):
+    accounts.ok("begin")
+    accounts.ok('insert into accounts values ("c", 1)')
+    accounts.ok('delete from accounts where owner = "a"')
+    accounts.ok("rollback")
+    assert amounts(accounts) == {"a": 10, "b": 20}
+    assert amounts(accounts.reopen()) == {"a": 10, "b": 20}
+
+
+def test_exit_discards_open_transaction(accounts):
+    accounts.ok("begin")
+    accounts.ok('insert into accounts values ("c", 1)')
+    assert "Незафиксированная транзакция отменена" in accounts.ok("exit")
+    assert amounts(accounts.reopen()) == {"a": 10, "b": 20}
+
+
+def test_interrupted_commit_is_finished_on_start(accounts, monkeypatch):
+    accounts.ok("begin")
+    accounts.ok('insert into accounts values ("c", 1)')
+    accounts.ok("create_table pets kind:str")
+
+    def crash(journal):
+        raise OSError("сбой")
+
+    # Журнал фиксации и временные файлы записаны, целевые файлы еще не тронуты
+    with monkeypatch.context() as patch:
+        patch.setattr(utils, "apply_commit_journal", crash)
+        with pytest.raises(OSError):
+            accounts.store.commit()
+    assert os.path.exists(COMMIT_JOURNAL_FILE)
+    assert "pets" not in load_metadata()
+
+    assert amounts(accounts.reopen()) == {"a": 10, "b": 20, "c": 1}
+    assert "pets" in accounts.store.get_metadata()
+    assert not os.path.exists(COMMIT_JOURNAL_FILE)
+
+
+def test_unfinished_journal_is_ignored(accounts):
+    with open(COMMIT_JOURNAL_FILE, "w", encoding="utf-8") as f:
+        f.write('{"replace": [["data/accounts.json.tmp", ')
+    assert amounts(accounts.reopen()) == {"a": 10, "b": 20}
+    assert not os.path.exists(COMMIT_JOURNAL_FILE)
+
+
+def test_corrupted_snapshot_is_preserved(accounts, capsys):
+    accounts.ok("compact accounts")
+    with open("data/accounts.json", "w", encoding="utf-8") as f:
+        f.write('[{"ID": 1,')
+    assert load_table_data("accounts") == []
+    assert "сохранен как data/accounts.json.corrupt" in capsys.readouterr().out
+    with open("data/accounts.json.corrupt", encoding="utf-8") as f:
+        assert f.read() == '[{"ID": 1,'
+    assert not os.path.exists("data/accounts.json")
+
+
+def test_transaction_command_errors(accounts):
+    assert ERROR_MESSAGES["no_transaction"] in accounts.fails("commit")
+    assert ERROR_MESSAGES["no_transaction"] in accounts.fails("rollback")
+    accounts.ok("begin")
+    assert ERROR_MESSAGES["transaction_active"] in accounts.fails("begin")
+    assert ERROR_MESSAGES["not_in_transaction"].format(command="convert") in (
+        accounts.fails("convert accounts binary")
+    )
+    accounts.ok("rollback")
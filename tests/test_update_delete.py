@@ -0,0 +1,60 @@
+import shlex
+
+import pytest
+
+from src.primitive_db.constants import ERROR_MESSAGES
+from src.primitive_db.parser import parse_update_command
+from src.primitive_db.utils import read_table_log
+
+
+def test_set_list_keeps_commas_inside_quotes():
+    table_name, set_clause, where, error = parse_update_command(
+        shlex.split('people set name = "a, b", age = 3 where ID = 1')
+    )
+    assert error is None
+    assert set_clause == {"name": "a, b", "age": 3}
+
+
+@pytest.mark.parametrize("indexes", [[], ["create_index people age sorted",
+                                          "create_index people name hash"]])
+def test_multi_column_update(people, indexes):
+    for command in indexes:
+        people.ok(command)
+    people.ok('update people set name = "old, retired", age = 1000 where age >= 450')
+    people.ok("clear_cache")
+    expected = list(range(451, 501))
+    renamed = people.ids('select from people where name = "old, retired"')
+    assert sorted(renamed) == expected
+    assert sorted(people.ids("select from people where age = 1000")) == expected
+    assert people.ids('select from people where name = "n1" and age > 400') == [402]
+    # В журнал попадают значения, уже приведенные к типам столбцов
+    entry = list(read_table_log("people"))[-1]
+    assert entry["values"] == {"name": "old, retired", "age": 1000}
+
+    people.reopen()
+    assert sorted(people.ids("select from people where age = 1000")) == expected
+
+
+def test_set_based_delete_keeps_indexes_consistent(people):
+    people.ok("create_index people age sorted")
+    people.ok("create_index people name hash")
+    people.ok("delete from people where active = true")
+    people.ok("clear_cache")
+    assert people.ids('select from people where name = "n2"') == list(range(3, 501, 50))
+    assert people.ids('select from people where name = "n1"') == []
+    assert people.ids("select from people where age between 10 and 14") == [11, 13, 15]
+
+
+@pytest.mark.parametrize("command, error", [
+    ("update people set ID = 5 where age = 1", ERROR_MESSAGES["id_not_updatable"]),
+    ("update people set weight = 5 where age = 1", ERROR_MESSAGES["column_not_found"]
+     .format(column="weight", table_name="people")),
+    ('update people set age = "old" where age = 1', ERROR_MESSAGES["invalid_type"]
+     .format(column="age", expected_type="int")),
+    ("update people set age = 1, age = 2 where age = 1", None),
+])
+def test_invalid_set_clause_changes_nothing(people, command, error):
+    output = people.fails(command)
+    if error is not None:
+        assert error in output
+    assert people.ids("select from people where age = 1") == [2]